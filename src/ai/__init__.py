@@ -0,0 +1,7 @@
+"""
+Módulos compartilhados para chamadas aos modelos de IA (GitHub Models)
+"""
+
+from .cliente_http import ClienteModelosGitHub, obter_cliente_modelos
+
+__all__ = ['ClienteModelosGitHub', 'obter_cliente_modelos']
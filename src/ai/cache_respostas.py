@@ -0,0 +1,172 @@
+"""
+Cache de respostas da IA (TTL + LRU) com persistência opcional em SQLite
+A chave é o prompt normalizado + system prompt + modelo
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def normalizar_prompt(texto: str) -> str:
+    """Normalizar texto para comparação: sem acentos, minúsculo, espaços e pontuação das pontas removidos."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).casefold()
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    return texto.strip(' .,;:!?¿¡…~')
+
+
+class CacheRespostasIA:
+    """Cache LRU com expiração por TTL e métricas de hit/miss."""
+
+    def __init__(
+        self,
+        ttl_segundos: float = 3600,
+        max_itens: int = 1000,
+        arquivo: Optional[Path] = None
+    ):
+        """
+        Args:
+            ttl_segundos: Tempo de vida de cada resposta
+            max_itens: Máximo de respostas em memória (as menos usadas saem primeiro)
+            arquivo: Banco SQLite para persistir entre reinícios (None = só memória)
+        """
+        self.ttl_segundos = ttl_segundos
+        self.max_itens = max_itens
+        self.itens: 'OrderedDict[str, tuple]' = OrderedDict()  # chave -> (resposta, expira_em)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.removidos_lru = 0
+
+        self._db = None
+        if arquivo:
+            Path(arquivo).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(arquivo), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS respostas (chave TEXT PRIMARY KEY, resposta TEXT, expira_em REAL)"
+            )
+            self._carregar_do_disco()
+
+    @staticmethod
+    def chave(prompt: str, system_prompt: str = '', modelo: str = '') -> str:
+        """Hash da combinação prompt normalizado + system prompt + modelo."""
+        base = '\x1f'.join([normalizar_prompt(prompt), system_prompt or '', modelo or ''])
+        return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+    def _carregar_do_disco(self):
+        """Carregar as respostas ainda válidas (as que expiram por último ficam como mais recentes)."""
+        agora = time.time()
+        self._db.execute("DELETE FROM respostas WHERE expira_em <= ?", (agora,))
+        linhas = self._db.execute(
+            "SELECT chave, resposta, expira_em FROM respostas ORDER BY expira_em DESC LIMIT ?",
+            (self.max_itens,)
+        ).fetchall()
+        for chave, resposta, expira_em in reversed(linhas):
+            self.itens[chave] = (resposta, expira_em)
+        self._db.commit()
+
+    def _remover_do_disco(self, chave: str):
+        if self._db:
+            self._db.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+            self._db.commit()
+
+    def obter(self, prompt: str, system_prompt: str = '', modelo: str = '') -> Optional[str]:
+        """Resposta em cache ou None (conta hit/miss)."""
+        chave = self.chave(prompt, system_prompt, modelo)
+        with self._lock:
+            item = self.itens.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+
+            resposta, expira_em = item
+            if expira_em <= time.time():
+                del self.itens[chave]
+                self._remover_do_disco(chave)
+                self.expirados += 1
+                self.misses += 1
+                return None
+
+            self.itens.move_to_end(chave)
+            self.hits += 1
+            return resposta
+
+    def guardar(self, prompt: str, system_prompt: str, modelo: str, resposta: str):
+        """Guardar resposta (remove a menos usada se passar do limite)."""
+        chave = self.chave(prompt, system_prompt, modelo)
+        expira_em = time.time() + self.ttl_segundos
+        with self._lock:
+            self.itens[chave] = (resposta, expira_em)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                antiga, _ = self.itens.popitem(last=False)
+                self._remover_do_disco(antiga)
+                self.removidos_lru += 1
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO respostas (chave, resposta, expira_em) VALUES (?, ?, ?)",
+                    (chave, resposta, expira_em)
+                )
+                self._db.commit()
+
+    def limpar(self):
+        """Remover tudo (memória e disco)."""
+        with self._lock:
+            self.itens.clear()
+            if self._db:
+                self._db.execute("DELETE FROM respostas")
+                self._db.commit()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Métricas do cache para o /status."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'itens': len(self.itens),
+                'max_itens': self.max_itens,
+                'ttl_segundos': self.ttl_segundos,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+                'expirados': self.expirados,
+                'removidos_lru': self.removidos_lru,
+                'persistente': self._db is not None
+            }
+
+
+# Rotas que nunca usam o cache (fluxos personalizados), ex: AI_CACHE_ROTAS_SEM_CACHE=vendedor,crm
+ROTAS_SEM_CACHE = {r.strip() for r in os.getenv('AI_CACHE_ROTAS_SEM_CACHE', '').split(',') if r.strip()}
+
+_cache_compartilhado: Optional[CacheRespostasIA] = None
+_lock_global = threading.Lock()
+
+
+def cache_habilitado(rota: str) -> bool:
+    """Verificar se a rota pode usar o cache (AI_CACHE_ATIVO e AI_CACHE_ROTAS_SEM_CACHE)."""
+    if os.getenv('AI_CACHE_ATIVO', 'true').lower() != 'true':
+        return False
+    return rota not in ROTAS_SEM_CACHE
+
+
+def obter_cache_respostas() -> CacheRespostasIA:
+    """Cache único do processo, configurado pelas variáveis AI_CACHE_*."""
+    global _cache_compartilhado
+    if _cache_compartilhado is None:
+        with _lock_global:
+            if _cache_compartilhado is None:
+                arquivo = os.getenv('AI_CACHE_ARQUIVO', '')
+                _cache_compartilhado = CacheRespostasIA(
+                    ttl_segundos=float(os.getenv('AI_CACHE_TTL', '3600')),
+                    max_itens=int(os.getenv('AI_CACHE_MAX_ITENS', '1000')),
+                    arquivo=Path(arquivo) if arquivo else None
+                )
+    return _cache_compartilhado
@@ -0,0 +1,229 @@
+"""
+Cache por similaridade para perguntas quase repetidas ("quanto custa?" x "qual o valor?")
+Vetores locais (palavras + n-gramas de caracteres, hashing trick) numa matriz NumPy;
+a busca é um único produto matriz-vetor sobre as perguntas recentes. Negação e números
+não entram só no vetor: perguntas com sentido oposto ou outra quantidade nunca se reaproveitam
+"""
+
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .cache_respostas import normalizar_prompt
+
+# Palavras sem peso para o sentido da pergunta (negações ficam de fora: ver NEGACOES)
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'um', 'uma', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na',
+    'nos', 'nas', 'para', 'pra', 'por', 'com', 'que', 'qual', 'quais', 'quanto', 'quantos',
+    'como', 'me', 'eu', 'voce', 'vc', 'vcs', 'se', 'ja', 'tem', 'ta', 'eh', 'ai', 'la',
+    'isso', 'esse', 'essa', 'este', 'esta', 'sobre', 'seria', 'fica', 'sai', 'favor',
+}
+
+# Sinônimos comuns em perguntas de vendas -> termo canônico
+SINONIMOS = {
+    'valor': 'preco', 'valores': 'preco', 'precos': 'preco', 'custa': 'preco', 'custam': 'preco',
+    'custo': 'preco', 'custos': 'preco',
+    'parcela': 'parcelamento', 'parcelas': 'parcelamento', 'parcelado': 'parcelamento',
+    'parcelar': 'parcelamento', 'pagar': 'pagamento', 'pago': 'pagamento',
+    'frete': 'entrega', 'envio': 'entrega', 'entregam': 'entrega', 'enviam': 'entrega',
+    'horarios': 'horario', 'funcionamento': 'horario', 'abrem': 'abre', 'fecham': 'fecha',
+    'ola': 'oi', 'oie': 'oi', 'opa': 'oi',
+}
+
+
+# Palavras que invertem o sentido ("tem desconto?" x "não tem desconto?")
+NEGACOES = {'nao', 'nem', 'nunca', 'jamais', 'sem', 'nenhum', 'nenhuma'}
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Tokens normalizados, sem stopwords e com sinônimos canônicos."""
+    palavras = ''.join(c if c.isalnum() else ' ' for c in normalizar_prompt(texto)).split()
+    return [SINONIMOS.get(p, p) for p in palavras if p not in STOPWORDS]
+
+
+def assinatura(tokens: List[str]) -> int:
+    """
+    O que precisa ser igual para reaproveitar a resposta, mesmo com cosseno alto:
+    se a pergunta é negativa e os números citados ("quanto custa?" x "quanto custam 10?").
+    """
+    negativa = any(token in NEGACOES for token in tokens)
+    numeros = sorted({token for token in tokens if token.isdigit()})
+    return zlib.crc32(f"{int(negativa)}\x1f{' '.join(numeros)}".encode())
+
+
+class IndiceSimilaridade:
+    """Índice limitado (buffer circular) de perguntas já respondidas."""
+
+    def __init__(
+        self,
+        capacidade: int = 1000,
+        dimensao: int = 1024,
+        limiar: float = 0.85,
+        ttl_segundos: float = 3600
+    ):
+        """
+        Args:
+            capacidade: Máximo de perguntas no índice (as mais antigas são sobrescritas)
+            dimensao: Tamanho dos vetores (hashing trick)
+            limiar: Similaridade de cosseno mínima para reaproveitar a resposta
+            ttl_segundos: Tempo de vida de cada resposta
+        """
+        if np is None:
+            raise ImportError("numpy é necessário para o cache por similaridade")
+
+        self.capacidade = capacidade
+        self.dimensao = dimensao
+        self.limiar = limiar
+        self.ttl_segundos = ttl_segundos
+
+        self.matriz = np.zeros((capacidade, dimensao), dtype=np.float32)
+        self.escopos = np.zeros(capacidade, dtype=np.int64)
+        self.assinaturas = np.zeros(capacidade, dtype=np.int64)
+        self.expira_em = np.zeros(capacidade, dtype=np.float64)
+        self.respostas: List[Optional[str]] = [None] * capacidade
+        self.perguntas: List[Optional[str]] = [None] * capacidade
+        self.ocupados = 0
+        self.proximo = 0
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latencias_ms: deque = deque(maxlen=1000)
+
+    def vetorizar(self, texto: str):
+        """Vetor L2-normalizado (palavras peso 1, trigramas de caracteres peso 0.5) ou None se vazio."""
+        return self._vetor(tokenizar(texto))
+
+    def _vetor(self, tokens: List[str]):
+        if not tokens:
+            return None
+
+        vetor = np.zeros(self.dimensao, dtype=np.float32)
+        for token in tokens:
+            vetor[zlib.crc32(b'w:' + token.encode()) % self.dimensao] += 1.0
+            marcado = f" {token} "
+            for i in range(len(marcado) - 2):
+                vetor[zlib.crc32(marcado[i:i + 3].encode()) % self.dimensao] += 0.5
+
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma else None
+
+    @staticmethod
+    def escopo(system_prompt: str = '', modelo: str = '') -> int:
+        """Identificador do contexto (respostas só são reaproveitadas no mesmo system prompt/modelo)."""
+        return zlib.crc32(f"{system_prompt}\x1f{modelo}".encode())
+
+    def _melhor(self, vetor, escopo: int, chave: int) -> Tuple[int, float]:
+        """Índice e similaridade da melhor pergunta válida no mesmo escopo e assinatura (-1 se nenhuma)."""
+        n = self.ocupados
+        if n == 0:
+            return -1, 0.0
+        similaridades = self.matriz[:n] @ vetor
+        invalidas = (
+            (self.escopos[:n] != escopo)
+            | (self.assinaturas[:n] != chave)
+            | (self.expira_em[:n] <= time.time())
+        )
+        similaridades[invalidas] = -1.0
+        melhor = int(np.argmax(similaridades))
+        return melhor, float(similaridades[melhor])
+
+    def buscar(
+        self,
+        texto: str,
+        system_prompt: str = '',
+        modelo: str = '',
+        limiar: Optional[float] = None
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Procurar pergunta parecida já respondida.
+
+        Args:
+            limiar: Similaridade mínima só desta busca (padrão: self.limiar)
+
+        Returns:
+            (resposta, similaridade) se acima do limiar, senão None
+        """
+        inicio = time.perf_counter()
+        tokens = tokenizar(texto)
+        vetor = self._vetor(tokens)
+        with self._lock:
+            resultado = None
+            if vetor is not None:
+                indice, similaridade = self._melhor(vetor, self.escopo(system_prompt, modelo), assinatura(tokens))
+                if indice >= 0 and similaridade >= (self.limiar if limiar is None else limiar):
+                    resultado = (self.respostas[indice], similaridade)
+
+            if resultado:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.latencias_ms.append((time.perf_counter() - inicio) * 1000)
+        return resultado
+
+    def adicionar(self, texto: str, system_prompt: str, modelo: str, resposta: str):
+        """Indexar pergunta respondida (quase-duplicatas substituem a entrada existente)."""
+        tokens = tokenizar(texto)
+        vetor = self._vetor(tokens)
+        if vetor is None:
+            return
+        escopo = self.escopo(system_prompt, modelo)
+        chave = assinatura(tokens)
+
+        with self._lock:
+            indice, similaridade = self._melhor(vetor, escopo, chave)
+            if indice < 0 or similaridade < 0.98:
+                indice = self.proximo
+                self.proximo = (self.proximo + 1) % self.capacidade
+                self.ocupados = min(self.ocupados + 1, self.capacidade)
+
+            self.matriz[indice] = vetor
+            self.escopos[indice] = escopo
+            self.assinaturas[indice] = chave
+            self.expira_em[indice] = time.time() + self.ttl_segundos
+            self.respostas[indice] = resposta
+            self.perguntas[indice] = texto
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Métricas do índice para o /status."""
+        with self._lock:
+            latencias = sorted(self.latencias_ms)
+            total = self.hits + self.misses
+            return {
+                'itens': self.ocupados,
+                'capacidade': self.capacidade,
+                'limiar': self.limiar,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+                'busca_p50_ms': round(latencias[len(latencias) // 2], 3) if latencias else 0.0,
+                'busca_p99_ms': round(latencias[int(len(latencias) * 0.99) - 1], 3) if latencias else 0.0,
+            }
+
+
+_indice_compartilhado: Optional[IndiceSimilaridade] = None
+_lock_global = threading.Lock()
+
+
+def obter_indice_similaridade() -> Optional[IndiceSimilaridade]:
+    """Índice único do processo (None se numpy não estiver instalado ou AI_SIMILARIDADE_ATIVO=false)."""
+    global _indice_compartilhado
+    if np is None or os.getenv('AI_SIMILARIDADE_ATIVO', 'true').lower() != 'true':
+        return None
+    if _indice_compartilhado is None:
+        with _lock_global:
+            if _indice_compartilhado is None:
+                _indice_compartilhado = IndiceSimilaridade(
+                    capacidade=int(os.getenv('AI_SIMILARIDADE_CAPACIDADE', '1000')),
+                    limiar=float(os.getenv('AI_SIMILARIDADE_LIMIAR', '0.85')),
+                    ttl_segundos=float(os.getenv('AI_CACHE_TTL', '3600'))
+                )
+    return _indice_compartilhado
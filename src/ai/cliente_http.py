@@ -0,0 +1,180 @@
+"""
+Cliente HTTP compartilhado para o endpoint de chat do GitHub Models
+Mantém um pool de conexões keep-alive para não pagar um handshake TCP+TLS a cada resposta
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401 - só para saber se o httpx consegue negociar HTTP/2
+    HTTP2_DISPONIVEL = True
+except ImportError:
+    HTTP2_DISPONIVEL = False
+
+
+GITHUB_MODELS_URL = os.getenv('GITHUB_MODELS_URL', "https://models.inference.ai.azure.com/chat/completions")
+
+
+class ErroHTTPModelo(Exception):
+    """Resposta HTTP de erro do endpoint de modelos."""
+
+    def __init__(self, status_code: int, texto: str = '', headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status_code}: {texto[:200]}")
+        self.status_code = status_code
+        self.texto = texto
+        self.headers = headers or {}
+
+
+class ClienteModelosGitHub:
+    """Sessão HTTP com pool de conexões para as chamadas de chat completion."""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        max_conexoes: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        http2: Optional[bool] = None,
+        backend: Optional[str] = None,
+        verificar_tls: Any = True
+    ):
+        """
+        Args:
+            url: Endpoint de chat completions (padrão: GITHUB_MODELS_URL)
+            max_conexoes: Máximo de conexões simultâneas (AI_HTTP_MAX_CONEXOES, padrão 20)
+            max_keepalive: Conexões ociosas mantidas abertas (AI_HTTP_MAX_KEEPALIVE, padrão 10)
+            http2: Usar HTTP/2 (AI_HTTP2; padrão: se httpx + h2 estiverem instalados)
+            backend: 'httpx' ou 'requests' (AI_HTTP_BACKEND; padrão: httpx se instalado)
+            verificar_tls: Verificação do certificado (True, False ou caminho do CA)
+        """
+        self.url = url or GITHUB_MODELS_URL
+        self.verificar_tls = verificar_tls
+        self.max_conexoes = max_conexoes or int(os.getenv('AI_HTTP_MAX_CONEXOES', '20'))
+        self.max_keepalive = max_keepalive or int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '10'))
+
+        backend = backend or os.getenv('AI_HTTP_BACKEND', '')
+        if not backend:
+            backend = 'httpx' if httpx else 'requests'
+        if backend == 'httpx' and not httpx:
+            print("⚠️ httpx não instalado - usando requests.Session")
+            backend = 'requests'
+        self.backend = backend
+
+        if http2 is None:
+            http2 = os.getenv('AI_HTTP2', 'auto').lower()
+            http2 = HTTP2_DISPONIVEL if http2 == 'auto' else http2 == 'true'
+        self.http2 = bool(http2 and HTTP2_DISPONIVEL and self.backend == 'httpx')
+
+        if self.backend == 'httpx':
+            self._cliente = httpx.Client(
+                http2=self.http2,
+                verify=verificar_tls,
+                limits=httpx.Limits(
+                    max_connections=self.max_conexoes,
+                    max_keepalive_connections=self.max_keepalive
+                )
+            )
+        else:
+            self._cliente = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=self.max_keepalive, pool_maxsize=self.max_conexoes)
+            self._cliente.mount('https://', adaptador)
+            self._cliente.mount('http://', adaptador)
+
+    def _headers(self, token: Optional[str]) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {token or os.getenv('GITHUB_TOKEN', '')}",
+            "Content-Type": "application/json"
+        }
+
+    def post_chat(
+        self,
+        payload: Dict[str, Any],
+        token: Optional[str] = None,
+        url: Optional[str] = None,
+        timeout: float = 30
+    ):
+        """
+        POST de chat completion reaproveitando as conexões do pool.
+
+        Args:
+            payload: Corpo da requisição (model, messages, ...)
+            token: Token do GitHub (padrão: GITHUB_TOKEN)
+            url: Endpoint (padrão: self.url)
+            timeout: Timeout em segundos
+
+        Returns:
+            Response (requests ou httpx - ambos têm status_code, json(), text e headers)
+        """
+        extras = {}
+        if self.backend == 'requests':
+            # Na Session o verify precisa ir por chamada (REQUESTS_CA_BUNDLE sobrescreveria o da sessão)
+            extras['verify'] = self.verificar_tls
+        return self._cliente.post(url or self.url, headers=self._headers(token), json=payload, timeout=timeout, **extras)
+
+    def stream_chat(
+        self,
+        payload: Dict[str, Any],
+        token: Optional[str] = None,
+        url: Optional[str] = None,
+        timeout: float = 30
+    ) -> Iterator[str]:
+        """
+        POST de chat completion com stream=True, devolvendo as linhas SSE conforme chegam.
+
+        Raises:
+            ErroHTTPModelo: Se o endpoint responder com status diferente de 200
+        """
+        payload = dict(payload, stream=True)
+        if self.backend == 'httpx':
+            with self._cliente.stream('POST', url or self.url, headers=self._headers(token),
+                                      json=payload, timeout=timeout) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise ErroHTTPModelo(response.status_code, response.text, dict(response.headers))
+                yield from response.iter_lines()
+        else:
+            response = self._cliente.post(url or self.url, headers=self._headers(token), json=payload,
+                                          timeout=timeout, stream=True, verify=self.verificar_tls)
+            with response:
+                if response.status_code != 200:
+                    raise ErroHTTPModelo(response.status_code, response.text, dict(response.headers))
+                # SSE é sempre UTF-8; sem charset no Content-Type o requests assumiria ISO-8859-1 (text/*)
+                response.encoding = 'utf-8'
+                for linha in response.iter_lines(decode_unicode=True):
+                    yield linha
+
+    def fechar(self):
+        """Fechar todas as conexões do pool."""
+        self._cliente.close()
+
+    def info(self) -> Dict[str, Any]:
+        """Configuração ativa (para o /status)."""
+        return {
+            'backend': self.backend,
+            'http2': self.http2,
+            'max_conexoes': self.max_conexoes,
+            'max_keepalive': self.max_keepalive
+        }
+
+
+_cliente_compartilhado: Optional[ClienteModelosGitHub] = None
+_lock = threading.Lock()
+
+
+def obter_cliente_modelos() -> ClienteModelosGitHub:
+    """Cliente único do processo (webhook, GitHubCopilotClient e chatbot usam o mesmo pool)."""
+    global _cliente_compartilhado
+    if _cliente_compartilhado is None:
+        with _lock:
+            if _cliente_compartilhado is None:
+                _cliente_compartilhado = ClienteModelosGitHub()
+    return _cliente_compartilhado
@@ -0,0 +1,157 @@
+"""
+Montagem do contexto da conversa para a IA dentro de um orçamento de tokens
+Mantém os turnos mais recentes inteiros; os mais antigos viram um resumo curto ou são descartados
+"""
+
+import math
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+# Média de caracteres por token em português nos modelos GPT-4o (estimativa local, sem tokenizer)
+CARACTERES_POR_TOKEN = 3.6
+# Custo fixo de cada mensagem no formato de chat (role, separadores)
+TOKENS_POR_MENSAGEM = 4
+
+_PRIMEIRA_FRASE = re.compile(r'^(.+?[.!?…])(\s|$)', re.S)
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa rápida de tokens de um texto (caracteres / 3.6, arredondado para cima)."""
+    if not texto:
+        return 0
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def tokens_mensagens(mensagens: List[Dict[str, str]]) -> int:
+    """Estimativa de tokens de uma lista de mensagens de chat."""
+    return sum(estimar_tokens(m.get('content', '')) + TOKENS_POR_MENSAGEM for m in mensagens) + 3
+
+
+def resumir_turnos(turnos: List[Dict[str, str]], max_tokens: int) -> Tuple[Optional[str], int]:
+    """
+    Resumo extrativo dos turnos antigos: primeira frase de cada fala, do mais recente
+    para o mais antigo, até caber em max_tokens.
+
+    Returns:
+        (texto do resumo ou None se nada couber, quantidade de turnos resumidos)
+    """
+    cabecalho = "Resumo da conversa anterior:"
+    restante = max_tokens - estimar_tokens(cabecalho)
+    linhas = []
+    for turno in reversed(turnos):
+        texto = ' '.join(turno['content'].split())
+        frase = _PRIMEIRA_FRASE.match(texto)
+        frase = frase.group(1) if frase else texto
+        if len(frase) > 160:
+            frase = frase[:157].rstrip() + '...'
+        linha = f"- {'Cliente' if turno['role'] == 'user' else 'Atendente'}: {frase}"
+        custo = estimar_tokens(linha) + 1
+        if custo > restante:
+            break
+        linhas.append(linha)
+        restante -= custo
+    if not linhas:
+        return None, 0
+    return '\n'.join([cabecalho] + list(reversed(linhas))), len(linhas)
+
+
+def montar_contexto(
+    system_prompt: str,
+    historico: List[Dict[str, str]],
+    mensagem: str,
+    orcamento_tokens: int = 1500,
+    fracao_resumo: float = 0.25
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Montar as mensagens da chat completion respeitando o orçamento de tokens.
+
+    Args:
+        system_prompt: Prompt de sistema
+        historico: Turnos anteriores em ordem cronológica ({'role': 'user'|'assistant', 'content': ...})
+        mensagem: Mensagem atual do cliente
+        orcamento_tokens: Máximo estimado de tokens do prompt (sem contar a resposta)
+        fracao_resumo: Parte do orçamento que o resumo dos turnos antigos pode ocupar
+
+    Returns:
+        (mensagens, info) - info tem tokens_prompt, turnos_incluidos, turnos_resumidos e turnos_descartados
+    """
+    fixas = [{'role': 'system', 'content': system_prompt}, {'role': 'user', 'content': mensagem}]
+    disponivel = orcamento_tokens - tokens_mensagens(fixas)
+    custos = [estimar_tokens(t['content']) + TOKENS_POR_MENSAGEM for t in historico]
+
+    # Se o histórico inteiro não cabe, reservar parte do orçamento para o resumo dos antigos
+    reserva = int(orcamento_tokens * fracao_resumo) if sum(custos) > disponivel else 0
+    disponivel -= reserva
+
+    # Do mais recente para o mais antigo, enquanto couber
+    recentes = []
+    for turno, custo in zip(reversed(historico), reversed(custos)):
+        if custo > disponivel:
+            break
+        recentes.append(turno)
+        disponivel -= custo
+    recentes.reverse()
+
+    antigos = historico[:len(historico) - len(recentes)]
+    resumo, resumidos = None, 0
+    limite = disponivel + reserva - TOKENS_POR_MENSAGEM
+    if antigos and limite > 0:
+        resumo, resumidos = resumir_turnos(antigos, limite)
+
+    mensagens = [fixas[0]]
+    if resumo:
+        mensagens.append({'role': 'system', 'content': resumo})
+    mensagens.extend({'role': t['role'], 'content': t['content']} for t in recentes)
+    mensagens.append(fixas[1])
+
+    return mensagens, {
+        'tokens_prompt': tokens_mensagens(mensagens),
+        'turnos_incluidos': len(recentes),
+        'turnos_resumidos': resumidos,
+        'turnos_descartados': len(antigos) - resumidos
+    }
+
+
+class MetricasContexto:
+    """Tempo de montagem e tamanho do prompt (janela das últimas montagens)."""
+
+    def __init__(self, janela: int = 1000):
+        self._lock = threading.Lock()
+        self.montagem_ms: deque = deque(maxlen=janela)
+        self.tokens_prompt: deque = deque(maxlen=janela)
+        self.turnos: deque = deque(maxlen=janela)
+        self.montagens = 0
+        self.resumos = 0
+
+    def registrar(self, montagem_ms: float, info: Dict[str, Any]):
+        with self._lock:
+            self.montagens += 1
+            self.montagem_ms.append(montagem_ms)
+            self.tokens_prompt.append(info['tokens_prompt'])
+            self.turnos.append(info['turnos_incluidos'])
+            if info['turnos_resumidos']:
+                self.resumos += 1
+
+    @staticmethod
+    def _percentil(valores: List[float], p: float) -> float:
+        if not valores:
+            return 0.0
+        valores = sorted(valores)
+        return round(valores[min(len(valores) - 1, int(len(valores) * p))], 2)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Métricas para o /status."""
+        with self._lock:
+            montagem, tokens, turnos = list(self.montagem_ms), list(self.tokens_prompt), list(self.turnos)
+            return {
+                'montagens': self.montagens,
+                'com_resumo': self.resumos,
+                'montagem_p50_ms': self._percentil(montagem, 0.5),
+                'montagem_p95_ms': self._percentil(montagem, 0.95),
+                'tokens_prompt_p50': self._percentil(tokens, 0.5),
+                'tokens_prompt_p95': self._percentil(tokens, 0.95),
+                'tokens_prompt_max': max(tokens) if tokens else 0,
+                'turnos_medio': round(sum(turnos) / len(turnos), 1) if turnos else 0.0
+            }
@@ -0,0 +1,327 @@
+"""
+Extração tolerante do JSON de CRM nas respostas dos modelos
+Acha o objeto JSON no meio de texto (cerca ```json, frase antes/depois), valida e
+normaliza os campos do CRM e funciona de forma incremental durante o streaming,
+para a leitura parar assim que o objeto fecha
+"""
+
+import json
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class ErroExtracaoJSON(ValueError):
+    """Resposta sem objeto JSON aproveitável (ou fora do esquema do CRM)."""
+
+    def __init__(self, mensagem: str, motivo: str):
+        super().__init__(mensagem)
+        self.motivo = motivo
+
+
+def _remover_virgulas_finais(trecho: str) -> str:
+    """Tirar vírgulas antes de } ou ] (fora de strings), erro comum dos modelos."""
+    saida = []
+    em_string = escapado = False
+    for i, c in enumerate(trecho):
+        if em_string:
+            if escapado:
+                escapado = False
+            elif c == '\\':
+                escapado = True
+            elif c == '"':
+                em_string = False
+        elif c == '"':
+            em_string = True
+        elif c == ',':
+            seguinte = trecho[i + 1:].lstrip()
+            if seguinte[:1] in ('}', ']'):
+                continue
+        saida.append(c)
+    return ''.join(saida)
+
+
+def _interpretar_trecho(trecho: str) -> Tuple[Optional[Any], bool]:
+    """(objeto, se precisou de reparo) ou (None, False) se o trecho não é JSON."""
+    try:
+        return json.loads(trecho), False
+    except ValueError:
+        pass
+    try:
+        return json.loads(_remover_virgulas_finais(trecho)), True
+    except ValueError:
+        return None, False
+
+
+class ExtratorIncremental:
+    """
+    Varre o texto à medida que chega e devolve o primeiro objeto JSON válido
+    assim que as chaves se equilibram (sem esperar o fim da resposta).
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.resultado: Optional[Dict[str, Any]] = None
+        self.reparado = False
+        self.fim: Optional[int] = None
+        self._posicao = 0
+        self._inicio: Optional[int] = None
+        self._profundidade = 0
+        self._em_string = False
+        self._escapado = False
+
+    @property
+    def concluido(self) -> bool:
+        return self.resultado is not None
+
+    def alimentar(self, trecho: str) -> Optional[Dict[str, Any]]:
+        """
+        Acrescentar um pedaço da resposta.
+
+        Returns:
+            O objeto, na chamada em que ele fica completo (None enquanto não fecha)
+        """
+        if self.concluido:
+            return None
+        self.buffer += trecho
+        while self._posicao < len(self.buffer):
+            c = self.buffer[self._posicao]
+            self._posicao += 1
+            if self._inicio is None:
+                if c == '{':
+                    self._inicio, self._profundidade = self._posicao - 1, 1
+                continue
+            if self._em_string:
+                if self._escapado:
+                    self._escapado = False
+                elif c == '\\':
+                    self._escapado = True
+                elif c == '"':
+                    self._em_string = False
+            elif c == '"':
+                self._em_string = True
+            elif c in '{[':
+                self._profundidade += 1
+            elif c in '}]':
+                self._profundidade -= 1
+                if self._profundidade == 0:
+                    objeto, reparado = _interpretar_trecho(self.buffer[self._inicio:self._posicao])
+                    if isinstance(objeto, dict):
+                        self.resultado, self.reparado, self.fim = objeto, reparado, self._posicao
+                        return objeto
+                    # Chaves equilibradas mas não é JSON (ex: "{nome}" numa frase): procura o próximo
+                    self._posicao = self._inicio + 1
+                    self._inicio = None
+        return None
+
+    def reexaminar(self) -> Optional[Dict[str, Any]]:
+        """
+        Fim do texto com um candidato ainda aberto: uma "{" solta na frase antes do objeto
+        engole o resto da resposta. Recomeça logo depois dela até achar um objeto ou acabar.
+
+        Returns:
+            O objeto (None se nenhum candidato fecha)
+        """
+        while not self.concluido and self._inicio is not None:
+            self._posicao, self._inicio = self._inicio + 1, None
+            self._profundidade, self._em_string, self._escapado = 0, False, False
+            self.alimentar('')
+        return self.resultado
+
+    def finalizar(self) -> Dict[str, Any]:
+        """
+        Objeto encontrado ou erro (ao fim da resposta).
+
+        Raises:
+            ErroExtracaoJSON: Nenhum objeto JSON completo no texto
+        """
+        if self.resultado is not None:
+            return self.resultado
+        incompleto = self._inicio is not None
+        if self.reexaminar() is not None:
+            return self.resultado
+        motivo = 'json_incompleto' if incompleto else 'sem_json'
+        raise ErroExtracaoJSON(f"Nenhum objeto JSON completo na resposta ({len(self.buffer)} caracteres)", motivo)
+
+
+def extrair_objeto_json(texto: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Primeiro objeto JSON dentro de um texto qualquer.
+
+    Returns:
+        (objeto, se veio "sujo": texto em volta, cerca de markdown ou vírgula sobrando)
+
+    Raises:
+        ErroExtracaoJSON: Nenhum objeto JSON válido
+    """
+    texto = texto or ''
+    try:
+        objeto = json.loads(texto)
+        if isinstance(objeto, dict):
+            return objeto, False
+    except ValueError:
+        pass
+    extrator = ExtratorIncremental()
+    extrator.alimentar(texto)
+    return extrator.finalizar(), True
+
+
+# Campos do CRM: seção -> subcampos (None = campo de texto no primeiro nível)
+ESQUEMA_CRM = {
+    'contato': ('nome', 'empresa'),
+    'lead': ('identificador', 'status'),
+    'proxima_acao': ('acao', 'data'),
+    'sentimento': None,
+    'observacoes': None,
+}
+
+SENTIMENTOS = ('positivo', 'neutro', 'negativo')
+_SINONIMOS_SENTIMENTO = {
+    'positive': 'positivo', 'bom': 'positivo', 'otimo': 'positivo',
+    'neutral': 'neutro', 'neutra': 'neutro',
+    'negative': 'negativo', 'ruim': 'negativo', 'negativa': 'negativo', 'positiva': 'positivo',
+}
+
+
+def _texto_ou_none(valor: Any) -> Optional[str]:
+    """Valor de campo de texto: números viram string, vazio/"null" vira None."""
+    if valor is None or isinstance(valor, (dict, list)):
+        return None
+    valor = str(valor).strip()
+    return None if valor.lower() in ('', 'null', 'none', 'n/a', '-') else valor
+
+
+def validar_crm(dados: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Conferir e normalizar o objeto contra o esquema do CRM.
+
+    Campos ausentes viram None, tipos são corrigidos e o sentimento é levado
+    para positivo/neutro/negativo. Campos fora do esquema são ignorados.
+
+    Returns:
+        (informações no formato do CRM, lista de correções feitas)
+
+    Raises:
+        ErroExtracaoJSON: Não é um objeto ou não tem nenhum campo do CRM
+    """
+    if not isinstance(dados, dict):
+        raise ErroExtracaoJSON(f"JSON não é um objeto ({type(dados).__name__})", 'esquema')
+    if not any(campo in dados for campo in ESQUEMA_CRM):
+        raise ErroExtracaoJSON(f"JSON sem campos do CRM: {sorted(dados)[:5]}", 'esquema')
+
+    correcoes = []
+    informacoes: Dict[str, Any] = {}
+    for campo, subcampos in ESQUEMA_CRM.items():
+        valor = dados.get(campo)
+        if subcampos is None:
+            continue
+        if valor is not None and not isinstance(valor, dict):
+            # Ex: "contato": "João" -> contato.nome
+            correcoes.append(f"{campo}: texto no lugar de objeto")
+            valor = {subcampos[0]: valor}
+        elif valor is None:
+            correcoes.append(f"{campo}: ausente")
+            valor = {}
+        informacoes[campo] = {sub: _texto_ou_none(valor.get(sub)) for sub in subcampos}
+
+    bruto = _texto_ou_none(dados.get('sentimento'))
+    sentimento = None
+    if bruto:
+        sentimento = ''.join(c for c in unicodedata.normalize('NFKD', bruto) if not unicodedata.combining(c)).lower()
+        sentimento = _SINONIMOS_SENTIMENTO.get(sentimento, sentimento)
+    if sentimento not in SENTIMENTOS:
+        correcoes.append(f"sentimento: {bruto!r} -> 'neutro'")
+        sentimento = 'neutro'
+    informacoes['sentimento'] = sentimento
+
+    observacoes = dados.get('observacoes')
+    if isinstance(observacoes, list):
+        correcoes.append("observacoes: lista unida em texto")
+        observacoes = '; '.join(str(item) for item in observacoes)
+    informacoes['observacoes'] = _texto_ou_none(observacoes)
+    return informacoes, correcoes
+
+
+class MetricasExtracao:
+    """Respostas aproveitadas direto, recuperadas do meio do texto ou perdidas (por motivo)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.respostas = 0
+        self.diretas = 0
+        self.recuperadas = 0
+        self.com_correcoes = 0
+        self.falhas: Dict[str, int] = {}
+
+    def registrar(self, recuperada: bool, correcoes: int):
+        with self._lock:
+            self.respostas += 1
+            if recuperada:
+                self.recuperadas += 1
+            else:
+                self.diretas += 1
+            if correcoes:
+                self.com_correcoes += 1
+
+    def registrar_falha(self, motivo: str):
+        with self._lock:
+            self.respostas += 1
+            self.falhas[motivo] = self.falhas.get(motivo, 0) + 1
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores e taxa de falha (chamadas pagas sem JSON aproveitável)."""
+        with self._lock:
+            falhas = sum(self.falhas.values())
+            return {
+                'respostas': self.respostas,
+                'diretas': self.diretas,
+                'recuperadas': self.recuperadas,
+                'com_correcoes': self.com_correcoes,
+                'falhas': dict(self.falhas),
+                'taxa_falha': round(falhas / self.respostas, 4) if self.respostas else 0.0,
+                'taxa_recuperada': round(self.recuperadas / self.respostas, 4) if self.respostas else 0.0
+            }
+
+
+_metricas = MetricasExtracao()
+
+
+def obter_metricas_extracao() -> MetricasExtracao:
+    """Métricas de extração do processo (CRM via API, lote e simulação)."""
+    return _metricas
+
+
+def interpretar_crm(texto: str) -> Dict[str, Any]:
+    """
+    JSON de CRM de uma resposta do modelo: extrai, valida, normaliza e contabiliza.
+
+    Raises:
+        ErroExtracaoJSON: Resposta sem JSON aproveitável (o lote pode retentar)
+    """
+    try:
+        dados, recuperada = extrair_objeto_json(texto)
+        informacoes, correcoes = validar_crm(dados)
+    except ErroExtracaoJSON as e:
+        _metricas.registrar_falha(e.motivo)
+        raise
+    if recuperada or correcoes:
+        print(f"🧩 JSON do CRM {'recuperado do texto' if recuperada else 'lido'}"
+              f"{' com correções: ' + ', '.join(correcoes) if correcoes else ''}")
+    _metricas.registrar(recuperada, len(correcoes))
+    return informacoes
+
+
+def ler_json_em_streaming(deltas: Iterable[str]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Consumir deltas até o objeto JSON fechar (o resto da resposta não é lido).
+
+    Returns:
+        (texto até o fim do objeto ou texto inteiro, objeto ou None se não fechou)
+    """
+    extrator = ExtratorIncremental()
+    for delta in deltas:
+        if extrator.alimentar(delta) is not None:
+            return extrator.buffer[:extrator.fim], extrator.resultado
+    if extrator.reexaminar() is not None:
+        return extrator.buffer[:extrator.fim], extrator.resultado
+    return extrator.buffer, None
@@ -0,0 +1,149 @@
+"""
+Motor de intenções por palavras-chave para as respostas locais (sem IA)
+Todas as palavras de todas as regras viram uma única regex em forma de trie,
+percorrida uma vez só por texto (sem acento, minúsculo)
+"""
+
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def dobrar_texto(texto: str) -> str:
+    """Texto sem acentos e em minúsculas (mesmo comprimento de busca para regras e mensagens)."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
+def _regex_trie(palavras: List[str]) -> str:
+    """Alternância fatorada por prefixo: ['parcela', 'parcelado'] -> 'parcela(?:do)?'."""
+    trie: Dict[str, Any] = {}
+    for palavra in palavras:
+        no = trie
+        for c in palavra:
+            no = no.setdefault(c, {})
+        no[''] = True
+
+    def montar(no: Dict[str, Any]) -> str:
+        fim = '' in no
+        ramos = [re.escape(c) + montar(filho) for c, filho in sorted(no.items()) if c]
+        if not ramos:
+            return ''
+        corpo = ramos[0] if len(ramos) == 1 else '(?:' + '|'.join(ramos) + ')'
+        if fim:
+            # Guloso: prefere a palavra mais longa; as mais curtas são recuperadas pelos prefixos
+            corpo = f'(?:{corpo})?' if len(ramos) == 1 and len(ramos[0]) > 1 else corpo + '?'
+        return corpo
+
+    return montar(trie)
+
+
+class MotorIntencoes:
+    """Casamento de várias intenções em uma passada, com pontuação por intenção."""
+
+    def __init__(self, regras: List[Dict[str, Any]]):
+        """
+        Args:
+            regras: Lista de regras na ordem de prioridade, cada uma com
+                    nome, palavras, e opcionalmente grupo, peso e palavra_inteira
+        """
+        self.regras = []
+        # palavra -> [(indice da regra, peso, palavra_inteira)]
+        por_palavra: Dict[str, List[Tuple[int, float, bool]]] = {}
+
+        for prioridade, regra in enumerate(regras):
+            self.regras.append({
+                'nome': regra['nome'],
+                'grupo': regra.get('grupo'),
+                'prioridade': prioridade,
+                'dados': {k: v for k, v in regra.items()
+                          if k not in ('nome', 'grupo', 'palavras', 'peso', 'palavra_inteira')}
+            })
+            peso = float(regra.get('peso', 1.0))
+            inteira = bool(regra.get('palavra_inteira', False))
+            for palavra in regra['palavras']:
+                palavra = dobrar_texto(palavra).strip()
+                if palavra:
+                    por_palavra.setdefault(palavra, []).append((prioridade, peso, inteira))
+
+        # Um casamento da palavra mais longa também vale para as palavras que são prefixo dela
+        self._alvos: Dict[str, List[Tuple[int, str, int, float, bool]]] = {}
+        for palavra in por_palavra:
+            alvos = []
+            for tamanho in range(1, len(palavra) + 1):
+                for prioridade, peso, inteira in por_palavra.get(palavra[:tamanho], []):
+                    alvos.append((tamanho, palavra[:tamanho], prioridade, peso, inteira))
+            self._alvos[palavra] = alvos
+
+        self.total_palavras = len(por_palavra)
+        padrao = _regex_trie(list(por_palavra)) if por_palavra else r'(?!)'
+        # Lookahead: um casamento por posição, inclusive sobrepostos ("parcelamento" e "lamento")
+        self._regex = re.compile(f'(?=({padrao}))')
+
+    @classmethod
+    def carregar(cls, arquivo: Path) -> 'MotorIntencoes':
+        """Carregar regras de um arquivo JSON ({"intencoes": [...]} ou lista)."""
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        return cls(dados['intencoes'] if isinstance(dados, dict) else dados)
+
+    @staticmethod
+    def _eh_letra(texto: str, posicao: int) -> bool:
+        return 0 <= posicao < len(texto) and texto[posicao].isalnum()
+
+    def analisar(self, texto: str) -> List[Dict[str, Any]]:
+        """
+        Todas as intenções presentes no texto.
+
+        Returns:
+            Lista de {intencao, grupo, pontuacao, palavras, prioridade, dados},
+            da maior para a menor pontuação (empate: ordem do arquivo)
+        """
+        texto = dobrar_texto(texto)
+        pontuacao: Dict[int, float] = {}
+        palavras: Dict[int, set] = {}
+
+        for casamento in self._regex.finditer(texto):
+            inicio = casamento.start()
+            for tamanho, palavra, prioridade, peso, inteira in self._alvos[casamento.group(1)]:
+                if inteira and (self._eh_letra(texto, inicio - 1) or self._eh_letra(texto, inicio + tamanho)):
+                    continue
+                encontradas = palavras.setdefault(prioridade, set())
+                if palavra not in encontradas:
+                    encontradas.add(palavra)
+                    pontuacao[prioridade] = pontuacao.get(prioridade, 0.0) + peso
+
+        resultado = []
+        for prioridade, pontos in pontuacao.items():
+            regra = self.regras[prioridade]
+            resultado.append({
+                'intencao': regra['nome'],
+                'grupo': regra['grupo'],
+                'pontuacao': round(pontos, 3),
+                'palavras': sorted(palavras[prioridade]),
+                'prioridade': prioridade,
+                'dados': regra['dados']
+            })
+        resultado.sort(key=lambda r: (-r['pontuacao'], r['prioridade']))
+        return resultado
+
+    @staticmethod
+    def primeira_por_grupo(analise: List[Dict[str, Any]]) -> Dict[Optional[str], Dict[str, Any]]:
+        """Intenção de maior prioridade (ordem do arquivo) de cada grupo numa análise."""
+        escolhidas: Dict[Optional[str], Dict[str, Any]] = {}
+        for item in sorted(analise, key=lambda r: r['prioridade']):
+            escolhidas.setdefault(item['grupo'], item)
+        return escolhidas
+
+    def primeira(self, texto: str, grupo: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Intenção de maior prioridade do grupo (mesmo resultado da antiga cadeia de if/elif)."""
+        return self.primeira_por_grupo(self.analisar(texto)).get(grupo)
+
+
+@lru_cache(maxsize=None)
+def carregar_motor(arquivo: str) -> MotorIntencoes:
+    """Motor compilado uma vez por arquivo de regras no processo."""
+    return MotorIntencoes.carregar(Path(arquivo))
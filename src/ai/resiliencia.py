@@ -0,0 +1,311 @@
+"""
+Resiliência das chamadas aos modelos de IA: limite de chamadas simultâneas,
+novas tentativas com backoff exponencial + jitter (respeitando Retry-After)
+e disjuntor (circuit breaker) que falha rápido enquanto o endpoint está instável
+"""
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+# Respostas que valem nova tentativa (sobrecarga / erro temporário do servidor)
+STATUS_RETENTAVEIS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitoAberto(Exception):
+    """Chamada recusada sem tentar: o disjuntor está aberto."""
+
+
+class LimiteSimultaneas(Exception):
+    """Nenhuma vaga livre no limite de chamadas simultâneas dentro do tempo de espera."""
+
+
+def interpretar_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Segundos indicados no header Retry-After (número ou data HTTP), ou None."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def calcular_espera(tentativa: int, base: float, maximo: float, retry_after: Optional[float] = None) -> float:
+    """
+    Espera antes da próxima tentativa.
+
+    Args:
+        tentativa: Número da tentativa que falhou (0 = primeira)
+        base: Espera base em segundos (dobra a cada tentativa)
+        maximo: Teto da espera do backoff
+        retry_after: Valor do Retry-After, que tem prioridade sobre o backoff e é
+                     respeitado por inteiro (quem chama desiste se passar do prazo)
+
+    Returns:
+        Segundos a esperar ("full jitter": aleatório entre 0 e o backoff exponencial)
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(maximo, base * (2 ** tentativa)))
+
+
+class Disjuntor:
+    """Circuit breaker: fechado -> aberto após N falhas seguidas -> meio_aberto (uma chamada de teste)."""
+
+    def __init__(self, limite_falhas: int = 5, tempo_aberto: float = 30.0):
+        """
+        Args:
+            limite_falhas: Falhas consecutivas para abrir o circuito
+            tempo_aberto: Segundos recusando chamadas antes de liberar uma de teste
+        """
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.estado = 'fechado'
+        self.falhas_consecutivas = 0
+        self.aberto_em = 0.0
+        self.teste_em_andamento = False
+        self.aberturas = 0
+        self.recusadas = 0
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        """Verificar se uma chamada pode seguir (no meio_aberto só uma por vez)."""
+        with self._lock:
+            if self.estado == 'aberto':
+                if time.monotonic() - self.aberto_em < self.tempo_aberto:
+                    self.recusadas += 1
+                    return False
+                self.estado = 'meio_aberto'
+                self.teste_em_andamento = False
+
+            if self.estado == 'meio_aberto':
+                if self.teste_em_andamento:
+                    self.recusadas += 1
+                    return False
+                self.teste_em_andamento = True
+            return True
+
+    def liberar_teste(self):
+        """Desfazer o permitir() de uma chamada que não chegou a ser feita."""
+        with self._lock:
+            self.teste_em_andamento = False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.estado = 'fechado'
+            self.falhas_consecutivas = 0
+            self.teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas_consecutivas += 1
+            self.teste_em_andamento = False
+            if self.estado == 'meio_aberto' or self.falhas_consecutivas >= self.limite_falhas:
+                if self.estado != 'aberto':
+                    self.aberturas += 1
+                    print(f"🔌 Circuito da IA aberto após {self.falhas_consecutivas} falhas seguidas")
+                self.estado = 'aberto'
+                self.aberto_em = time.monotonic()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            restante = 0.0
+            if self.estado == 'aberto':
+                restante = max(0.0, self.tempo_aberto - (time.monotonic() - self.aberto_em))
+            return {
+                'estado': self.estado,
+                'falhas_consecutivas': self.falhas_consecutivas,
+                'aberturas': self.aberturas,
+                'recusadas': self.recusadas,
+                'reabre_em_segundos': round(restante, 1)
+            }
+
+
+class ControleResiliencia:
+    """Semáforo + retentativas + disjuntor para um upstream (compartilhado por todos os chamadores)."""
+
+    def __init__(
+        self,
+        nome: str,
+        max_simultaneas: int = 8,
+        tentativas: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        espera_vaga: float = 5.0,
+        prazo_total: float = 25.0,
+        limite_falhas: int = 5,
+        tempo_aberto: float = 30.0
+    ):
+        """
+        Args:
+            nome: Identificação do upstream (para logs e /status)
+            max_simultaneas: Máximo de chamadas em andamento ao mesmo tempo
+            tentativas: Total de tentativas por chamada (1 = sem retentativa)
+            backoff_base: Espera base do backoff exponencial (segundos)
+            backoff_max: Teto de cada espera do backoff (o Retry-After do servidor não é cortado)
+            espera_vaga: Tempo máximo esperando vaga no semáforo
+            prazo_total: Não inicia nova tentativa se a espera passar desse prazo desde o início
+                         (Retry-After maior que o que sobra do prazo: desiste na hora)
+            limite_falhas: Falhas consecutivas para abrir o circuito
+            tempo_aberto: Segundos com o circuito aberto antes da chamada de teste
+        """
+        self.nome = nome
+        self.max_simultaneas = max_simultaneas
+        self.tentativas = max(1, tentativas)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.espera_vaga = espera_vaga
+        self.prazo_total = prazo_total
+        self.disjuntor = Disjuntor(limite_falhas, tempo_aberto)
+
+        self._semaforo = threading.BoundedSemaphore(max_simultaneas)
+        self._lock = threading.Lock()
+        self.em_andamento = 0
+        self.chamadas = 0
+        self.sucessos = 0
+        self.falhas = 0
+        self.retentativas = 0
+        self.sem_vaga = 0
+
+    @contextmanager
+    def vaga(self):
+        """Ocupar uma vaga do limite de simultâneas (LimiteSimultaneas se não houver a tempo)."""
+        if not self._semaforo.acquire(timeout=self.espera_vaga):
+            with self._lock:
+                self.sem_vaga += 1
+            raise LimiteSimultaneas(f"{self.nome}: {self.max_simultaneas} chamadas em andamento")
+        with self._lock:
+            self.em_andamento += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.em_andamento -= 1
+            self._semaforo.release()
+
+    def registrar_falha(self):
+        """Falha observada fora do executar (ex: stream interrompido no meio)."""
+        with self._lock:
+            self.falhas += 1
+        self.disjuntor.registrar_falha()
+
+    def executar(self, chamada: Callable[[], Any], ocupar_vaga: bool = True) -> Any:
+        """
+        Executar a chamada com retentativas, backoff e disjuntor.
+
+        Args:
+            chamada: Função sem argumentos que faz a requisição e devolve a resposta
+                     (objeto com status_code/headers) ou levanta exceção
+            ocupar_vaga: False quando o chamador já está dentro de vaga()
+
+        Returns:
+            A resposta da última tentativa (pode ser um status de erro não retentável
+            ou retentável quando as tentativas acabam)
+
+        Raises:
+            CircuitoAberto: Circuito aberto - nenhuma requisição foi feita
+            LimiteSimultaneas: Sem vaga no semáforo a tempo
+            Exception: Erro de rede/timeout da última tentativa
+        """
+        inicio = time.monotonic()
+        with self._lock:
+            self.chamadas += 1
+
+        for tentativa in range(self.tentativas):
+            if not self.disjuntor.permitir():
+                raise CircuitoAberto(f"{self.nome}: circuito aberto")
+
+            resposta, erro = None, None
+            try:
+                if ocupar_vaga:
+                    with self.vaga():
+                        resposta = chamada()
+                else:
+                    resposta = chamada()
+            except LimiteSimultaneas:
+                # Não chegou a chamar: libera o teste do meio_aberto sem contar falha
+                self.disjuntor.liberar_teste()
+                raise
+            except Exception as e:
+                erro = e
+
+            status = getattr(resposta if erro is None else erro, 'status_code', None)
+            # Sem status: exceção é erro de rede/timeout; retorno sem status_code é sucesso
+            retentavel = status in STATUS_RETENTAVEIS if status is not None else erro is not None
+            if not retentavel:
+                # Respondeu (200 ou erro do pedido, ex: 400/401) - o upstream está saudável
+                self.disjuntor.registrar_sucesso()
+                with self._lock:
+                    self.sucessos += 1
+                if erro is not None:
+                    raise erro
+                return resposta
+
+            self.registrar_falha()
+
+            headers = getattr(resposta if erro is None else erro, 'headers', None) or {}
+            espera = calcular_espera(
+                tentativa, self.backoff_base, self.backoff_max,
+                interpretar_retry_after(headers.get('Retry-After') or headers.get('retry-after'))
+            )
+            ultima = tentativa == self.tentativas - 1
+            if ultima or time.monotonic() - inicio + espera > self.prazo_total:
+                if erro is not None:
+                    raise erro
+                return resposta
+
+            motivo = f"HTTP {status}" if status else type(erro).__name__
+            print(f"   🔁 {self.nome}: {motivo}, nova tentativa em {espera:.1f}s ({tentativa + 2}/{self.tentativas})")
+            with self._lock:
+                self.retentativas += 1
+            time.sleep(espera)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Estado do disjuntor e contadores para o /status."""
+        with self._lock:
+            dados = {
+                'max_simultaneas': self.max_simultaneas,
+                'em_andamento': self.em_andamento,
+                'chamadas': self.chamadas,
+                'sucessos': self.sucessos,
+                'falhas': self.falhas,
+                'retentativas': self.retentativas,
+                'sem_vaga': self.sem_vaga
+            }
+        dados['circuito'] = self.disjuntor.info()
+        return dados
+
+
+_controles: Dict[str, ControleResiliencia] = {}
+_lock_global = threading.Lock()
+
+
+def obter_controle(nome: str = 'github_models') -> ControleResiliencia:
+    """Controle único por upstream no processo, configurado pelas variáveis AI_*."""
+    controle = _controles.get(nome)
+    if controle is None:
+        with _lock_global:
+            controle = _controles.get(nome)
+            if controle is None:
+                controle = ControleResiliencia(
+                    nome,
+                    max_simultaneas=int(os.getenv('AI_MAX_SIMULTANEAS', '8')),
+                    tentativas=int(os.getenv('AI_TENTATIVAS', '3')),
+                    backoff_base=float(os.getenv('AI_BACKOFF_BASE', '0.5')),
+                    backoff_max=float(os.getenv('AI_BACKOFF_MAX', '8')),
+                    espera_vaga=float(os.getenv('AI_ESPERA_VAGA_SEGUNDOS', '5')),
+                    prazo_total=float(os.getenv('AI_PRAZO_TOTAL_SEGUNDOS', '25')),
+                    limite_falhas=int(os.getenv('AI_CIRCUITO_FALHAS', '5')),
+                    tempo_aberto=float(os.getenv('AI_CIRCUITO_ABERTO_SEGUNDOS', '30'))
+                )
+                _controles[nome] = controle
+    return controle
+
@@ -0,0 +1,222 @@
+"""
+Roteamento de modelos por nível (rápido x grande) e requisições com hedge
+A mensagem vai para o modelo pequeno ou grande conforme intenção e complexidade;
+se o modelo grande não responder até o p95 dele, uma segunda chamada vai para o
+modelo rápido e vale a primeira resposta que chegar
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .contexto import estimar_tokens
+from .intencoes import carregar_motor
+
+ARQUIVO_INTENCOES_ROTEAMENTO = Path(__file__).resolve().parent / 'intencoes_roteamento.json'
+
+NIVEIS = ('rapido', 'grande')
+
+
+class RoteadorModelos:
+    """Escolha do nível do modelo por mensagem, hedge pelo p95 e métricas por nível."""
+
+    def __init__(
+        self,
+        modelo_rapido: str = 'gpt-4o-mini',
+        modelo_grande: str = 'gpt-4o',
+        ativo: bool = True,
+        limite_tokens_rapido: int = 60,
+        hedge: bool = True,
+        prazo_hedge_padrao: float = 4.0,
+        prazo_hedge_min: float = 1.0,
+        amostras_minimas: int = 20,
+        max_threads: int = 16,
+        janela: int = 500
+    ):
+        """
+        Args:
+            modelo_rapido: Modelo pequeno (saudações, mensagens curtas e simples)
+            modelo_grande: Modelo grande (negociação, problemas, mensagens longas)
+            ativo: False = tudo vai para o modelo grande (comportamento anterior)
+            limite_tokens_rapido: Mensagens acima disso (tokens estimados) vão para o grande
+            hedge: Disparar a chamada de reserva no modelo rápido após o prazo
+            prazo_hedge_padrao: Prazo (segundos) enquanto não há amostras suficientes para o p95
+            prazo_hedge_min: Prazo mínimo, mesmo com p95 menor
+            amostras_minimas: Latências do nível necessárias para usar o p95 como prazo
+            max_threads: Threads para as chamadas com hedge
+            janela: Latências guardadas por nível
+        """
+        self.modelos = {'rapido': modelo_rapido, 'grande': modelo_grande}
+        self.ativo = ativo
+        self.limite_tokens_rapido = limite_tokens_rapido
+        self.hedge = hedge
+        self.prazo_hedge_padrao = prazo_hedge_padrao
+        self.prazo_hedge_min = prazo_hedge_min
+        self.amostras_minimas = amostras_minimas
+        self.motor = carregar_motor(str(ARQUIVO_INTENCOES_ROTEAMENTO))
+
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='hedge-ia')
+        self._lock = threading.Lock()
+        self._latencias: Dict[str, deque] = {nivel: deque(maxlen=janela) for nivel in NIVEIS}
+        self._contadores: Dict[str, Dict[str, int]] = {
+            nivel: {'escolhido': 0, 'chamadas': 0, 'erros': 0, 'vitorias': 0, 'derrotas': 0}
+            for nivel in NIVEIS
+        }
+        self.motivos: Dict[str, int] = {}
+        self.hedges = 0
+
+    def escolher(self, mensagem: str) -> Dict[str, str]:
+        """
+        Nível do modelo para a mensagem.
+
+        Returns:
+            {'nivel', 'modelo', 'motivo'}
+        """
+        nivel, motivo = self._classificar(mensagem)
+        with self._lock:
+            self._contadores[nivel]['escolhido'] += 1
+            self.motivos[motivo] = self.motivos.get(motivo, 0) + 1
+        return {'nivel': nivel, 'modelo': self.modelos[nivel], 'motivo': motivo}
+
+    def _classificar(self, mensagem: str) -> Tuple[str, str]:
+        if not self.ativo:
+            return 'grande', 'roteamento_desligado'
+
+        intencao = self.motor.primeira(mensagem, grupo='nivel')
+        if intencao and intencao['dados'].get('nivel') == 'grande':
+            return 'grande', f"intencao:{intencao['intencao']}"
+        if estimar_tokens(mensagem) > self.limite_tokens_rapido:
+            return 'grande', 'mensagem_longa'
+        if mensagem.count('?') >= 2:
+            return 'grande', 'varias_perguntas'
+        return 'rapido', f"intencao:{intencao['intencao']}" if intencao else 'mensagem_curta'
+
+    @staticmethod
+    def _percentil(valores: List[float], p: float) -> float:
+        if not valores:
+            return 0.0
+        valores = sorted(valores)
+        return round(valores[min(len(valores) - 1, int(len(valores) * p))], 1)
+
+    def prazo_hedge(self, nivel: str) -> float:
+        """Segundos de espera pelo nível antes do hedge (p95 recente ou o prazo padrão)."""
+        with self._lock:
+            latencias = list(self._latencias[nivel])
+        if len(latencias) < self.amostras_minimas:
+            return self.prazo_hedge_padrao
+        return max(self.prazo_hedge_min, self._percentil(latencias, 0.95) / 1000)
+
+    def _medir(self, chamada: Callable[[str], Any], nivel: str) -> Any:
+        """Executar a chamada no modelo do nível registrando latência (só de sucesso) e erro."""
+        inicio = time.perf_counter()
+        try:
+            resultado = chamada(self.modelos[nivel])
+        except Exception:
+            with self._lock:
+                self._contadores[nivel]['chamadas'] += 1
+                self._contadores[nivel]['erros'] += 1
+            raise
+        with self._lock:
+            self._contadores[nivel]['chamadas'] += 1
+            self._latencias[nivel].append((time.perf_counter() - inicio) * 1000)
+        return resultado
+
+    def executar(self, chamada: Callable[[str], Any], escolha: Dict[str, str]) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Chamar o modelo escolhido, com hedge no modelo rápido se passar do prazo.
+
+        Args:
+            chamada: Função que recebe o nome do modelo e devolve a resposta
+                     (ou levanta exceção em caso de falha)
+            escolha: Retorno de escolher()
+
+        Returns:
+            (resposta, {'nivel', 'modelo', 'hedge'}) do nível que respondeu primeiro
+
+        Raises:
+            Exception: Erro da chamada principal (ou de ambas, com hedge)
+        """
+        nivel = escolha['nivel']
+        if not self.hedge or nivel == 'rapido':
+            return self._medir(chamada, nivel), {'nivel': nivel, 'modelo': self.modelos[nivel], 'hedge': False}
+
+        prazo = self.prazo_hedge(nivel)
+        principal = self._executor.submit(self._medir, chamada, nivel)
+        feitos, _ = wait([principal], timeout=prazo)
+        if feitos:
+            return principal.result(), {'nivel': nivel, 'modelo': self.modelos[nivel], 'hedge': False}
+
+        print(f"   🏁 Modelo {self.modelos[nivel]} passou de {prazo:.1f}s - hedge em {self.modelos['rapido']}")
+        reserva = self._executor.submit(self._medir, chamada, 'rapido')
+        with self._lock:
+            self.hedges += 1
+        futuros = {principal: nivel, reserva: 'rapido'}
+
+        pendentes = set(futuros)
+        while pendentes:
+            feitos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                if futuro.exception() is None:
+                    vencedor = futuros[futuro]
+                    perdedor = 'rapido' if vencedor == nivel else nivel
+                    with self._lock:
+                        self._contadores[vencedor]['vitorias'] += 1
+                        self._contadores[perdedor]['derrotas'] += 1
+                    # A chamada perdedora segue em segundo plano (o uso dela é contabilizado por quem chama)
+                    return futuro.result(), {'nivel': vencedor, 'modelo': self.modelos[vencedor], 'hedge': True}
+        # As duas falharam: vale o erro da principal
+        raise principal.exception()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Latência, escolhas e vitórias no hedge por nível para o /status."""
+        niveis = {}
+        with self._lock:
+            for nivel in NIVEIS:
+                latencias = list(self._latencias[nivel])
+                contadores = dict(self._contadores[nivel])
+                disputas = contadores['vitorias'] + contadores['derrotas']
+                niveis[nivel] = dict(
+                    contadores,
+                    modelo=self.modelos[nivel],
+                    latencia_p50_ms=self._percentil(latencias, 0.5),
+                    latencia_p95_ms=self._percentil(latencias, 0.95),
+                    taxa_vitoria=round(contadores['vitorias'] / disputas, 3) if disputas else None
+                )
+            motivos = dict(self.motivos)
+            hedges = self.hedges
+        return {
+            'ativo': self.ativo,
+            'niveis': niveis,
+            'motivos': motivos,
+            'hedge': {
+                'ativo': self.hedge,
+                'disparados': hedges,
+                'prazo_atual_segundos': round(self.prazo_hedge('grande'), 2)
+            }
+        }
+
+
+_roteador: Optional[RoteadorModelos] = None
+_lock_global = threading.Lock()
+
+
+def obter_roteador() -> RoteadorModelos:
+    """Roteador único do processo, configurado pelas variáveis AI_MODELO_* / AI_ROTEAMENTO* / AI_HEDGE*."""
+    global _roteador
+    if _roteador is None:
+        with _lock_global:
+            if _roteador is None:
+                _roteador = RoteadorModelos(
+                    modelo_rapido=os.getenv('AI_MODELO_RAPIDO', 'gpt-4o-mini'),
+                    modelo_grande=os.getenv('AI_MODELO_GRANDE', 'gpt-4o'),
+                    ativo=os.getenv('AI_ROTEAMENTO', 'true').lower() == 'true',
+                    limite_tokens_rapido=int(os.getenv('AI_ROTEAMENTO_LIMITE_TOKENS', '60')),
+                    hedge=os.getenv('AI_HEDGE', 'true').lower() == 'true',
+                    prazo_hedge_padrao=float(os.getenv('AI_HEDGE_PRAZO_PADRAO_SEGUNDOS', '4')),
+                    prazo_hedge_min=float(os.getenv('AI_HEDGE_PRAZO_MIN_SEGUNDOS', '1'))
+                )
+    return _roteador
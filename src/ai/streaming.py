@@ -0,0 +1,140 @@
+"""
+Streaming de chat completions: leitura dos deltas SSE e divisão em mensagens de WhatsApp
+Cada frase/parágrafo completo vira uma mensagem assim que chega, sem esperar a resposta inteira
+"""
+
+import json
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Fim de frase seguido de espaço/quebra (o ponto de "R$ 1.500" ou "3.5" não divide)
+FIM_DE_FRASE = re.compile(r'[.!?…]+["\')\]]*\s+')
+
+
+def ler_deltas_sse(linhas: Iterable[str], meta: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Extrair o texto incremental das linhas SSE ("data: {...}") de uma chat completion.
+
+    Args:
+        linhas: Linhas do corpo da resposta (ClienteModelosGitHub.stream_chat)
+        meta: Dict opcional que recebe 'usage' e 'finish_reason' quando informados
+
+    Returns:
+        Iterador com os pedaços de texto (delta.content)
+    """
+    for linha in linhas:
+        if not linha or not linha.startswith('data:'):
+            continue
+        dados = linha[5:].strip()
+        if dados == '[DONE]':
+            break
+        try:
+            evento = json.loads(dados)
+        except json.JSONDecodeError:
+            continue
+
+        if meta is not None and evento.get('usage'):
+            meta['usage'] = evento['usage']
+        for escolha in evento.get('choices') or []:
+            if meta is not None and escolha.get('finish_reason'):
+                meta['finish_reason'] = escolha['finish_reason']
+            texto = (escolha.get('delta') or {}).get('content')
+            if texto:
+                yield texto
+
+
+class DivisorMensagens:
+    """Acumula deltas e libera trechos completos (parágrafo ou frases) para envio."""
+
+    def __init__(self, min_caracteres: int = 60, max_caracteres: int = 700):
+        """
+        Args:
+            min_caracteres: Tamanho mínimo para liberar por fim de frase (evita rajadas de mensagens curtas)
+            max_caracteres: Acima disso corta no último espaço, mesmo sem fim de frase
+        """
+        self.min_caracteres = min_caracteres
+        self.max_caracteres = max_caracteres
+        self.buffer = ''
+
+    def _corte(self) -> int:
+        """Posição até onde o buffer pode ser liberado (0 = ainda não)."""
+        paragrafo = self.buffer.find('\n\n')
+        if paragrafo > 0:
+            return paragrafo + 2
+
+        corte = 0
+        for fim in FIM_DE_FRASE.finditer(self.buffer):
+            if fim.end() >= self.min_caracteres:
+                corte = fim.end()
+                break
+        if corte:
+            return corte
+
+        if len(self.buffer) > self.max_caracteres:
+            espaco = self.buffer.rfind(' ', 0, self.max_caracteres)
+            return espaco + 1 if espaco > 0 else self.max_caracteres
+        return 0
+
+    def alimentar(self, delta: str) -> List[str]:
+        """Adicionar texto e devolver os trechos que já podem ser enviados."""
+        self.buffer += delta
+        prontos = []
+        while True:
+            corte = self._corte()
+            if not corte:
+                break
+            trecho, self.buffer = self.buffer[:corte].strip(), self.buffer[corte:].lstrip()
+            if trecho:
+                prontos.append(trecho)
+        return prontos
+
+    def finalizar(self) -> Optional[str]:
+        """Restante do buffer ao fim do stream."""
+        trecho, self.buffer = self.buffer.strip(), ''
+        return trecho or None
+
+
+class MetricasStreaming:
+    """Tempo até a primeira mensagem, duração total e trechos por resposta."""
+
+    def __init__(self, janela: int = 1000):
+        self._lock = threading.Lock()
+        self.primeira_ms: deque = deque(maxlen=janela)
+        self.total_ms: deque = deque(maxlen=janela)
+        self.trechos: deque = deque(maxlen=janela)
+        self.respostas = 0
+        self.falhas = 0
+
+    def registrar(self, primeira_ms: Optional[float], total_ms: float, trechos: int):
+        with self._lock:
+            self.respostas += 1
+            if primeira_ms is not None:
+                self.primeira_ms.append(primeira_ms)
+            self.total_ms.append(total_ms)
+            self.trechos.append(trechos)
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+
+    @staticmethod
+    def _percentil(valores: List[float], p: float) -> float:
+        if not valores:
+            return 0.0
+        valores = sorted(valores)
+        return round(valores[min(len(valores) - 1, int(len(valores) * p))], 1)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Métricas para o /status."""
+        with self._lock:
+            primeira, total, trechos = list(self.primeira_ms), list(self.total_ms), list(self.trechos)
+            return {
+                'respostas': self.respostas,
+                'falhas': self.falhas,
+                'primeira_mensagem_p50_ms': self._percentil(primeira, 0.5),
+                'primeira_mensagem_p95_ms': self._percentil(primeira, 0.95),
+                'total_p50_ms': self._percentil(total, 0.5),
+                'trechos_medio': round(sum(trechos) / len(trechos), 1) if trechos else 0.0
+            }
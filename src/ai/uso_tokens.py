@@ -0,0 +1,241 @@
+"""
+Contabilidade de tokens e custo das chamadas aos modelos
+Agrega o bloco `usage` de cada resposta por dia, número, modelo e rota, grava um
+snapshot diário periodicamente e aplica orçamentos diários (estourou = resposta local/cache)
+"""
+
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Preço em US$ por 1 mil tokens (entrada, saída); AI_PRECOS='{"gpt-4o": [0.0025, 0.01]}' sobrescreve
+PRECOS_PADRAO = {
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4o-mini': (0.00015, 0.0006),
+}
+
+DIMENSOES = ('numero', 'modelo', 'rota')
+
+
+def _agregado_vazio() -> Dict[str, Any]:
+    return {'chamadas': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'custo_usd': 0.0}
+
+
+def _somar(agregado: Dict[str, Any], prompt: int, completion: int, custo: float):
+    agregado['chamadas'] += 1
+    agregado['prompt_tokens'] += prompt
+    agregado['completion_tokens'] += completion
+    agregado['total_tokens'] += prompt + completion
+    agregado['custo_usd'] = round(agregado['custo_usd'] + custo, 6)
+
+
+class ContabilidadeTokens:
+    """Uso de tokens por dia com quebra por número, modelo e rota."""
+
+    def __init__(
+        self,
+        diretorio: Optional[Path] = None,
+        intervalo_persistencia: float = 60,
+        orcamento_diario: int = 0,
+        orcamento_por_numero: int = 0,
+        orcamento_por_rota: Optional[Dict[str, int]] = None,
+        precos: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            diretorio: Pasta dos arquivos uso_tokens_YYYYMMDD.json (None = só memória)
+            intervalo_persistencia: Segundos entre gravações (só grava se houve uso novo)
+            orcamento_diario: Máximo de tokens por dia no total (0 = sem limite)
+            orcamento_por_numero: Máximo de tokens por dia para cada número (0 = sem limite)
+            orcamento_por_rota: Máximo de tokens por dia por rota, ex: {'crm': 200000}
+            precos: Preço por 1 mil tokens {modelo: (entrada, saída)}
+        """
+        self.diretorio = Path(diretorio) if diretorio else None
+        self.intervalo_persistencia = intervalo_persistencia
+        self.orcamento_diario = orcamento_diario
+        self.orcamento_por_numero = orcamento_por_numero
+        self.orcamento_por_rota = orcamento_por_rota or {}
+        self.precos = {**PRECOS_PADRAO, **(precos or {})}
+
+        self.dias: Dict[str, Dict[str, Any]] = {}
+        self.bloqueadas = 0
+        self._alterado = False
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+        if self.diretorio:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            self._carregar(self._dia())
+            threading.Thread(target=self._persistir_periodicamente, daemon=True).start()
+            atexit.register(self.persistir)
+
+    @staticmethod
+    def _dia() -> str:
+        return datetime.now().strftime('%Y%m%d')
+
+    def _arquivo(self, dia: str) -> Path:
+        return self.diretorio / f"uso_tokens_{dia}.json"
+
+    def _carregar(self, dia: str):
+        """Continuar a contagem do dia após um reinício."""
+        arquivo = self._arquivo(dia)
+        if arquivo.exists():
+            try:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    self.dias[dia] = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Uso de tokens de {dia} ilegível: {e}")
+
+    def _do_dia(self, dia: str) -> Dict[str, Any]:
+        if dia not in self.dias:
+            self.dias[dia] = {'total': _agregado_vazio(), **{d: {} for d in DIMENSOES}}
+            # Só o dia atual e o anterior ficam em memória (os demais estão em disco)
+            for antigo in sorted(self.dias)[:-2]:
+                del self.dias[antigo]
+        return self.dias[dia]
+
+    def custo(self, modelo: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Custo estimado em US$ (0 para modelo sem preço configurado)."""
+        entrada, saida = self.precos.get(modelo, (0.0, 0.0))
+        return (prompt_tokens * entrada + completion_tokens * saida) / 1000
+
+    def registrar(
+        self,
+        usage: Optional[Dict[str, Any]],
+        modelo: str,
+        rota: str,
+        numero: Optional[str] = None
+    ):
+        """
+        Somar o bloco `usage` de uma resposta.
+
+        Args:
+            usage: {'prompt_tokens', 'completion_tokens', ...} da resposta (None é ignorado)
+            modelo: Modelo chamado
+            rota: Origem da chamada (webhook, crm, vendedor, ...)
+            numero: Número do contato, quando houver
+        """
+        if not usage:
+            return
+        prompt = int(usage.get('prompt_tokens') or 0)
+        completion = int(usage.get('completion_tokens') or 0)
+        custo = self.custo(modelo, prompt, completion)
+
+        with self._lock:
+            dia = self._do_dia(self._dia())
+            _somar(dia['total'], prompt, completion, custo)
+            for dimensao, chave in (('numero', numero), ('modelo', modelo), ('rota', rota)):
+                if chave:
+                    _somar(dia[dimensao].setdefault(chave, _agregado_vazio()), prompt, completion, custo)
+            self._alterado = True
+
+    def dentro_do_orcamento(self, rota: str, numero: Optional[str] = None) -> bool:
+        """False se algum orçamento diário aplicável (total, rota ou número) já foi consumido."""
+        with self._lock:
+            dia = self.dias.get(self._dia())
+            if not dia:
+                return True
+            estouros = [
+                self.orcamento_diario and dia['total']['total_tokens'] >= self.orcamento_diario,
+                rota in self.orcamento_por_rota
+                and dia['rota'].get(rota, {}).get('total_tokens', 0) >= self.orcamento_por_rota[rota],
+                numero and self.orcamento_por_numero
+                and dia['numero'].get(numero, {}).get('total_tokens', 0) >= self.orcamento_por_numero,
+            ]
+            if any(estouros):
+                self.bloqueadas += 1
+                return False
+            return True
+
+    def resumo(self, dia: Optional[str] = None, numero: Optional[str] = None, top: int = 20) -> Dict[str, Any]:
+        """
+        Uso de um dia (padrão: hoje) para o endpoint /uso.
+
+        Args:
+            dia: YYYYMMDD (dias antigos são lidos do disco)
+            numero: Só o uso deste número
+            top: Quantos números listar (os de maior consumo)
+        """
+        dia = dia or self._dia()
+        with self._lock:
+            dados = self.dias.get(dia)
+        if dados is None and self.diretorio and self._arquivo(dia).exists():
+            with open(self._arquivo(dia), 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+        dados = json.loads(json.dumps(dados)) if dados else {'total': _agregado_vazio(), 'numero': {}, 'modelo': {}, 'rota': {}}
+
+        if numero:
+            return {'dia': dia, 'numero': numero, 'uso': dados['numero'].get(numero, _agregado_vazio())}
+
+        maiores = sorted(dados['numero'].items(), key=lambda item: item[1]['total_tokens'], reverse=True)
+        return {
+            'dia': dia,
+            'total': dados['total'],
+            'por_modelo': dados['modelo'],
+            'por_rota': dados['rota'],
+            'por_numero': dict(maiores[:top]),
+            'numeros': len(dados['numero']),
+            'orcamentos': self.orcamentos()
+        }
+
+    def orcamentos(self) -> Dict[str, Any]:
+        """Limites configurados e chamadas bloqueadas por orçamento."""
+        return {
+            'diario': self.orcamento_diario or None,
+            'por_numero': self.orcamento_por_numero or None,
+            'por_rota': self.orcamento_por_rota,
+            'chamadas_bloqueadas': self.bloqueadas
+        }
+
+    def persistir(self):
+        """Gravar o snapshot dos dias em memória (arquivo temporário + rename)."""
+        if not self.diretorio:
+            return
+        with self._lock:
+            if not self._alterado:
+                return
+            snapshot = json.loads(json.dumps(self.dias))
+            self._alterado = False
+        for dia, dados in snapshot.items():
+            temporario = self._arquivo(dia).with_suffix('.tmp')
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(dados, f, ensure_ascii=False, indent=2)
+            os.replace(temporario, self._arquivo(dia))
+
+    def _persistir_periodicamente(self):
+        while not self._parar.wait(self.intervalo_persistencia):
+            try:
+                self.persistir()
+            except OSError as e:
+                print(f"⚠️ Erro ao gravar uso de tokens: {e}")
+
+    def parar(self):
+        """Parar a gravação periódica (grava uma última vez)."""
+        self._parar.set()
+        self.persistir()
+
+
+_contabilidade: Optional[ContabilidadeTokens] = None
+_lock_global = threading.Lock()
+
+
+def obter_contabilidade_tokens() -> ContabilidadeTokens:
+    """Contabilidade única do processo, configurada pelas variáveis AI_USO_* / AI_ORCAMENTO_*."""
+    global _contabilidade
+    if _contabilidade is None:
+        with _lock_global:
+            if _contabilidade is None:
+                precos = json.loads(os.getenv('AI_PRECOS', '{}') or '{}')
+                _contabilidade = ContabilidadeTokens(
+                    diretorio=Path(os.getenv('AI_USO_DIR', 'uso_tokens')),
+                    intervalo_persistencia=float(os.getenv('AI_USO_INTERVALO_SEGUNDOS', '60')),
+                    orcamento_diario=int(os.getenv('AI_ORCAMENTO_DIARIO_TOKENS', '0')),
+                    orcamento_por_numero=int(os.getenv('AI_ORCAMENTO_DIARIO_TOKENS_NUMERO', '0')),
+                    orcamento_por_rota=json.loads(os.getenv('AI_ORCAMENTO_DIARIO_ROTAS', '{}') or '{}'),
+                    precos={modelo: tuple(valores) for modelo, valores in precos.items()}
+                )
+    return _contabilidade
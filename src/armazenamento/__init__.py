@@ -0,0 +1,7 @@
+"""
+Organização em disco dos arquivos por telefone (conversas do webhook e do chatbot)
+"""
+
+from .particoes import DiretorioParticionado
+
+__all__ = ['DiretorioParticionado']
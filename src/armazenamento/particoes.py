@@ -0,0 +1,287 @@
+"""
+Pastas particionadas por hash para arquivos "um por telefone"
+Em vez de uma pasta plana com centenas de milhares de arquivos, cada telefone vai para
+<raiz>/ab/cd/ (prefixo do sha1 do telefone). Um manifesto só de acréscimo na raiz guarda
+os telefones existentes, então listar não precisa varrer as pastas. O manifesto pode
+ser compartilhado por várias instâncias/processos (webhook, ferramentas de tools/):
+escrita com trava de arquivo e leitura incremental do que os outros acrescentaram
+"""
+
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class DiretorioParticionado:
+    """Arquivos <prefixo><chave><extensão> em subpastas por hash + manifesto das chaves."""
+
+    def __init__(
+        self,
+        raiz: Path,
+        prefixo: str,
+        extensoes: Tuple[str, ...] = ('.json',),
+        niveis: int = 2
+    ):
+        """
+        Args:
+            raiz: Pasta base (onde ficavam os arquivos planos e fica o manifesto)
+            prefixo: Início do nome dos arquivos (ex: 'conversas_', 'conv_')
+            extensoes: Extensões dos arquivos de uma mesma chave (movidos juntos na migração)
+            niveis: Subpastas de 2 caracteres hex (2 = 65536 pastas; 0 = pasta plana, só o manifesto)
+        """
+        self.raiz = Path(raiz)
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        self.prefixo = prefixo
+        self.extensoes = tuple(extensoes)
+        self.niveis = niveis
+        self.arquivo_manifesto = self.raiz / f"manifesto_{prefixo.rstrip('_')}.txt"
+        # Trava entre processos num arquivo à parte (o manifesto é trocado na compactação)
+        self.arquivo_trava = self.raiz / f".manifesto_{prefixo.rstrip('_')}.lock"
+        self._padrao = re.compile(
+            '^' + re.escape(prefixo) + r'(.+?)(' + '|'.join(map(re.escape, self.extensoes)) + ')$'
+        )
+
+        self._chaves: Dict[str, None] = {}  # ordem de criação
+        self._linhas_manifesto = 0
+        # Até onde o manifesto já foi lido (e de qual arquivo, para notar a troca na compactação)
+        self._posicao = 0
+        self._identidade: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._lock_migracao = threading.Lock()
+        self.migradas = 0
+        if self.arquivo_manifesto.exists():
+            with self._lock:
+                self._sincronizar()
+        else:
+            # Primeira execução nesta pasta (ou manifesto perdido): uma varredura só, depois nunca mais
+            self.reconstruir_manifesto()
+            self.migrar()
+
+    def pasta(self, chave: str) -> Path:
+        """Subpasta da chave (a mesma sempre, derivada do hash)."""
+        resumo = hashlib.sha1(chave.encode('utf-8')).hexdigest()
+        pasta = self.raiz
+        for nivel in range(self.niveis):
+            pasta = pasta / resumo[2 * nivel:2 * nivel + 2]
+        return pasta
+
+    def nome(self, chave: str, extensao: Optional[str] = None) -> str:
+        return f"{self.prefixo}{chave}{extensao or self.extensoes[0]}"
+
+    def arquivo(self, chave: str, extensao: Optional[str] = None, criar: bool = False) -> Path:
+        """
+        Caminho do arquivo da chave.
+
+        Args:
+            extensao: Qual dos arquivos da chave (padrão: a primeira extensão)
+            criar: Vai gravar: garante a subpasta e registra a chave no manifesto
+
+        Chave fora do manifesto com arquivo plano antigo na raiz é migrada aqui mesmo.
+        """
+        if chave not in self._chaves and not self._migrar_chave(chave) and criar:
+            self.pasta(chave).mkdir(parents=True, exist_ok=True)
+            self._registrar(chave)
+        return self.pasta(chave) / self.nome(chave, extensao)
+
+    def __contains__(self, chave: str) -> bool:
+        return chave in self._chaves
+
+    def __len__(self) -> int:
+        return len(self._chaves)
+
+    def __bool__(self) -> bool:
+        # Sem isso, uma pasta ainda vazia (len 0) seria "falsa" em `if particoes:`
+        return True
+
+    def chaves(self) -> List[str]:
+        """Chaves registradas, em ordem de criação (sem percorrer as pastas), inclusive as de outros processos."""
+        with self._lock:
+            self._sincronizar()
+            return list(self._chaves)
+
+    def arquivos(self, extensao: Optional[str] = None) -> Iterable[Tuple[str, Path]]:
+        """(chave, arquivo) das chaves do manifesto cujo arquivo existe."""
+        for chave in self.chaves():
+            caminho = self.pasta(chave) / self.nome(chave, extensao)
+            if caminho.exists():
+                yield chave, caminho
+
+    def remover(self, chave: str):
+        """Tirar a chave do manifesto (os arquivos são apagados por quem chamou)."""
+        with self._lock, self._trava_arquivo():
+            self._sincronizar()
+            if chave not in self._chaves:
+                return
+            del self._chaves[chave]
+            self._anexar_manifesto(f"-{chave}")
+
+    # ---------- manifesto ----------
+
+    @contextmanager
+    def _trava_arquivo(self):
+        """Trava exclusiva entre processos para escrever no manifesto (chamar com o lock)."""
+        with open(self.arquivo_trava, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _identidade_manifesto(self) -> Optional[Tuple[int, int]]:
+        try:
+            estado = os.stat(self.arquivo_manifesto)
+        except FileNotFoundError:
+            return None
+        return estado.st_dev, estado.st_ino
+
+    def _sincronizar(self):
+        """Ler as linhas novas do manifesto (de outras instâncias/processos); chamar com o lock."""
+        try:
+            estado = os.stat(self.arquivo_manifesto)
+        except FileNotFoundError:
+            return
+        identidade = (estado.st_dev, estado.st_ino)
+        if identidade != self._identidade or estado.st_size < self._posicao:
+            # Compactado/reconstruído por outro processo: o arquivo novo é a lista completa
+            self._chaves, self._posicao, self._linhas_manifesto = {}, 0, 0
+            self._identidade = identidade
+        if estado.st_size == self._posicao:
+            return
+        with open(self.arquivo_manifesto, 'rb') as f:
+            f.seek(self._posicao)
+            dados = f.read()
+        # Só linhas completas: a última pode estar sendo escrita agora
+        fim = dados.rfind(b'\n') + 1
+        for linha in dados[:fim].decode('utf-8').splitlines():
+            if len(linha) < 2:
+                continue
+            if linha[0] == '+':
+                self._chaves[linha[1:]] = None
+            elif linha[0] == '-':
+                self._chaves.pop(linha[1:], None)
+            self._linhas_manifesto += 1
+        self._posicao += fim
+
+    def _registrar(self, chave: str):
+        with self._lock:
+            if chave in self._chaves:
+                return
+            with self._trava_arquivo():
+                self._sincronizar()
+                if chave in self._chaves:
+                    return
+                self._chaves[chave] = None
+                self._anexar_manifesto(f"+{chave}")
+
+    def _anexar_manifesto(self, linha: str):
+        """
+        Acrescentar ao manifesto (chamar com o lock e a trava, logo depois de _sincronizar);
+        muitas remoções acumuladas -> compactar.
+        """
+        with open(self.arquivo_manifesto, 'ab') as f:
+            f.write((linha + '\n').encode('utf-8'))
+            self._posicao = f.tell()
+        self._identidade = self._identidade_manifesto()
+        self._linhas_manifesto += 1
+        if self._linhas_manifesto > 2 * len(self._chaves) + 1000:
+            self._reescrever_manifesto()
+
+    def _reescrever_manifesto(self):
+        """Reescrever só com as chaves atuais (chamar com o lock e a trava, já sincronizado)."""
+        temporario = self.arquivo_manifesto.with_suffix('.tmp')
+        with open(temporario, 'wb') as f:
+            f.write(''.join(f"+{chave}\n" for chave in self._chaves).encode('utf-8'))
+            posicao = f.tell()
+        os.replace(temporario, self.arquivo_manifesto)
+        self._posicao = posicao
+        self._identidade = self._identidade_manifesto()
+        self._linhas_manifesto = len(self._chaves)
+
+    # ---------- migração ----------
+
+    def _migrar_chave(self, chave: str) -> bool:
+        """Mover os arquivos planos antigos da chave para a subpasta. True se havia algum."""
+        with self._lock_migracao:
+            antigos = [self.raiz / self.nome(chave, extensao) for extensao in self.extensoes]
+            antigos = [arquivo for arquivo in antigos if arquivo.exists()]
+            if not antigos:
+                return chave in self._chaves  # outra thread pode ter acabado de migrar
+            pasta = self.pasta(chave)
+            pasta.mkdir(parents=True, exist_ok=True)
+            if pasta != self.raiz:
+                for arquivo in antigos:
+                    destino = pasta / arquivo.name
+                    if destino.exists():
+                        # Nunca sobrescrever o arquivo já particionado (mais novo) com o plano
+                        print(f"⚠️ {arquivo.name} existe na raiz e em {pasta.relative_to(self.raiz)}: mantido o particionado")
+                        continue
+                    os.replace(arquivo, destino)
+            self._registrar(chave)
+            with self._lock:
+                self.migradas += 1
+            return True
+
+    def migrar(self) -> int:
+        """
+        Mover todos os arquivos planos da raiz para as subpastas (uma varredura só da raiz).
+
+        Returns:
+            Quantidade de chaves migradas
+        """
+        chaves = []
+        with os.scandir(self.raiz) as entradas:
+            for entrada in entradas:
+                encontrado = self._padrao.match(entrada.name) if entrada.is_file() else None
+                if encontrado:
+                    chaves.append(encontrado.group(1))
+        return sum(self._migrar_chave(chave) for chave in dict.fromkeys(chaves))
+
+    def reconstruir_manifesto(self) -> int:
+        """
+        Refazer o manifesto percorrendo as subpastas (recuperação: manifesto perdido ou editado à mão).
+
+        Returns:
+            Quantidade de chaves encontradas
+        """
+        encontradas: Dict[str, None] = {}
+        for raiz, pastas, nomes in os.walk(self.raiz):
+            profundidade = len(Path(raiz).relative_to(self.raiz).parts)
+            if profundidade >= self.niveis:
+                pastas[:] = []
+            if profundidade != self.niveis:
+                continue
+            for nome in sorted(nomes):
+                encontrado = self._padrao.match(nome)
+                if encontrado:
+                    encontradas[encontrado.group(1)] = None
+        with self._lock, self._trava_arquivo():
+            self._chaves = encontradas
+            self._reescrever_manifesto()
+        return len(encontradas)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'chaves': len(self._chaves),
+                'niveis': self.niveis,
+                'linhas_manifesto': self._linhas_manifesto,
+                'migradas': self.migradas
+            }
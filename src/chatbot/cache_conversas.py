@@ -0,0 +1,195 @@
+"""
+Cache das conversas ativas do chatbot do vendedor (LRU em memória + write-behind)
+Leituras de contatos frequentes saem da memória e as gravações vão para o disco
+em segundo plano, em lotes, por uma única thread
+"""
+
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CacheConversas:
+    """LRU de conversas (telefone -> mensagens) com gravação adiada das alteradas."""
+
+    def __init__(
+        self,
+        carregar: Callable[[str], List[Dict]],
+        gravar: Callable[[str, List[Dict]], None],
+        max_conversas: int = 1000,
+        intervalo_gravacao: float = 2.0
+    ):
+        """
+        Args:
+            carregar: Lê as mensagens de uma conversa do disco (na falta)
+            gravar: Grava as mensagens de uma conversa no disco
+            max_conversas: Conversas mantidas em memória (as menos usadas saem primeiro)
+            intervalo_gravacao: Segundos entre gravações das conversas alteradas (0 = grava na hora)
+        """
+        self.carregar = carregar
+        self.gravar = gravar
+        self.max_conversas = max_conversas
+        self.intervalo_gravacao = intervalo_gravacao
+
+        # chave -> {'mensagens', 'versao', 'gravada'}; alterada quando versao != gravada
+        self.itens: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        # Alteradas que saíram do LRU antes de gravar (leitura nelas não pode ir ao disco)
+        self._pendentes: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+        self._lock_disco = threading.Lock()
+        self._parar = threading.Event()
+
+        self.acertos = 0
+        self.faltas = 0
+        self.gravacoes = 0
+        self.despejadas = 0
+        self.erros_gravacao = 0
+
+        if intervalo_gravacao > 0:
+            threading.Thread(target=self._gravar_periodicamente, daemon=True).start()
+        atexit.register(self.parar)
+
+    def obter(self, chave: str) -> List[Dict]:
+        """Mensagens da conversa (cópia; da memória ou, na falta, do disco)."""
+        with self._lock:
+            item = self.itens.get(chave)
+            if item is not None:
+                self.itens.move_to_end(chave)
+                self.acertos += 1
+                return list(item['mensagens'])
+            self.faltas += 1
+            pendente = self._pendentes.get(chave)
+
+        mensagens = list(pendente) if pendente is not None else self.carregar(chave)
+
+        with self._lock:
+            # Outra thread pode ter carregado ou alterado a conversa enquanto líamos
+            item = self.itens.get(chave)
+            if item is None:
+                versao = 1 if pendente is not None else 0
+                item = {'mensagens': mensagens, 'versao': versao, 'gravada': 0}
+                self.itens[chave] = item
+                excesso = self._despejar()
+            else:
+                excesso = False
+            mensagens = list(item['mensagens'])
+        if excesso:
+            self.gravar_alteradas()
+        return mensagens
+
+    def contem(self, chave: str) -> bool:
+        """Se a conversa está em memória (sem contar acerto/falta)."""
+        with self._lock:
+            return chave in self.itens or chave in self._pendentes
+
+    def atualizar(self, chave: str, mensagens: List[Dict]):
+        """Trocar as mensagens da conversa em memória (gravação fica para o write-behind)."""
+        with self._lock:
+            item = self.itens.get(chave)
+            if item is None:
+                item = {'mensagens': [], 'versao': 0, 'gravada': 0}
+                self.itens[chave] = item
+            item['mensagens'] = list(mensagens)
+            item['versao'] += 1
+            self.itens.move_to_end(chave)
+            excesso = self._despejar()
+        if excesso or self.intervalo_gravacao <= 0:
+            self.gravar_alteradas()
+
+    def _despejar(self) -> bool:
+        """Tirar as menos usadas acima do limite (chamar com o lock). True se há pendentes demais."""
+        while len(self.itens) > self.max_conversas:
+            chave, item = self.itens.popitem(last=False)
+            self.despejadas += 1
+            if item['versao'] != item['gravada']:
+                self._pendentes[chave] = item['mensagens']
+        # Contrapressão: muitas despejadas esperando a thread -> quem chamou grava
+        return len(self._pendentes) >= self.max_conversas
+
+    def remover(self, chave: str, apagar: Optional[Callable[[], None]] = None):
+        """
+        Esquecer a conversa (sem gravar o que estava pendente).
+
+        Args:
+            apagar: Remoção no disco, feita sem gravação em andamento
+        """
+        with self._lock_disco:
+            with self._lock:
+                self.itens.pop(chave, None)
+                self._pendentes.pop(chave, None)
+            if apagar:
+                apagar()
+
+    def gravar_alteradas(self) -> int:
+        """
+        Gravar no disco as conversas alteradas (despejadas primeiro, depois as em memória).
+
+        Returns:
+            Quantidade de conversas gravadas
+        """
+        with self._lock_disco:
+            with self._lock:
+                pendentes = list(self._pendentes.items())
+                alteradas = [
+                    (chave, item['versao'], item['mensagens'])
+                    for chave, item in self.itens.items()
+                    if item['versao'] != item['gravada']
+                ]
+
+            gravadas = 0
+            for chave, mensagens in pendentes:
+                if self._escrever(chave, mensagens):
+                    gravadas += 1
+                    with self._lock:
+                        if self._pendentes.get(chave) is mensagens:
+                            del self._pendentes[chave]
+
+            for chave, versao, mensagens in alteradas:
+                if self._escrever(chave, mensagens):
+                    gravadas += 1
+                    with self._lock:
+                        item = self.itens.get(chave)
+                        if item is not None and item['gravada'] < versao:
+                            item['gravada'] = versao
+            return gravadas
+
+    def _escrever(self, chave: str, mensagens: List[Dict]) -> bool:
+        try:
+            self.gravar(chave, mensagens)
+        except Exception as e:
+            # Continua marcada como alterada: nova tentativa no próximo ciclo
+            print(f"⚠️ Erro ao gravar conversa {chave}: {e}")
+            with self._lock:
+                self.erros_gravacao += 1
+            return False
+        with self._lock:
+            self.gravacoes += 1
+        return True
+
+    def _gravar_periodicamente(self):
+        while not self._parar.wait(self.intervalo_gravacao):
+            self.gravar_alteradas()
+
+    def parar(self):
+        """Parar o write-behind gravando tudo o que estiver pendente (chamado também no exit)."""
+        self._parar.set()
+        self.gravar_alteradas()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Métricas do cache de conversas."""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                'conversas': len(self.itens),
+                'max_conversas': self.max_conversas,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'hit_ratio': round(self.acertos / total, 3) if total else 0.0,
+                'alteradas': sum(1 for item in self.itens.values() if item['versao'] != item['gravada']),
+                'pendentes_despejadas': len(self._pendentes),
+                'gravacoes': self.gravacoes,
+                'despejadas': self.despejadas,
+                'erros_gravacao': self.erros_gravacao,
+                'intervalo_gravacao': self.intervalo_gravacao
+            }
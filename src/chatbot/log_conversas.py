@@ -0,0 +1,233 @@
+"""
+Armazenamento das conversas do chatbot em log só de acréscimo + snapshot compactado
+Cada turno novo vira uma linha em conv_<telefone>.jsonl; de tempos em tempos o log é
+compactado no snapshot conv_<telefone>.json (formato de antes, com a sequência do último turno)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _impressao(mensagem: Dict[str, Any]) -> str:
+    """Identidade de uma mensagem para saber se o prefixo já gravado continua igual."""
+    return hashlib.sha1(json.dumps(mensagem, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class LogConversas:
+    """Conversas por telefone: snapshot + log de turnos acrescentados depois dele."""
+
+    def __init__(
+        self,
+        diretorio: Path,
+        turnos_por_snapshot: int = 200,
+        max_estados: int = 10000,
+        particoes: Optional[Any] = None
+    ):
+        """
+        Args:
+            diretorio: Pasta dos arquivos conv_<telefone>.json / .jsonl
+            turnos_por_snapshot: Linhas no log que disparam a compactação
+            max_estados: Conversas com sequência/última mensagem lembradas em memória
+            particoes: DiretorioParticionado dos arquivos (None = direto na pasta)
+        """
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.particoes = particoes
+        self.turnos_por_snapshot = turnos_por_snapshot
+        self.max_estados = max_estados
+        # telefone -> (última sequência, mensagens gravadas, impressão da última, linhas válidas no log, primeira)
+        self._estados: 'OrderedDict[str, Tuple[int, int, Optional[str], int, Optional[Dict]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.acrescimos = 0
+        self.compactacoes = 0
+        self.reescritas = 0
+
+    @staticmethod
+    def _limpar(telefone: str) -> str:
+        return telefone.replace('+', '').replace(' ', '').replace('-', '')
+
+    def _arquivo(self, telefone: str, extensao: str, criar: bool) -> Path:
+        if self.particoes is not None:
+            return self.particoes.arquivo(self._limpar(telefone), extensao, criar=criar)
+        return self.diretorio / f"conv_{self._limpar(telefone)}{extensao}"
+
+    def arquivo_snapshot(self, telefone: str, criar: bool = False) -> Path:
+        return self._arquivo(telefone, '.json', criar)
+
+    def arquivo_log(self, telefone: str, criar: bool = False) -> Path:
+        return self._arquivo(telefone, '.jsonl', criar)
+
+    def _guardar_estado(self, telefone: str, sequencia: int, mensagens: List[Dict], linhas: int):
+        impressao = _impressao(mensagens[-1]) if mensagens else None
+        primeira = mensagens[0] if mensagens else None
+        with self._lock:
+            self._estados[telefone] = (sequencia, len(mensagens), impressao, linhas, primeira)
+            self._estados.move_to_end(telefone)
+            while len(self._estados) > self.max_estados:
+                self._estados.popitem(last=False)
+
+    def _estado(self, telefone: str) -> Optional[Tuple[int, int, Optional[str], int, Optional[Dict]]]:
+        with self._lock:
+            return self._estados.get(telefone)
+
+    def _ler_snapshot(self, telefone: str) -> Tuple[List[Dict], int]:
+        arquivo = self.arquivo_snapshot(telefone)
+        if not arquivo.exists():
+            return [], 0
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        mensagens = dados.get('messages', [])
+        # Snapshot antigo (antes do log) não tem sequência: vale o número de mensagens
+        return mensagens, int(dados.get('seq', len(mensagens)))
+
+    def _ler_log(self, telefone: str) -> List[Tuple[int, Dict]]:
+        arquivo = self.arquivo_log(telefone)
+        if not arquivo.exists():
+            return []
+        turnos = []
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue  # última linha truncada por queda
+                turnos.append((registro['seq'], registro['mensagem']))
+        return turnos
+
+    def carregar(self, telefone: str) -> List[Dict]:
+        """Mensagens da conversa: snapshot + turnos do log posteriores a ele."""
+        mensagens, sequencia = self._ler_snapshot(telefone)
+        linhas = 0
+        for seq, mensagem in self._ler_log(telefone):
+            # Linhas já incluídas no snapshot (queda entre gravar o snapshot e zerar o log) são puladas
+            if seq > sequencia:
+                mensagens.append(mensagem)
+                sequencia = seq
+                linhas += 1
+        self._guardar_estado(telefone, sequencia, mensagens, linhas)
+        return mensagens
+
+    def ler_ultimas(self, telefone: str, quantidade: int) -> List[Dict]:
+        """
+        Últimas mensagens lendo só o fim do log quando ele tem turnos suficientes
+        (sem abrir o snapshot); senão, a conversa inteira.
+        """
+        estado = self._estado(telefone)
+        if estado and estado[3] >= quantidade:
+            ultimas = self._ler_fim_do_log(telefone, quantidade)
+            if len(ultimas) == quantidade:
+                return ultimas
+        return self.carregar(telefone)[-quantidade:]
+
+    def primeira_mensagem(self, telefone: str) -> Optional[Dict]:
+        """Primeira mensagem da conversa (onde fica o resumo), da memória se já foi lida."""
+        estado = self._estado(telefone)
+        if estado is None:
+            self.carregar(telefone)
+            estado = self._estado(telefone)
+        return estado[4]
+
+    def _ler_fim_do_log(self, telefone: str, quantidade: int) -> List[Dict]:
+        """Ler o log de trás para frente em blocos até ter as últimas linhas."""
+        arquivo = self.arquivo_log(telefone)
+        with open(arquivo, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            posicao = f.tell()
+            dados = b''
+            while posicao > 0 and dados.count(b'\n') <= quantidade:
+                bloco = min(16384, posicao)
+                posicao -= bloco
+                f.seek(posicao)
+                dados = f.read(bloco) + dados
+        linhas = dados.split(b'\n')
+        if posicao > 0:
+            linhas = linhas[1:]  # primeira linha pode estar cortada no meio
+        mensagens = []
+        for linha in linhas:
+            try:
+                mensagens.append(json.loads(linha)['mensagem'])
+            except ValueError:
+                continue
+        return mensagens[-quantidade:]
+
+    def gravar(self, telefone: str, mensagens: List[Dict]):
+        """
+        Persistir a conversa: se as mensagens já gravadas continuam iguais, acrescenta só
+        as novas no log; se mudaram (limpeza, resumo), reescreve o snapshot.
+        """
+        estado = self._estado(telefone)
+        if estado is None:
+            self.carregar(telefone)
+            estado = self._estado(telefone)
+        sequencia, total, impressao, linhas, _ = estado
+
+        prefixo_igual = (
+            len(mensagens) >= total
+            and (total == 0 or _impressao(mensagens[total - 1]) == impressao)
+        )
+        if not prefixo_igual:
+            self.compactar(telefone, mensagens)
+            with self._lock:
+                self.reescritas += 1
+            return
+
+        novas = mensagens[total:]
+        if not novas:
+            return
+        with open(self.arquivo_log(telefone, criar=True), 'a', encoding='utf-8') as f:
+            for mensagem in novas:
+                sequencia += 1
+                f.write(json.dumps({'seq': sequencia, 'mensagem': mensagem}, ensure_ascii=False) + '\n')
+        linhas += len(novas)
+        self._guardar_estado(telefone, sequencia, mensagens, linhas)
+        with self._lock:
+            self.acrescimos += len(novas)
+
+        if linhas >= self.turnos_por_snapshot:
+            self.compactar(telefone, mensagens)
+
+    def compactar(self, telefone: str, mensagens: List[Dict]):
+        """Gravar o snapshot com todas as mensagens e zerar o log."""
+        estado = self._estado(telefone)
+        # A sequência só cresce: linhas que sobrarem no log nunca passam da do snapshot
+        sequencia = max(estado[0] if estado else 0, len(mensagens))
+        dados = {
+            'user_phone': telefone,
+            'messages': mensagens,
+            'seq': sequencia,
+            'last_updated': datetime.now().isoformat()
+        }
+        snapshot = self.arquivo_snapshot(telefone, criar=True)
+        temporario = snapshot.with_suffix('.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, snapshot)
+        # Queda aqui deixa linhas antigas no log: carregar() as ignora pela sequência
+        self.arquivo_log(telefone).unlink(missing_ok=True)
+        self._guardar_estado(telefone, sequencia, mensagens, 0)
+        with self._lock:
+            self.compactacoes += 1
+
+    def apagar(self, telefone: str):
+        """Remover snapshot e log da conversa."""
+        self.arquivo_snapshot(telefone).unlink(missing_ok=True)
+        self.arquivo_log(telefone).unlink(missing_ok=True)
+        if self.particoes is not None:
+            self.particoes.remover(self._limpar(telefone))
+        with self._lock:
+            self._estados.pop(telefone, None)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'turnos_acrescentados': self.acrescimos,
+                'compactacoes': self.compactacoes,
+                'reescritas': self.reescritas,
+                'turnos_por_snapshot': self.turnos_por_snapshot
+            }
@@ -0,0 +1,191 @@
+"""
+Resumo contínuo das conversas do chatbot do vendedor
+Quando a conversa passa do gatilho, os turnos antigos viram um resumo guardado como
+primeira mensagem (role 'summary') e só os recentes ficam inteiros. Roda em segundo
+plano, fora do caminho da resposta; usa a IA quando disponível e um resumo extrativo local
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROLE_RESUMO = 'summary'
+
+PROMPT_RESUMO = (
+    "Você resume conversas entre um vendedor e um assistente de vendas. Atualize o resumo "
+    "anterior com os novos turnos, em tópicos curtos: clientes citados (nome, empresa, "
+    "interesse), valores, objeções, decisões e próximos passos combinados. Português, "
+    "no máximo {max_caracteres} caracteres, sem introdução."
+)
+
+# Sinais de frase com informação de negócio no resumo extrativo
+_NUMERO = re.compile(r'\d')
+_NOME = re.compile(r'\b[A-ZÁÉÍÓÚÂÊÔÃÕÇ][a-záéíóúâêôãõç]{2,}')
+_PALAVRAS_CHAVE = re.compile(
+    r'cliente|empresa|proposta|preç|valor|desconto|parcel|reuni|agend|contrato|prazo|'
+    r'orçamento|fechar|fechou|objeç|problema|interess',
+    re.IGNORECASE
+)
+
+
+def separar_resumo(mensagens: List[Dict]) -> Tuple[Optional[Dict], List[Dict]]:
+    """(mensagem de resumo ou None, demais mensagens)."""
+    if mensagens and mensagens[0].get('role') == ROLE_RESUMO:
+        return mensagens[0], mensagens[1:]
+    return None, mensagens
+
+
+def resumo_extrativo(resumo_anterior: Optional[str], mensagens: List[Dict], max_caracteres: int = 1500) -> str:
+    """
+    Resumo sem IA: as frases dos turnos do vendedor com mais sinais de negócio
+    (números, nomes, palavras-chave), em ordem cronológica, somadas ao resumo anterior.
+    Passando do limite, saem os tópicos mais antigos.
+    """
+    candidatas = []
+    for posicao, mensagem in enumerate(mensagens):
+        if mensagem.get('role') != 'user':
+            continue
+        for frase in re.split(r'(?<=[.!?])\s+|\n+', mensagem.get('content', '')):
+            frase = frase.strip()
+            if len(frase) < 12:
+                continue
+            pontos = (
+                2 * len(_PALAVRAS_CHAVE.findall(frase))
+                + bool(_NUMERO.search(frase))
+                + min(2, len(_NOME.findall(frase[1:])))
+            )
+            if pontos:
+                candidatas.append((pontos, posicao, frase[:160]))
+
+    # Até 8 tópicos por rodada, os de mais pontos, mantidos em ordem da conversa
+    escolhidas = sorted(sorted(candidatas, key=lambda c: (-c[0], c[1]))[:8], key=lambda c: c[1])
+    topicos = [linha for linha in (resumo_anterior or '').splitlines() if linha.strip()]
+    for _, _, frase in escolhidas:
+        # Frase repetida (o vendedor voltou ao assunto) sobe para o fim em vez de duplicar
+        topico = f"- {frase}"
+        if topico in topicos:
+            topicos.remove(topico)
+        topicos.append(topico)
+
+    while topicos and len('\n'.join(topicos)) > max_caracteres:
+        topicos.pop(0)
+    return '\n'.join(topicos)
+
+
+class ResumidorConversas:
+    """Agenda e aplica resumos em segundo plano (no máximo um pendente por telefone)."""
+
+    def __init__(
+        self,
+        obter: Callable[[str], List[Dict]],
+        aplicar: Callable[[str, List[Dict], Dict], bool],
+        resumir_ia: Optional[Callable[[str, Optional[str], List[Dict]], Optional[str]]] = None,
+        gatilho: int = 40,
+        manter_recentes: int = 20,
+        max_caracteres: int = 1500,
+        max_threads: int = 1
+    ):
+        """
+        Args:
+            obter: Mensagens atuais da conversa de um telefone
+            aplicar: (telefone, mensagens resumidas, resumo) troca esse início da conversa pelo
+                     resumo; False se o início mudou nesse meio tempo
+            resumir_ia: (telefone, resumo anterior, mensagens) -> resumo ou None (None = só extrativo)
+            gatilho: Mensagens (sem contar o resumo) acima das quais a conversa é resumida
+            manter_recentes: Mensagens mais novas que continuam inteiras
+            max_caracteres: Tamanho máximo do resumo
+            max_threads: Resumos simultâneos
+        """
+        self.obter = obter
+        self.aplicar = aplicar
+        self.resumir_ia = resumir_ia
+        self.gatilho = gatilho
+        self.manter_recentes = min(manter_recentes, gatilho)
+        self.max_caracteres = max_caracteres
+
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='resumo-conversa')
+        self._agendados = set()
+        self._lock = threading.Lock()
+        self.resumos_ia = 0
+        self.resumos_locais = 0
+        self.descartados = 0
+        self.erros = 0
+
+    def precisa_resumir(self, mensagens: List[Dict]) -> bool:
+        return len(separar_resumo(mensagens)[1]) > self.gatilho
+
+    def agendar(self, telefone: str, mensagens: List[Dict]) -> bool:
+        """Agendar o resumo se a conversa passou do gatilho (retorna na hora)."""
+        if not self.precisa_resumir(mensagens):
+            return False
+        with self._lock:
+            if telefone in self._agendados:
+                return False
+            self._agendados.add(telefone)
+        self._executor.submit(self._resumir, telefone)
+        return True
+
+    def _resumir(self, telefone: str):
+        try:
+            mensagens = self.obter(telefone)
+            if not self.precisa_resumir(mensagens):
+                return
+            anterior, demais = separar_resumo(mensagens)
+            antigas = demais[:-self.manter_recentes]
+            texto_anterior = anterior.get('content') if anterior else None
+
+            texto = None
+            if self.resumir_ia:
+                try:
+                    texto = self.resumir_ia(telefone, texto_anterior, antigas)
+                except Exception as e:
+                    print(f"⚠️ Resumo com IA falhou ({telefone}): {e}")
+            usou_ia = bool(texto)
+            if texto:
+                texto = texto.strip()[:self.max_caracteres]
+            else:
+                texto = resumo_extrativo(texto_anterior, antigas, self.max_caracteres)
+
+            resumo = {
+                'role': ROLE_RESUMO,
+                'content': texto,
+                'turnos_resumidos': (anterior or {}).get('turnos_resumidos', 0) + len(antigas),
+                'timestamp': datetime.now().isoformat()
+            }
+            resumidas = ([anterior] if anterior else []) + antigas
+            if not self.aplicar(telefone, resumidas, resumo):
+                # A conversa mudou no início (limpeza, outro resumo): a próxima mensagem reagenda
+                with self._lock:
+                    self.descartados += 1
+                return
+            with self._lock:
+                if usou_ia:
+                    self.resumos_ia += 1
+                else:
+                    self.resumos_locais += 1
+            print(f"🗜️ Conversa {telefone}: {len(antigas)} mensagens resumidas ({'IA' if usou_ia else 'local'})")
+        except Exception as e:
+            print(f"⚠️ Erro ao resumir conversa {telefone}: {e}")
+            with self._lock:
+                self.erros += 1
+        finally:
+            with self._lock:
+                self._agendados.discard(telefone)
+
+    def encerrar(self):
+        """Esperar os resumos agendados e parar as threads."""
+        self._executor.shutdown(wait=True)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'gatilho': self.gatilho,
+                'manter_recentes': self.manter_recentes,
+                'agendados': len(self._agendados),
+                'resumos_ia': self.resumos_ia,
+                'resumos_locais': self.resumos_locais,
+                'descartados': self.descartados,
+                'erros': self.erros
+            }
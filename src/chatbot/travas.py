@@ -0,0 +1,69 @@
+"""
+Travas por chave (telefone) para serializar os turnos de um mesmo usuário
+A tabela só guarda as travas em uso: quando o último interessado libera, a entrada sai
+(usuários ociosos não ocupam memória)
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List
+
+
+class TravasPorChave:
+    """Uma RLock por chave, criada no primeiro uso e removida quando ninguém mais a usa."""
+
+    def __init__(self):
+        self._travas: Dict[str, List[Any]] = {}  # chave -> [RLock, interessados]
+        self._lock = threading.Lock()
+        self.esperas = 0
+
+    @contextmanager
+    def travar(self, chave: str):
+        """Executar o bloco com exclusividade para a chave (threads diferentes, mesma chave = fila)."""
+        with self._lock:
+            entrada = self._travas.setdefault(chave, [threading.RLock(), 0])
+            entrada[1] += 1
+        trava = entrada[0]
+        if not trava.acquire(blocking=False):
+            with self._lock:
+                self.esperas += 1
+            trava.acquire()
+        try:
+            yield
+        finally:
+            trava.release()
+            with self._lock:
+                entrada[1] -= 1
+                if entrada[1] == 0:
+                    del self._travas[chave]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._travas)
+
+
+class TravasAsyncPorChave:
+    """Mesma ideia para corrotinas: quem espera a vez fica no event loop, sem ocupar thread."""
+
+    def __init__(self):
+        self._travas: Dict[str, List[Any]] = {}  # chave -> [asyncio.Lock, interessados]
+        self.esperas = 0
+
+    @asynccontextmanager
+    async def travar(self, chave: str):
+        entrada = self._travas.setdefault(chave, [asyncio.Lock(), 0])
+        entrada[1] += 1
+        trava = entrada[0]
+        try:
+            if trava.locked():
+                self.esperas += 1
+            async with trava:
+                yield
+        finally:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del self._travas[chave]
+
+    def __len__(self) -> int:
+        return len(self._travas)
@@ -3,34 +3,197 @@ Chatbot Vendedor - IA conversacional com histórico
 Usa GitHub Copilot para responder mensagens de vendedores
 """
 import os
+import sys
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Executado direto (python src/chatbot/vendedor_chatbot.py): src/ no sys.path para ai/ e transcription/
+_PASTA_SRC = str(Path(__file__).resolve().parent.parent)
+if _PASTA_SRC not in sys.path:
+    sys.path.append(_PASTA_SRC)
+
 try:
     from transcription.copilot_client import GitHubCopilotClient
 except ImportError:
     GitHubCopilotClient = None
 
+try:
+    from ai.intencoes import carregar_motor
+except ImportError:
+    carregar_motor = None
+
+try:
+    from armazenamento.particoes import DiretorioParticionado
+except ImportError:
+    DiretorioParticionado = None
+
+try:
+    from chatbot.travas import TravasAsyncPorChave, TravasPorChave
+except ImportError:
+    # Executado direto (python src/chatbot/vendedor_chatbot.py): módulos vizinhos sem o pacote
+    from travas import TravasAsyncPorChave, TravasPorChave
+
+try:
+    from chatbot.cache_conversas import CacheConversas
+    from chatbot.log_conversas import LogConversas
+    from chatbot.resumo_conversas import PROMPT_RESUMO, ROLE_RESUMO, ResumidorConversas
+except ImportError:
+    try:
+        from cache_conversas import CacheConversas
+        from log_conversas import LogConversas
+        from resumo_conversas import PROMPT_RESUMO, ROLE_RESUMO, ResumidorConversas
+    except ImportError:
+        # Sem cache, log e resumo: arquivo JSON inteiro por conversa, como antes
+        CacheConversas = LogConversas = ResumidorConversas = None
+        ROLE_RESUMO = 'summary'
+
 try:
     import openai
 except ImportError:
     openai = None
 
+# Respostas locais por intenção (regras em intencoes_vendedor.json)
+RESPOSTAS_FALLBACK = {
+    'preco': """Bom ponto! Aqui estão estratégias para tratar objeção de preço:
+
+1️⃣ **Foque no ROI**: "Este investimento traz X% de retorno em Y meses"
+2️⃣ **Compare valor**: "Versus concorrente Z, temos mais recursos"
+3️⃣ **Parcelamento**: "Podemos oferecer 3-12x sem juros"
+4️⃣ **Prova social**: "Clientes similares economizaram 40%"
+
+Qual desses argumentos combina com seu cliente?""",
+
+    'pagamento': """Ótima pergunta sobre condições de pagamento!
+
+💳 **Opções recomendadas**:
+- À vista: -10% de desconto
+- 3x: sem juros
+- 6x até 12x: taxa de 2% a.m
+- Customizado: para grandes volumes
+
+📞 Dica: Ofereça sempre 2-3 opções. Deixe o cliente escolher = maior chance de fechar.
+
+Qual é o investimento total?""",
+
+    'agendamento': """Perfeito! Hora de agendar:
+
+📅 **Passo a passo**:
+1. Confirme nome + telefone do cliente
+2. Sugira 2-3 horários (não pergunte "quando você quer?")
+3. Envie link do calendario ou WhatsApp direto
+4. Confirme 1h antes da reunião
+
+🎯 Dica: Reuniões com dia/hora específica têm 70% mais taxa de presença.
+
+Qual é o próximo passo com seu cliente?""",
+
+    'qualificacao': """Ótimo! Vamos qualificar esse contato:
+
+❓ **Perguntas importantes**:
+1. Nome completo + empresa?
+2. Orçamento aproximado?
+3. Quando precisa/quando quer decidir?
+4. Quem mais precisa estar na conversa?
+5. Qual problema ele quer resolver?
+
+📊 Quanto mais info você tem = melhor sua proposta.
+
+Me conta mais sobre esse cliente!""",
+
+    'proposta': """Vamos estruturar a proposta:
+
+📋 **Elementos essenciais**:
+1. Resumo executivo (o que ele vai ganhar)
+2. Solução customizada (para o DELE)
+3. Preço + condições (simples e claro)
+4. Timeline de implementação
+5. ROI + próximos passos
+
+⚡ Dica: Proposta de 1 página é 3x melhor que 10 páginas.
+
+Qual é o produto/serviço que você vende?""",
+
+    'objecao': """Todo "não" é oportunidade! 🎯
+
+**Framework para vencer objeções**:
+
+1️⃣ **ESCUTE**: Deixe falar até o final
+2️⃣ **EMPATIZE**: "Entendo sua preocupação"
+3️⃣ **EXPLORE**: "Me conta mais sobre..."
+4️⃣ **PIVOTE**: Mude de ângulo/benefício
+5️⃣ **PROPONHA**: "E se fizéssemos assim..."
+
+Qual é a objeção exatamente?""",
+}
+
+RESPOSTA_GENERICA = """Entendi! 📝
+
+Para ajudar melhor, preciso saber:
+- Está em qual etapa da venda? (prospecting, apresentação, fechamento)
+- Qual é o principal desafio agora?
+- Qual produto/serviço você vende?
+
+Digite seus detalhes e vou te dar uma estratégia prática! 💡"""
+
+ARQUIVO_INTENCOES = Path(__file__).resolve().parent / 'intencoes_vendedor.json'
+
 
 class VendedorChatbot:
     """Chatbot para vendedores com histórico de conversa."""
     
-    def __init__(self, github_token: Optional[str] = None):
-        """Inicializar chatbot."""
+    def __init__(self, github_token: Optional[str] = None, usar_ia: Optional[bool] = None):
+        """Inicializar chatbot.
+        
+        Args:
+            github_token: Token do GitHub Models
+            usar_ia: Responder com IA (padrão: CHATBOT_USAR_IA); sem IA usa respostas por palavras-chave
+        """
         self.github_token = github_token or os.getenv('GITHUB_TOKEN')
+        if usar_ia is None:
+            usar_ia = os.getenv('CHATBOT_USAR_IA', 'false').lower() == 'true'
+        self.usar_ia = usar_ia
         self.conversations_dir = Path('conversations')
         self.conversations_dir.mkdir(exist_ok=True)
         
+        # Um arquivo por telefone em subpastas por hash (conversations/ab/cd/) + manifesto dos telefones
+        self.particoes = None
+        if DiretorioParticionado:
+            self.particoes = DiretorioParticionado(
+                self.conversations_dir,
+                'conv_',
+                extensoes=('.json', '.jsonl'),
+                niveis=int(os.getenv('ARMAZENAMENTO_NIVEIS_PARTICAO', '2'))
+            )
+        
+        # Turnos do mesmo telefone em série (ler histórico -> responder -> salvar sem perder turno)
+        self.travas = TravasPorChave()
+        
+        # 'log': turnos acrescentados em conv_<telefone>.jsonl + snapshot compactado; 'json': arquivo inteiro por turno
+        self.log = None
+        if LogConversas and os.getenv('CHATBOT_ARMAZENAMENTO', 'log').lower() == 'log':
+            self.log = LogConversas(
+                self.conversations_dir,
+                turnos_por_snapshot=int(os.getenv('CHATBOT_TURNOS_POR_SNAPSHOT', '200')),
+                particoes=self.particoes
+            )
+        
+        # Conversas ativas em memória (LRU); o disco é atualizado em segundo plano
+        self.cache = None
+        if CacheConversas and os.getenv('CHATBOT_CACHE_ATIVO', 'true').lower() == 'true':
+            self.cache = CacheConversas(
+                self._ler_conversa_disco,
+                self._gravar_conversa_disco,
+                max_conversas=int(os.getenv('CHATBOT_CACHE_MAX_CONVERSAS', '1000')),
+                intervalo_gravacao=float(os.getenv('CHATBOT_GRAVACAO_INTERVALO_SEGUNDOS', '2'))
+            )
+        
         # Inicializar client de IA
         self.ai_client = None
         try:
@@ -38,17 +201,113 @@ class VendedorChatbot:
                 self.ai_client = GitHubCopilotClient(self.github_token)
         except Exception as e:
             print(f"⚠️ Aviso ao inicializar GitHub Copilot: {e}")
+        
+        # Turnos antigos viram um resumo (role 'summary') em segundo plano
+        self.resumidor = None
+        if ResumidorConversas and os.getenv('CHATBOT_RESUMO_ATIVO', 'true').lower() == 'true':
+            self.resumidor = ResumidorConversas(
+                self.load_conversation_history,
+                self._aplicar_resumo,
+                resumir_ia=self._resumir_com_ia if self.usar_ia and self.ai_client else None,
+                gatilho=int(os.getenv('CHATBOT_RESUMO_GATILHO', '40')),
+                manter_recentes=int(os.getenv('CHATBOT_RESUMO_MANTER', '20')),
+                max_caracteres=int(os.getenv('CHATBOT_RESUMO_MAX_CARACTERES', '1500'))
+            )
     
-    def get_conversation_file(self, user_phone: str) -> Path:
-        """Obter caminho do arquivo de histórico do usuário."""
+    def get_conversation_file(self, user_phone: str, criar: bool = False) -> Path:
+        """Obter caminho do arquivo de histórico do usuário (criar=True ao gravar: registra no manifesto)."""
         # Limpar telefone para nome de arquivo
         phone_clean = user_phone.replace('+', '').replace(' ', '').replace('-', '')
+        if self.particoes is not None:
+            return self.particoes.arquivo(phone_clean, criar=criar)
         return self.conversations_dir / f"conv_{phone_clean}.json"
     
+    def list_conversations(self) -> List[str]:
+        """Telefones (limpos) com conversa salva, pelo manifesto (sem varrer as pastas)."""
+        if self.particoes is not None:
+            return self.particoes.chaves()
+        return sorted({p.stem.replace('conv_', '') for p in self.conversations_dir.glob('conv_*.json*')})
+    
     def load_conversation_history(self, user_phone: str) -> List[Dict]:
-        """Carregar histórico de conversa do usuário."""
-        conv_file = self.get_conversation_file(user_phone)
+        """Carregar histórico de conversa do usuário (da memória, se estiver no cache)."""
+        if self.cache:
+            return self.cache.obter(user_phone)
+        return self._ler_conversa_disco(user_phone)
+    
+    def save_conversation_history(self, user_phone: str, messages: List[Dict]):
+        """Salvar histórico de conversa do usuário (com cache, a gravação em disco é adiada)."""
+        if self.cache:
+            self.cache.atualizar(user_phone, messages)
+            return
+        try:
+            self._gravar_conversa_disco(user_phone, messages)
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar histórico: {e}")
+    
+    def recent_messages(self, user_phone: str, quantidade: int = 10, com_resumo: bool = False) -> List[Dict]:
+        """
+        Últimas mensagens da conversa (memória, fim do log ou arquivo inteiro, nessa ordem).
+
+        Args:
+            com_resumo: Manter o resumo dos turnos antigos na frente (o fim do log não o contém)
+        """
+        if self.cache and self.cache.contem(user_phone):
+            messages = self.cache.obter(user_phone)
+            primeira = messages[0] if messages else None
+        elif self.log:
+            try:
+                messages = self.log.ler_ultimas(user_phone, quantidade + 1)
+                primeira = self.log.primeira_mensagem(user_phone) if com_resumo else None
+            except Exception as e:
+                print(f"⚠️ Erro ao carregar histórico: {e}")
+                return []
+        else:
+            messages = self._ler_conversa_disco(user_phone)
+            primeira = messages[0] if messages else None
+        recentes = [msg for msg in messages if msg.get('role') != ROLE_RESUMO][-quantidade:]
+        if com_resumo and primeira and primeira.get('role') == ROLE_RESUMO:
+            return [primeira] + recentes
+        return recentes
+    
+    def _aplicar_resumo(self, user_phone: str, resumidas: List[Dict], resumo: Dict) -> bool:
+        """Trocar o início da conversa pelo resumo, se ele não mudou desde a leitura do resumidor."""
+        with self.travas.travar(user_phone):
+            messages = self.load_conversation_history(user_phone)
+            if messages[:len(resumidas)] != resumidas:
+                return False
+            self.save_conversation_history(user_phone, [resumo] + messages[len(resumidas):])
+            return True
+    
+    def _resumir_com_ia(self, user_phone: str, resumo_anterior: Optional[str], messages: List[Dict]) -> Optional[str]:
+        """Resumo dos turnos antigos pela IA (None = usar o resumo local)."""
+        transcricao = "\n".join(
+            f"{'Vendedor' if msg.get('role') == 'user' else 'IA'}: {msg.get('content', '')}"
+            for msg in messages
+        )
+        max_caracteres = self.resumidor.max_caracteres
+        return self.ai_client.chat_completion(
+            [
+                {'role': 'system', 'content': PROMPT_RESUMO.format(max_caracteres=max_caracteres)},
+                {'role': 'user', 'content': f"Resumo anterior:\n{resumo_anterior or '(nenhum)'}\n\nNovos turnos:\n{transcricao}"}
+            ],
+            temperature=0.2, max_tokens=400, rota='resumo', numero=user_phone
+        )
+    
+    def flush_conversations(self):
+        """Gravar no disco as conversas alteradas que ainda estão só em memória."""
+        if self.cache:
+            self.cache.gravar_alteradas()
+    
+    def _ler_conversa_disco(self, user_phone: str) -> List[Dict]:
+        """Ler o arquivo de histórico do usuário."""
+        if self.log:
+            try:
+                return self.log.carregar(user_phone)
+            except Exception as e:
+                print(f"⚠️ Erro ao carregar histórico: {e}")
+                return []
         
+        conv_file = self.get_conversation_file(user_phone)
         if conv_file.exists():
             try:
                 with open(conv_file, 'r', encoding='utf-8') as f:
@@ -60,26 +319,39 @@ class VendedorChatbot:
         
         return []
     
-    def save_conversation_history(self, user_phone: str, messages: List[Dict]):
-        """Salvar histórico de conversa do usuário."""
-        conv_file = self.get_conversation_file(user_phone)
+    def _gravar_conversa_disco(self, user_phone: str, messages: List[Dict]):
+        """Gravar o arquivo de histórico do usuário (levanta exceção para o write-behind tentar de novo)."""
+        if self.log:
+            self.log.gravar(user_phone, messages)
+            return
         
-        try:
-            data = {
-                'user_phone': user_phone,
-                'messages': messages,
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            with open(conv_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"⚠️ Erro ao salvar histórico: {e}")
+        conv_file = self.get_conversation_file(user_phone, criar=True)
+        data = {
+            'user_phone': user_phone,
+            'messages': messages,
+            'last_updated': datetime.now().isoformat()
+        }
+        
+        # Arquivo temporário + rename: uma gravação interrompida não corrompe o histórico
+        temporario = conv_file.with_suffix('.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, conv_file)
     
-    def format_conversation_for_ai(self, messages: List[Dict]) -> str:
-        """Formatar histórico de conversa para enviar à IA."""
+    def format_conversation_for_ai(
+        self,
+        messages: Optional[List[Dict]] = None,
+        user_phone: Optional[str] = None
+    ) -> str:
+        """Formatar histórico de conversa para enviar à IA (sem messages, lê só o fim da conversa do usuário)."""
+        if messages is None:
+            messages = self.recent_messages(user_phone, 10, com_resumo=True) if user_phone else []
         formatted = "=== HISTÓRICO DE CONVERSA ===\n\n"
         
+        if messages and messages[0].get('role') == ROLE_RESUMO:
+            formatted += f"📌 Resumo dos turnos anteriores:\n{messages[0].get('content', '')}\n\n"
+            messages = messages[1:]
+        
         for msg in messages[-10:]:  # Últimas 10 mensagens
             role = msg.get('role', 'user')
             content = msg.get('content', '')
@@ -112,101 +384,36 @@ REGRAS:
 
 Responda em português brasileiro, de forma concisa (máximo 500 caracteres)."""
     
-    def _generate_fallback_response(self, user_message: str) -> str:
-        """Gerar resposta automática baseada em palavras-chave."""
-        msg_lower = user_message.lower()
-        
-        # Dicionário de respostas por contexto
-        if any(word in msg_lower for word in ['preço', 'custo', 'valor', 'caro', 'custa']):
-            return """Bom ponto! Aqui estão estratégias para tratar objeção de preço:
-
-1️⃣ **Foque no ROI**: "Este investimento traz X% de retorno em Y meses"
-2️⃣ **Compare valor**: "Versus concorrente Z, temos mais recursos"
-3️⃣ **Parcelamento**: "Podemos oferecer 3-12x sem juros"
-4️⃣ **Prova social**: "Clientes similares economizaram 40%"
-
-Qual desses argumentos combina com seu cliente?"""
+    def _generate_ai_response(self, messages: List[Dict], user_phone: Optional[str] = None) -> Optional[str]:
+        """Gerar resposta com a IA usando as últimas mensagens como contexto."""
+        ai_messages = [{'role': 'system', 'content': self.generate_system_prompt()}]
+        if messages and messages[0].get('role') == ROLE_RESUMO:
+            ai_messages.append({'role': 'system', 'content': f"Resumo da conversa até aqui:\n{messages[0].get('content', '')}"})
+            messages = messages[1:]
+        for msg in messages[-10:]:
+            ai_messages.append({
+                'role': 'assistant' if msg.get('role') == 'assistant' else 'user',
+                'content': msg.get('content', '')
+            })
         
-        elif any(word in msg_lower for word in ['parcelado', 'parcelament', 'pagar', 'pagamento', 'condição']):
-            return """Ótima pergunta sobre condições de pagamento!
-
-💳 **Opções recomendadas**:
-- À vista: -10% de desconto
-- 3x: sem juros
-- 6x até 12x: taxa de 2% a.m
-- Customizado: para grandes volumes
-
-📞 Dica: Ofereça sempre 2-3 opções. Deixe o cliente escolher = maior chance de fechar.
-
-Qual é o investimento total?"""
-        
-        elif any(word in msg_lower for word in ['agenda', 'reunião', 'marcar', 'agendar', 'horário']):
-            return """Perfeito! Hora de agendar:
-
-📅 **Passo a passo**:
-1. Confirme nome + telefone do cliente
-2. Sugira 2-3 horários (não pergunte "quando você quer?")
-3. Envie link do calendario ou WhatsApp direto
-4. Confirme 1h antes da reunião
-
-🎯 Dica: Reuniões com dia/hora específica têm 70% mais taxa de presença.
-
-Qual é o próximo passo com seu cliente?"""
-        
-        elif any(word in msg_lower for word in ['cliente', 'prospect', 'lead', 'contato', 'pessoa']):
-            return """Ótimo! Vamos qualificar esse contato:
-
-❓ **Perguntas importantes**:
-1. Nome completo + empresa?
-2. Orçamento aproximado?
-3. Quando precisa/quando quer decidir?
-4. Quem mais precisa estar na conversa?
-5. Qual problema ele quer resolver?
-
-📊 Quanto mais info você tem = melhor sua proposta.
-
-Me conta mais sobre esse cliente!"""
-        
-        elif any(word in msg_lower for word in ['proposta', 'cotação', 'orçamento', 'quote']):
-            return """Vamos estruturar a proposta:
-
-📋 **Elementos essenciais**:
-1. Resumo executivo (o que ele vai ganhar)
-2. Solução customizada (para o DELE)
-3. Preço + condições (simples e claro)
-4. Timeline de implementação
-5. ROI + próximos passos
-
-⚡ Dica: Proposta de 1 página é 3x melhor que 10 páginas.
-
-Qual é o produto/serviço que você vende?"""
-        
-        elif any(word in msg_lower for word in ['objeção', 'problema', 'dificuldade', 'não quer', 'recusa']):
-            return """Todo "não" é oportunidade! 🎯
-
-**Framework para vencer objeções**:
-
-1️⃣ **ESCUTE**: Deixe falar até o final
-2️⃣ **EMPATIZE**: "Entendo sua preocupação"
-3️⃣ **EXPLORE**: "Me conta mais sobre..."
-4️⃣ **PIVOTE**: Mude de ângulo/benefício
-5️⃣ **PROPONHA**: "E se fizéssemos assim..."
-
-Qual é a objeção exatamente?"""
-        
-        else:
-            # Resposta genérica
-            return """Entendi! 📝
-
-Para ajudar melhor, preciso saber:
-- Está em qual etapa da venda? (prospecting, apresentação, fechamento)
-- Qual é o principal desafio agora?
-- Qual produto/serviço você vende?
-
-Digite seus detalhes e vou te dar uma estratégia prática! 💡"""
+        return self.ai_client.chat_completion(
+            ai_messages, temperature=0.7, max_tokens=300, rota='vendedor', numero=user_phone
+        )
+    
+    def _generate_fallback_response(self, user_message: str) -> str:
+        """Gerar resposta automática baseada em palavras-chave (motor de intenções, uma passada)."""
+        intencao = carregar_motor(str(ARQUIVO_INTENCOES)).primeira(user_message) if carregar_motor else None
+        if intencao:
+            return RESPOSTAS_FALLBACK.get(intencao['intencao'], RESPOSTA_GENERICA)
+        return RESPOSTA_GENERICA
     
     def chat(self, user_phone: str, user_message: str) -> Optional[str]:
-        """Processar mensagem do usuário e gerar resposta."""
+        """Processar mensagem do usuário e gerar resposta (turnos do mesmo usuário entram em fila)."""
+        with self.travas.travar(user_phone):
+            return self._chat(user_phone, user_message)
+    
+    def _chat(self, user_phone: str, user_message: str) -> Optional[str]:
+        """Um turno completo: carregar histórico, responder e salvar (chamar com a trava do usuário)."""
         
         # Carregar histórico
         messages = self.load_conversation_history(user_phone)
@@ -218,9 +425,14 @@ Digite seus detalhes e vou te dar uma estratégia prática! 💡"""
             'timestamp': datetime.now().isoformat()
         })
         
-        # Usar fallback response (sem IA para evitar JSON estruturado)
-        # O ai_client retorna JSON estruturado para CRM, não é apropriado para chat
-        response_text = self._generate_fallback_response(user_message)
+        # IA via chat_completion (texto livre, pelo cliente HTTP compartilhado);
+        # processar_texto_com_copilot não serve aqui porque devolve JSON estruturado de CRM
+        response_text = None
+        if self.usar_ia and self.ai_client:
+            response_text = self._generate_ai_response(messages, user_phone)
+        
+        if not response_text:
+            response_text = self._generate_fallback_response(user_message)
         
         # Se ainda estiver muito longo, truncar
         if len(response_text) > 500:
@@ -236,6 +448,10 @@ Digite seus detalhes e vou te dar uma estratégia prática! 💡"""
         # Salvar histórico atualizado
         self.save_conversation_history(user_phone, messages)
         
+        # Conversa longa: resumo em segundo plano (não atrasa esta resposta)
+        if self.resumidor:
+            self.resumidor.agendar(user_phone, messages)
+        
         return response_text
     
     def get_conversation_summary(self, user_phone: str) -> Optional[str]:
@@ -245,8 +461,13 @@ Digite seus detalhes e vou te dar uma estratégia prática! 💡"""
         if not messages:
             return "Nenhuma conversa registrada"
         
+        resumidas = 0
+        if messages[0].get('role') == ROLE_RESUMO:
+            resumidas = messages[0].get('turnos_resumidos', 0)
+            messages = messages[1:]
+        
         summary = f"""📊 RESUMO DA CONVERSA COM {user_phone}
-Mensagens: {len(messages)}
+Mensagens: {len(messages) + resumidas}{f' ({resumidas} resumidas)' if resumidas else ''}
 Última atualização: {datetime.now().isoformat()}
 
 Últimas 3 mensagens:
@@ -263,9 +484,20 @@ Mensagens: {len(messages)}
         """Limpar histórico de conversa (começar do zero)."""
         conv_file = self.get_conversation_file(user_phone)
         
+        def apagar():
+            if self.log:
+                self.log.apagar(user_phone)
+            else:
+                conv_file.unlink(missing_ok=True)
+                if self.particoes is not None:
+                    self.particoes.remover(conv_file.stem.replace('conv_', '', 1))
+        
         try:
-            if conv_file.exists():
-                conv_file.unlink()
+            with self.travas.travar(user_phone):
+                if self.cache:
+                    self.cache.remover(user_phone, apagar)
+                else:
+                    apagar()
             return True
         except Exception as e:
             print(f"❌ Erro ao limpar conversa: {e}")
@@ -275,8 +507,16 @@ Mensagens: {len(messages)}
 class ChatbotManager:
     """Gerenciador central de chatbots."""
     
-    def __init__(self):
+    def __init__(self, max_paralelo: Optional[int] = None):
+        """
+        Args:
+            max_paralelo: Usuários atendidos ao mesmo tempo na API assíncrona (padrão: CHATBOT_MAX_PARALELO)
+        """
         self.chatbot = VendedorChatbot()
+        self.max_paralelo = max_paralelo or int(os.getenv('CHATBOT_MAX_PARALELO', '8'))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_paralelo, thread_name_prefix='chatbot')
+        # Fila por usuário no event loop: mensagens do mesmo telefone não ocupam worker esperando a vez
+        self._travas_async = TravasAsyncPorChave()
     
     def processar_mensagem_whatsapp(self, phone_number: str, message_text: str) -> str:
         """Processar mensagem WhatsApp e retornar resposta."""
@@ -292,6 +532,42 @@ class ChatbotManager:
         # Processar como mensagem normal
         response = self.chatbot.chat(phone_number, message_text)
         return response or "Desculpe, não consegui processar sua mensagem"
+    
+    async def processar_mensagem_whatsapp_async(self, phone_number: str, message_text: str) -> str:
+        """
+        Versão assíncrona: usuários diferentes em paralelo no pool de workers,
+        mensagens do mesmo usuário uma de cada vez, na ordem de chegada.
+        """
+        async with self._travas_async.travar(phone_number):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self.processar_mensagem_whatsapp, phone_number, message_text
+            )
+    
+    async def processar_lote_async(self, mensagens: Iterable[Tuple[str, str]]) -> List[str]:
+        """Processar várias (telefone, texto) de uma vez; respostas na mesma ordem da entrada."""
+        return list(await asyncio.gather(*(
+            self.processar_mensagem_whatsapp_async(phone_number, message_text)
+            for phone_number, message_text in mensagens
+        )))
+    
+    def estatisticas(self) -> Dict:
+        """Usuários com turno em andamento/na fila e esperas por turno do mesmo usuário."""
+        return {
+            'max_paralelo': self.max_paralelo,
+            'usuarios_em_andamento': len(self._travas_async),
+            'esperas_mesmo_usuario': self._travas_async.esperas + self.chatbot.travas.esperas,
+            'cache_conversas': self.chatbot.cache.estatisticas() if self.chatbot.cache else None,
+            'resumos': self.chatbot.resumidor.estatisticas() if self.chatbot.resumidor else None
+        }
+    
+    def encerrar(self):
+        """Esperar os turnos em andamento e os resumos, gravar as conversas pendentes e parar o write-behind."""
+        self._executor.shutdown(wait=True)
+        if self.chatbot.resumidor:
+            self.chatbot.resumidor.encerrar()
+        if self.chatbot.cache:
+            self.chatbot.cache.parar()
 
 
 # Teste
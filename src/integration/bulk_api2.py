@@ -0,0 +1,126 @@
+"""
+Bulk API 2.0 (ingest) do Salesforce sobre a sessão do simple_salesforce
+Um job por CSV: criar, enviar os dados (um PUT só por job), marcar UploadComplete e
+acompanhar o estado até o Salesforce terminar de processar. As linhas com erro voltam
+em CSV (failedResults) com as colunas originais + sf__Id/sf__Error
+"""
+
+import json
+import time
+from typing import Any, Dict, Optional
+
+# Estados finais de um job de ingestão
+ESTADOS_FINAIS = ('JobComplete', 'Failed', 'Aborted')
+
+# Limite de dados por job (150 MB em base64 no Salesforce, ~100 MB de CSV)
+TAMANHO_MAXIMO_CSV = 100 * 1024 * 1024
+
+
+class ErroBulkApi(Exception):
+    """Resposta HTTP de erro da Bulk API 2.0."""
+
+    def __init__(self, status_code: int, texto: str = ''):
+        super().__init__(f"HTTP {status_code}: {texto[:300]}")
+        self.status_code = status_code
+        self.texto = texto
+
+
+class BulkApi2:
+    """Jobs de ingestão (insert/update/upsert/delete) em CSV."""
+
+    def __init__(self, sf, intervalo_consulta: float = 5.0):
+        """
+        Args:
+            sf: Conexão simple_salesforce já autenticada (usa session, base_url e headers)
+            intervalo_consulta: Segundos entre consultas de estado em aguardar()
+        """
+        self.sf = sf
+        self.intervalo_consulta = intervalo_consulta
+
+    def _requisicao(self, metodo: str, caminho: str, corpo: Any = None, content_type: str = 'application/json',
+                    accept: str = 'application/json'):
+        headers = dict(self.sf.headers)
+        headers.update({'Content-Type': content_type, 'Accept': accept})
+        if corpo is not None and content_type == 'application/json':
+            corpo = json.dumps(corpo)
+        resposta = self.sf.session.request(
+            metodo, f"{self.sf.base_url}jobs/ingest/{caminho}", headers=headers, data=corpo
+        )
+        if resposta.status_code >= 400:
+            raise ErroBulkApi(resposta.status_code, resposta.text)
+        return resposta
+
+    # ---------- ciclo do job ----------
+
+    def criar_job(self, objeto: str, operacao: str = 'insert', campo_externo: Optional[str] = None) -> str:
+        """
+        Returns:
+            Id do job (estado Open, esperando os dados)
+        """
+        corpo = {'object': objeto, 'operation': operacao, 'contentType': 'CSV', 'lineEnding': 'LF'}
+        if campo_externo:
+            corpo['externalIdFieldName'] = campo_externo
+        return self._requisicao('POST', '', corpo).json()['id']
+
+    def enviar_csv(self, job_id: str, conteudo: bytes):
+        """Enviar os dados do job (CSV UTF-8 com cabeçalho, fim de linha LF)."""
+        if len(conteudo) > TAMANHO_MAXIMO_CSV:
+            raise ValueError(f"CSV de {len(conteudo)} bytes passa do limite de um job ({TAMANHO_MAXIMO_CSV})")
+        self._requisicao('PUT', f"{job_id}/batches", conteudo, content_type='text/csv')
+
+    def fechar_job(self, job_id: str) -> Dict[str, Any]:
+        """Marcar UploadComplete: o Salesforce começa a processar."""
+        return self._requisicao('PATCH', job_id, {'state': 'UploadComplete'}).json()
+
+    def abortar_job(self, job_id: str) -> Dict[str, Any]:
+        return self._requisicao('PATCH', job_id, {'state': 'Aborted'}).json()
+
+    def estado(self, job_id: str) -> Dict[str, Any]:
+        """Info do job: state, numberRecordsProcessed, numberRecordsFailed, errorMessage..."""
+        return self._requisicao('GET', job_id).json()
+
+    def ingerir(self, objeto: str, conteudo: bytes, operacao: str = 'insert') -> str:
+        """
+        Criar o job, enviar o CSV e fechar (sem esperar o processamento).
+
+        Returns:
+            Id do job (acompanhar com estado()/aguardar())
+        """
+        job_id = self.criar_job(objeto, operacao)
+        try:
+            self.enviar_csv(job_id, conteudo)
+            self.fechar_job(job_id)
+        except Exception:
+            # Job aberto sem dados fica ocupando o limite de jobs até expirar
+            try:
+                self.abortar_job(job_id)
+            except Exception:
+                pass
+            raise
+        return job_id
+
+    def aguardar(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Consultar o job até um estado final.
+
+        Returns:
+            Info do job no estado final (ou a última lida, se o timeout passar)
+        """
+        limite = time.monotonic() + timeout if timeout else None
+        while True:
+            info = self.estado(job_id)
+            if info.get('state') in ESTADOS_FINAIS:
+                return info
+            if limite and time.monotonic() >= limite:
+                return info
+            time.sleep(self.intervalo_consulta)
+
+    # ---------- resultados ----------
+
+    def resultados_com_falha(self, job_id: str) -> bytes:
+        """CSV das linhas rejeitadas: sf__Id, sf__Error + colunas enviadas."""
+        return self._requisicao('GET', f"{job_id}/failedResults/", accept='text/csv').content
+
+    def resultados_sem_processar(self, job_id: str) -> bytes:
+        """CSV das linhas que o Salesforce não chegou a processar (job abortado/falho)."""
+        return self._requisicao('GET', f"{job_id}/unprocessedrecords/", accept='text/csv').content
@@ -0,0 +1,105 @@
+"""
+Cache das buscas de Account por telefone (TTL + LRU, com cache negativo)
+Números desconhecidos também ficam guardados (TTL menor), para o mesmo remetente
+não custar duas consultas SOQL a cada mensagem
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Entrada sem resultado em cache (diferente de "não está no cache")
+_NAO_ENCONTRADO = object()
+
+
+class CacheBuscaTelefone:
+    """Resultado de lookup_account_by_phone por telefone normalizado."""
+
+    def __init__(self, ttl_acerto: float = 3600, ttl_falta: float = 300, max_itens: int = 10000):
+        """
+        Args:
+            ttl_acerto: Segundos que um telefone encontrado fica em cache
+            ttl_falta: Segundos que um telefone sem Account/Contact fica em cache
+            max_itens: Telefones em memória (os menos usados saem primeiro)
+        """
+        self.ttl_acerto = ttl_acerto
+        self.ttl_falta = ttl_falta
+        self.max_itens = max_itens
+        # telefone -> (resultado ou _NAO_ENCONTRADO, expira_em, consultas que a busca custou)
+        self.itens: 'OrderedDict[str, Tuple[Any, float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.hits_negativos = 0
+        self.misses = 0
+        self.expirados = 0
+        self.removidos_lru = 0
+        self.invalidados = 0
+        self.consultas_evitadas = 0
+
+    def obter(self, telefone: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Returns:
+            (se estava em cache, resultado); (True, None) = número sabidamente sem cadastro
+        """
+        with self._lock:
+            item = self.itens.get(telefone)
+            if item is None:
+                self.misses += 1
+                return False, None
+            resultado, expira_em, consultas = item
+            if expira_em <= time.time():
+                del self.itens[telefone]
+                self.expirados += 1
+                self.misses += 1
+                return False, None
+            self.itens.move_to_end(telefone)
+            self.hits += 1
+            self.consultas_evitadas += consultas
+            if resultado is _NAO_ENCONTRADO:
+                self.hits_negativos += 1
+                return True, None
+            return True, dict(resultado)
+
+    def guardar(self, telefone: str, resultado: Optional[Dict[str, Any]], consultas: int):
+        """
+        Args:
+            resultado: Account encontrada ou None (cache negativo, TTL menor)
+            consultas: Chamadas à API que essa busca custou (somadas a cada hit)
+        """
+        ttl = self.ttl_acerto if resultado else self.ttl_falta
+        if ttl <= 0:
+            return
+        with self._lock:
+            self.itens[telefone] = (dict(resultado) if resultado else _NAO_ENCONTRADO, time.time() + ttl, consultas)
+            self.itens.move_to_end(telefone)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+                self.removidos_lru += 1
+
+    def invalidar(self, telefone: Optional[str] = None):
+        """Esquecer um telefone (cadastro novo/alterado) ou, sem telefone, todos."""
+        with self._lock:
+            if telefone is None:
+                self.invalidados += len(self.itens)
+                self.itens.clear()
+            elif self.itens.pop(telefone, None) is not None:
+                self.invalidados += 1
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'itens': len(self.itens),
+                'max_itens': self.max_itens,
+                'ttl_acerto': self.ttl_acerto,
+                'ttl_falta': self.ttl_falta,
+                'hits': self.hits,
+                'hits_negativos': self.hits_negativos,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+                'consultas_evitadas': self.consultas_evitadas,
+                'expirados': self.expirados,
+                'removidos_lru': self.removidos_lru,
+                'invalidados': self.invalidados
+            }
@@ -0,0 +1,164 @@
+"""
+Gravação em lote no Salesforce (sObject Collections)
+Os registros entram numa fila por sObject e saem em chamadas de até 200 (limite da
+API), quando a fila enche ou quando o registro mais antigo espera mais que o intervalo.
+Quem enfileira recebe um Future com o resultado daquele registro
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Máximo de registros por chamada em /composite/sobjects
+TAMANHO_MAXIMO_LOTE = 200
+
+
+class EscritorEmLote:
+    """Filas por sObject descarregadas por uma thread própria."""
+
+    def __init__(
+        self,
+        enviar: Callable[[str, List[Dict[str, Any]]], List[Dict[str, Any]]],
+        tamanho_lote: int = TAMANHO_MAXIMO_LOTE,
+        intervalo: float = 2.0
+    ):
+        """
+        Args:
+            enviar: Função (sObject, registros) -> resultados na mesma ordem
+                    ({'id', 'success', 'errors'} por registro); uma exceção falha o lote todo
+            tamanho_lote: Registros por chamada (no máximo 200)
+            intervalo: Segundos que um registro pode esperar o lote encher
+        """
+        self.enviar = enviar
+        self.tamanho_lote = max(1, min(tamanho_lote, TAMANHO_MAXIMO_LOTE))
+        self.intervalo = intervalo
+        # sObject -> [(registro, future)] e horário do registro mais antigo da fila
+        self.filas: Dict[str, List[Tuple[Dict[str, Any], Future]]] = {}
+        self.desde: Dict[str, float] = {}
+        self._condicao = threading.Condition()
+        self._encerrado = False
+        self.enfileirados = 0
+        self.chamadas = 0
+        self.gravados = 0
+        self.falhas = 0
+        self._thread = threading.Thread(target=self._loop, daemon=True, name='escritor-lotes-salesforce')
+        self._thread.start()
+
+    def enfileirar(self, objeto: str, registro: Dict[str, Any]) -> Future:
+        """
+        Args:
+            objeto: sObject (ex: 'Lead', 'Task')
+            registro: Campos do registro
+
+        Returns:
+            Future com {'id', 'success', 'errors'} do registro
+        """
+        future: Future = Future()
+        with self._condicao:
+            if self._encerrado:
+                raise RuntimeError("Escritor em lote encerrado")
+            fila = self.filas.setdefault(objeto, [])
+            primeiro = not fila
+            if primeiro:
+                self.desde[objeto] = time.monotonic()
+            fila.append((dict(registro), future))
+            self.enfileirados += 1
+            # Fila nova: a thread pode estar dormindo sem prazo e precisa recalcular a espera
+            if primeiro or len(fila) >= self.tamanho_lote:
+                self._condicao.notify()
+        return future
+
+    def descarregar(self, objeto: Optional[str] = None):
+        """Enviar já o que está na fila (de um sObject ou de todos) e esperar as respostas."""
+        while True:
+            with self._condicao:
+                objetos = [objeto] if objeto else list(self.filas)
+                lotes = [self._retirar(nome) for nome in objetos if self.filas.get(nome)]
+            if not lotes:
+                return
+            for nome, itens in lotes:
+                self._enviar_lote(nome, itens)
+
+    def encerrar(self):
+        """Parar a thread depois de enviar tudo o que está na fila."""
+        with self._condicao:
+            self._encerrado = True
+            self._condicao.notify()
+        self._thread.join()
+        self.descarregar()
+
+    # ---------- thread ----------
+
+    def _retirar(self, objeto: str) -> Tuple[str, List[Tuple[Dict[str, Any], Future]]]:
+        """Tirar da fila até um lote do sObject (chamar com o lock)."""
+        fila = self.filas[objeto]
+        itens, self.filas[objeto] = fila[:self.tamanho_lote], fila[self.tamanho_lote:]
+        if self.filas[objeto]:
+            self.desde[objeto] = time.monotonic()
+        else:
+            del self.filas[objeto]
+            self.desde.pop(objeto, None)
+        return objeto, itens
+
+    def _prontos(self) -> List[Tuple[str, List[Tuple[Dict[str, Any], Future]]]]:
+        """Lotes cheios ou vencidos (chamar com o lock)."""
+        agora = time.monotonic()
+        return [
+            self._retirar(objeto) for objeto in list(self.filas)
+            if len(self.filas[objeto]) >= self.tamanho_lote or agora - self.desde[objeto] >= self.intervalo
+        ]
+
+    def _loop(self):
+        while True:
+            with self._condicao:
+                lotes = self._prontos()
+                while not lotes and not self._encerrado:
+                    espera = min(
+                        (self.intervalo - (time.monotonic() - inicio) for inicio in self.desde.values()),
+                        default=None
+                    )
+                    self._condicao.wait(timeout=max(espera, 0) if espera is not None else None)
+                    lotes = self._prontos()
+                if not lotes and self._encerrado:
+                    return
+            for objeto, itens in lotes:
+                self._enviar_lote(objeto, itens)
+
+    def _enviar_lote(self, objeto: str, itens: List[Tuple[Dict[str, Any], Future]]):
+        try:
+            resultados = self.enviar(objeto, [registro for registro, _ in itens])
+        except Exception as e:
+            print(f"❌ Erro ao gravar lote de {len(itens)} {objeto}: {e}")
+            with self._condicao:
+                self.chamadas += 1
+                self.falhas += len(itens)
+            for _, future in itens:
+                future.set_exception(e)
+            return
+
+        gravados = 0
+        for (_, future), resultado in zip(itens, resultados):
+            gravados += bool(resultado.get('success'))
+            future.set_result(resultado)
+        # Resposta mais curta que o lote: os que sobraram não têm resultado
+        for _, future in itens[len(resultados):]:
+            future.set_result({'id': None, 'success': False, 'errors': [{'message': 'Sem resultado na resposta'}]})
+        with self._condicao:
+            self.chamadas += 1
+            self.gravados += gravados
+            self.falhas += len(itens) - gravados
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._condicao:
+            return {
+                'pendentes': {objeto: len(fila) for objeto, fila in self.filas.items()},
+                'tamanho_lote': self.tamanho_lote,
+                'intervalo': self.intervalo,
+                'enfileirados': self.enfileirados,
+                'chamadas': self.chamadas,
+                'gravados': self.gravados,
+                'falhas': self.falhas,
+                'registros_por_chamada': round((self.gravados + self.falhas) / self.chamadas, 1)
+                if self.chamadas else 0.0
+            }
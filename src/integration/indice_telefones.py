@@ -0,0 +1,278 @@
+"""
+Índice local telefone -> Contact/Account do Salesforce (SQLite)
+Os telefones são guardados normalizados em E.164, com celulares brasileiros sempre
+na forma com o nono dígito, então "(65) 9697-7000", "+55 65 99697-7000" e o JID
+"556596977000" caem na mesma chave. Carga completa uma vez, depois só o que mudou
+(SystemModstamp); a consulta ao Salesforce fica como plano B. As entradas de Contact
+levam uma cópia do nome/apelido da Account, refeita quando a Account muda
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def normalizar_telefone(telefone: Optional[str]) -> Optional[str]:
+    """
+    Telefone em E.164 ('+5565996977000') ou None se não parecer um telefone.
+
+    Sem código do país, 10/11 dígitos são tratados como número brasileiro (DDD + número).
+    Celular brasileiro sem o nono dígito (DDD + 8 dígitos começando em 6-9) ganha o 9.
+    """
+    bruto = str(telefone or '').strip()
+    digitos = re.sub(r'\D', '', bruto)
+    if not digitos:
+        return None
+
+    if digitos.startswith('00'):
+        digitos = digitos[2:]  # prefixo internacional
+    elif digitos.startswith('0') and not bruto.startswith('+'):
+        digitos = digitos[1:]  # longa distância: 0 + DDD ou 0 + operadora + DDD
+        if len(digitos) in (12, 13) and not digitos.startswith('55'):
+            digitos = digitos[2:]
+    if len(digitos) in (10, 11) and not bruto.startswith('+'):
+        digitos = '55' + digitos
+
+    # Nono dígito: 55 + DDD + 8 dígitos de celular -> 55 + DDD + 9 + 8 dígitos
+    if len(digitos) == 12 and digitos.startswith('55') and digitos[4] in '6789':
+        digitos = digitos[:4] + '9' + digitos[4:]
+    if not 10 <= len(digitos) <= 15:
+        return None
+    return '+' + digitos
+
+
+class IndiceTelefones:
+    """Telefones normalizados de Contacts (com Account) e Accounts, em SQLite."""
+
+    # Campos de telefone por objeto e colunas lidas na sincronização
+    CAMPOS = {
+        'Contact': (('Phone', 'MobilePhone'),
+                    'Id, FirstName, LastName, Phone, MobilePhone, AccountId, Account.Name, Account.Apelido__c, SystemModstamp'),
+        'Account': (('Phone',), 'Id, Name, Phone, Apelido__c, SystemModstamp'),
+    }
+
+    def __init__(self, arquivo: Path):
+        """
+        Args:
+            arquivo: Banco SQLite do índice (criado se não existir)
+        """
+        self.arquivo = Path(arquivo)
+        self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.arquivo), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS telefones ("
+            "telefone TEXT, objeto TEXT, registro_id TEXT, dados TEXT, conta_id TEXT, "
+            "PRIMARY KEY (telefone, objeto, registro_id))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS sincronizacao (objeto TEXT PRIMARY KEY, ate TEXT, em REAL)")
+        colunas = [linha[1] for linha in self._db.execute("PRAGMA table_info(telefones)")]
+        if 'conta_id' not in colunas:
+            # Índice de versão anterior (sem a Account das entradas de Contact): carga completa de novo
+            self._db.execute("ALTER TABLE telefones ADD COLUMN conta_id TEXT")
+            self._db.execute("DELETE FROM sincronizacao")
+        self._db.execute("CREATE INDEX IF NOT EXISTS telefones_registro ON telefones (registro_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS telefones_conta ON telefones (conta_id)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._lock_sincronizacao = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    # ---------- consulta ----------
+
+    def buscar(self, telefone: str) -> Optional[Dict[str, Any]]:
+        """
+        Account do telefone, no formato de SalesforceIntegrator.lookup_account_by_phone
+        (Contact com Account primeiro, depois Account direto). None se não está no índice.
+        """
+        chave = normalizar_telefone(telefone)
+        if not chave:
+            return None
+        with self._lock:
+            linha = self._db.execute(
+                "SELECT dados FROM telefones WHERE telefone = ? ORDER BY objeto = 'Account' LIMIT 1",
+                (chave,)
+            ).fetchone()
+            if linha is None:
+                self.faltas += 1
+                return None
+            self.acertos += 1
+        return json.loads(linha[0])
+
+    @property
+    def carregado(self) -> bool:
+        """Se a carga completa já rodou (sem ela, uma falta no índice não diz nada)."""
+        return self.ultima_sincronizacao() is not None
+
+    def ultima_sincronizacao(self) -> Optional[float]:
+        """Horário da sincronização mais antiga entre os objetos (None se algum nunca sincronizou)."""
+        with self._lock:
+            linha = self._db.execute("SELECT COUNT(*), MIN(em) FROM sincronizacao").fetchone()
+        return linha[1] if linha[0] == len(self.CAMPOS) else None
+
+    # ---------- escrita ----------
+
+    @staticmethod
+    def _resultado(objeto: str, registro: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Registro do Salesforce -> dict devolvido na consulta (None = não entra no índice)."""
+        if objeto == 'Contact':
+            account = registro.get('Account')
+            if not registro.get('AccountId') or not account:
+                return None  # Contact sem Account não resolve Account (a busca segue para Account)
+            return {
+                'Id': registro['AccountId'],
+                'Name': account.get('Name'),
+                'Apelido__c': account.get('Apelido__c'),
+                'Contact': {
+                    'Id': registro.get('Id'),
+                    'FirstName': registro.get('FirstName'),
+                    'LastName': registro.get('LastName')
+                }
+            }
+        return {campo: registro.get(campo) for campo in ('Id', 'Name', 'Phone', 'Apelido__c')}
+
+    def _gravar(self, objeto: str, registros: Iterable[Dict[str, Any]]) -> int:
+        """Trocar as entradas dos registros pelas atuais (chamar com o lock)."""
+        campos_telefone = self.CAMPOS[objeto][0]
+        total = 0
+        for registro in registros:
+            self._db.execute("DELETE FROM telefones WHERE registro_id = ? AND objeto = ?", (registro['Id'], objeto))
+            if objeto == 'Account':
+                # Contact não muda quando só a Account é renomeada: atualizar a cópia aqui
+                self._atualizar_contacts(registro)
+            dados = self._resultado(objeto, registro)
+            if dados is None:
+                continue
+            texto = json.dumps(dados, ensure_ascii=False)
+            for chave in {normalizar_telefone(registro.get(campo)) for campo in campos_telefone} - {None}:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO telefones (telefone, objeto, registro_id, dados, conta_id) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (chave, objeto, registro['Id'], texto, dados['Id'])
+                )
+                total += 1
+        return total
+
+    def _atualizar_contacts(self, account: Dict[str, Any]):
+        """Nome/apelido da Account nas entradas dos Contacts dela (chamar com o lock)."""
+        linhas = self._db.execute(
+            "SELECT telefone, registro_id, dados FROM telefones WHERE conta_id = ? AND objeto = 'Contact'",
+            (account['Id'],)
+        ).fetchall()
+        for telefone, registro_id, texto in linhas:
+            dados = json.loads(texto)
+            if dados.get('Name') == account.get('Name') and dados.get('Apelido__c') == account.get('Apelido__c'):
+                continue
+            dados.update(Name=account.get('Name'), Apelido__c=account.get('Apelido__c'))
+            self._db.execute(
+                "UPDATE telefones SET dados = ? WHERE telefone = ? AND objeto = 'Contact' AND registro_id = ?",
+                (json.dumps(dados, ensure_ascii=False), telefone, registro_id)
+            )
+
+    def registrar(self, objeto: str, registro: Dict[str, Any]):
+        """Incluir/atualizar um registro avulso (achado no plano B ou recém-criado)."""
+        with self._lock:
+            self._gravar(objeto, [registro])
+            self._db.commit()
+
+    def remover(self, registro_ids: Iterable[str]):
+        with self._lock:
+            self._db.executemany("DELETE FROM telefones WHERE registro_id = ?", [(i,) for i in registro_ids])
+            self._db.commit()
+
+    # ---------- sincronização ----------
+
+    def sincronizar(self, sf, completa: bool = False, lote: int = 2000) -> Dict[str, int]:
+        """
+        Trazer do Salesforce os Contacts/Accounts com telefone.
+
+        Args:
+            sf: Conexão simple_salesforce
+            completa: Recarregar tudo (padrão: completa só na primeira vez, depois incremental)
+            lote: Registros por transação no SQLite
+
+        Returns:
+            Registros lidos por objeto
+        """
+        lidos = {}
+        # Uma sincronização por vez (a periódica não se sobrepõe a uma carga completa)
+        with self._lock_sincronizacao:
+            for objeto, (campos_telefone, colunas) in self.CAMPOS.items():
+                with self._lock:
+                    linha = self._db.execute("SELECT ate FROM sincronizacao WHERE objeto = ?", (objeto,)).fetchone()
+                desde = None if completa or not linha else linha[0]
+
+                filtro = ' OR '.join(f"{campo} != null" for campo in campos_telefone)
+                if desde:
+                    # Sem filtro de telefone: um telefone apagado também precisa sair do índice
+                    filtro = f"SystemModstamp > {desde}"
+                soql = f"SELECT {colunas} FROM {objeto} WHERE {filtro} ORDER BY SystemModstamp"
+
+                if completa or not desde:
+                    with self._lock:
+                        self._db.execute("DELETE FROM telefones WHERE objeto = ?", (objeto,))
+                inicio = datetime.now(timezone.utc)
+                ate, pendentes, lidos[objeto] = desde, [], 0
+                for registro in sf.query_all_iter(soql):
+                    pendentes.append(registro)
+                    ate = registro.get('SystemModstamp') or ate
+                    if len(pendentes) >= lote:
+                        lidos[objeto] += self._gravar_lote(objeto, pendentes)
+                if pendentes:
+                    lidos[objeto] += self._gravar_lote(objeto, pendentes)
+
+                if desde:
+                    self._remover_apagados(sf, objeto, desde, inicio)
+                with self._lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sincronizacao (objeto, ate, em) VALUES (?, ?, ?)",
+                        (objeto, self._formatar_data(ate), time.time())
+                    )
+                    self._db.commit()
+        return lidos
+
+    def _gravar_lote(self, objeto: str, registros: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            self._gravar(objeto, registros)
+            self._db.commit()
+        quantidade = len(registros)
+        registros.clear()
+        return quantidade
+
+    def _remover_apagados(self, sf, objeto: str, desde: str, ate: datetime):
+        """Tirar do índice os registros apagados no Salesforce desde a última sincronização."""
+        try:
+            inicio = datetime.strptime(desde[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+            apagados = getattr(sf, objeto).deleted(inicio, ate).get('deletedRecords', [])
+        except Exception as e:
+            # API de apagados só cobre os últimos 15 dias: depois disso, carga completa
+            print(f"⚠️ Não foi possível ler os {objeto} apagados: {e}")
+            return
+        if apagados:
+            self.remover(item['id'] for item in apagados)
+
+    @staticmethod
+    def _formatar_data(valor: Optional[str]) -> Optional[str]:
+        """SystemModstamp ('2024-05-01T12:00:00.000+0000') -> literal SOQL ('2024-05-01T12:00:00Z')."""
+        return f"{valor[:19]}Z" if valor else None
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            telefones = self._db.execute("SELECT objeto, COUNT(*) FROM telefones GROUP BY objeto").fetchall()
+            sincronizacoes = self._db.execute("SELECT objeto, ate, em FROM sincronizacao").fetchall()
+            total = self.acertos + self.faltas
+            return {
+                'telefones': dict(telefones),
+                'sincronizado_ate': {objeto: ate for objeto, ate, _ in sincronizacoes},
+                'segundos_desde_sincronizacao': round(time.time() - min(em for _, _, em in sincronizacoes))
+                if sincronizacoes else None,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'hit_ratio': round(self.acertos / total, 3) if total else 0.0
+            }
@@ -3,7 +3,12 @@ Salesforce API Integration - Conexão real com Salesforce CRM
 """
 
 import os
+import re
 import json
+import base64
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
@@ -17,6 +22,44 @@ except ImportError:
     Salesforce = None
     SalesforceError = Exception
 
+try:
+    from integration.cache_telefones import CacheBuscaTelefone
+    from integration.escritor_lotes import EscritorEmLote
+    from integration.indice_telefones import IndiceTelefones, normalizar_telefone
+except ImportError:
+    # Executado direto (python src/integration/salesforce_integrator.py): módulos vizinhos sem o pacote
+    from cache_telefones import CacheBuscaTelefone
+    from escritor_lotes import EscritorEmLote
+    from indice_telefones import IndiceTelefones, normalizar_telefone
+
+# Campos do Lead que o usuário da integração não pode escrever (preenchidos por triggers)
+LEAD_READONLY_FIELDS = (
+    'Company',
+    'EmFila__c',
+    'Qualificado_para_negociacao__c',
+    'VendedorF__c',
+    'Supervisor_F__c',
+    'GestaoF__c',
+    'ReatribuirFila__c',
+    'MostrarChatBeetalk__c',
+    'CelularDivergente__c',
+    'EmailDivergente__c',
+    'VisitaConfirmada__c',
+    'ReagendamentoConfirmado__c',
+    'SDR_F__c',
+    'Celular_Pendente__c'
+)
+
+# Ordem de criação em process_salesforce_data: objeto -> chave no resultado
+OBJETOS_PROCESSAMENTO = {
+    'Lead': 'lead_id',
+    'Contact': 'contact_id',
+    'Opportunity': 'opportunity_id',
+    'Task': 'task_id',
+    'Event': 'event_id',
+    'Note': 'note_id',
+}
+
 
 @dataclass 
 class SalesforceConnection:
@@ -38,9 +81,35 @@ class SalesforceIntegrator:
         self.sf = None
         self.connected = False
         
+        # Índice local telefone -> Account/Contact (a busca no Salesforce vira plano B)
+        self.indice_telefones = None
+        if os.getenv('SALESFORCE_INDICE_TELEFONES_ATIVO', 'true').lower() == 'true':
+            self.indice_telefones = IndiceTelefones(
+                os.getenv('SALESFORCE_INDICE_TELEFONES_ARQUIVO', 'salesforce_telefones.db')
+            )
+        self.intervalo_sincronizacao = float(os.getenv('SALESFORCE_INDICE_INTERVALO_SEGUNDOS', '300'))
+        
+        # Resultado das buscas por telefone, inclusive "não encontrado" (TTL menor)
+        self.cache_telefones = None
+        if os.getenv('SALESFORCE_CACHE_TELEFONES_ATIVO', 'true').lower() == 'true':
+            self.cache_telefones = CacheBuscaTelefone(
+                ttl_acerto=float(os.getenv('SALESFORCE_CACHE_TELEFONES_TTL_ACERTO', '3600')),
+                ttl_falta=float(os.getenv('SALESFORCE_CACHE_TELEFONES_TTL_FALTA', '300')),
+                max_itens=int(os.getenv('SALESFORCE_CACHE_TELEFONES_MAX_ITENS', '10000'))
+            )
+        self._sincronizacao_em_andamento = threading.Lock()
+        
+        # Gravação em lote (sObject Collections), criada no primeiro create_em_lote
+        self.escritor_lotes = None
+        self._lock_escritor = threading.Lock()
+        
         # Conectar automaticamente ao Salesforce
         self.connect()
         
+        # Primeira carga do índice em segundo plano (até terminar, as buscas vão ao Salesforce)
+        if self.connected and self.indice_telefones and not self.indice_telefones.carregado:
+            self._agendar_sincronizacao()
+        
     def _load_config_from_env(self) -> SalesforceConnection:
         """Carregar configuração do arquivo .env."""
         return SalesforceConnection(
@@ -92,76 +161,149 @@ class SalesforceIntegrator:
             print(f"❌ Erro de conexão: {str(e)}")
             return False
     
+    def sincronizar_indice_telefones(self, completa: bool = False) -> Dict[str, int]:
+        """Atualizar o índice local de telefones (completa=True recarrega tudo)."""
+        if not self.indice_telefones or not self.connected:
+            return {}
+        inicio = time.perf_counter()
+        lidos = self.indice_telefones.sincronizar(self.sf, completa=completa)
+        print(f"📇 Índice de telefones sincronizado: {lidos} ({time.perf_counter() - inicio:.1f}s)")
+        return lidos
+    
+    def _agendar_sincronizacao(self):
+        """Sincronizar o índice numa thread, se não houver outra sincronização rodando."""
+        if not self._sincronizacao_em_andamento.acquire(blocking=False):
+            return
+        
+        def sincronizar():
+            try:
+                self.sincronizar_indice_telefones()
+            except Exception as e:
+                print(f"⚠️ Erro ao sincronizar índice de telefones: {e}")
+            finally:
+                self._sincronizacao_em_andamento.release()
+        
+        threading.Thread(target=sincronizar, daemon=True).start()
+    
     def lookup_account_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
         """Buscar Account pelo telefone via Contact.
         
         Se encontrar um Contact com o telefone, retorna a Account vinculada.
+        Ordem: cache das buscas recentes (inclusive "não encontrado"), índice local
+        (telefones normalizados, com e sem o nono dígito) e, por fim, o Salesforce.
         """
         if not self.connected:
             print("❌ Não conectado ao Salesforce!")
             return None
         
-        try:
-            # Normalizar telefone para a busca
-            phone_clean = phone.replace('+', '').replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
-            
-            # Primeiro procurar Contact com esse telefone
-            query = f"""
-                SELECT Id, FirstName, LastName, Phone, AccountId, Account.Name, Account.Apelido__c
-                FROM Contact 
-                WHERE Phone LIKE '%{phone_clean}%' 
-                LIMIT 1
-            """
-            
-            result = self.sf.query(query)
-            
-            if result['totalSize'] > 0:
-                contact = result['records'][0]
-                account = contact.get('Account')
-                
-                if account:
-                    account_id = contact.get('AccountId')
-                    account_name = account.get('Name')
-                    apelido = account.get('Apelido__c')
-                    
-                    print(f"✅ Contact encontrado: {contact.get('FirstName')} {contact.get('LastName')}")
-                    print(f"   Account: {account_name} (ID: {account_id})")
-                    print(f"   Apelido__c: {apelido}")
-                    
-                    return {
-                        'Id': account_id,
-                        'Name': account_name,
-                        'Apelido__c': apelido,
-                        'Contact': {
-                            'Id': contact.get('Id'),
-                            'FirstName': contact.get('FirstName'),
-                            'LastName': contact.get('LastName')
-                        }
-                    }
-            
-            # Se não encontrou Contact, procurar Account direto
-            print(f"⚠️ Nenhum Contact encontrado com telefone: {phone} - tentando Account direto")
-            
-            query_account = f"""
-                SELECT Id, Name, Phone, Apelido__c 
-                FROM Account 
-                WHERE Phone LIKE '%{phone_clean}%' 
-                LIMIT 1
-            """
-            
-            result_account = self.sf.query(query_account)
-            if result_account['totalSize'] > 0:
-                account = result_account['records'][0]
-                print(f"✅ Account encontrado: {account.get('Name')}")
-                print(f"   Apelido__c: {account.get('Apelido__c')}")
+        chave = normalizar_telefone(phone) or phone
+        if self.cache_telefones:
+            em_cache, account = self.cache_telefones.obter(chave)
+            if em_cache:
                 return account
+        
+        account, consultas = None, 0
+        if self.indice_telefones:
+            ultima = self.indice_telefones.ultima_sincronizacao()
+            if ultima is not None and time.time() - ultima > self.intervalo_sincronizacao:
+                self._agendar_sincronizacao()
+            account = self.indice_telefones.buscar(phone)
+        
+        if account is None:
+            try:
+                account = self._lookup_account_by_phone_salesforce(phone)
+            except Exception as e:
+                print(f"⚠️ Erro ao procurar Account/Contact: {e}")
+                return None
+            # Contact achado na primeira consulta; Account direto ou nada custam as duas
+            consultas = 1 if account and 'Contact' in account else 2
+        
+        if self.cache_telefones:
+            self.cache_telefones.guardar(chave, account, consultas)
+        return account
+    
+    def invalidar_telefones(self, *phones: Optional[str]):
+        """Tirar telefones do cache de buscas (cadastro criado/alterado); sem argumentos, limpa tudo."""
+        if not self.cache_telefones:
+            return
+        if not phones:
+            self.cache_telefones.invalidar()
+        for phone in phones:
+            if phone:
+                self.cache_telefones.invalidar(normalizar_telefone(phone) or phone)
+    
+    def estatisticas_busca_telefone(self) -> Dict[str, Any]:
+        """Métricas do cache e do índice local de telefones."""
+        return {
+            'cache': self.cache_telefones.estatisticas() if self.cache_telefones else None,
+            'indice': self.indice_telefones.estatisticas() if self.indice_telefones else None
+        }
+    
+    def _lookup_account_by_phone_salesforce(self, phone: str) -> Optional[Dict[str, Any]]:
+        """Busca por telefone direto no Salesforce (Contact, depois Account); o que achar entra no índice.
+        
+        Erros de API sobem para quem chamou (não podem virar "não encontrado" no cache).
+        """
+        # Normalizar telefone para a busca
+        phone_clean = phone.replace('+', '').replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
+        
+        # Primeiro procurar Contact com esse telefone
+        query = f"""
+            SELECT Id, FirstName, LastName, Phone, AccountId, Account.Name, Account.Apelido__c
+            FROM Contact 
+            WHERE Phone LIKE '%{phone_clean}%' 
+            LIMIT 1
+        """
+        
+        result = self.sf.query(query)
+        
+        if result['totalSize'] > 0:
+            contact = result['records'][0]
+            account = contact.get('Account')
             
-            print(f"⚠️ Nenhuma Account ou Contact encontrada com telefone: {phone}")
-            return None
+            if account:
+                if self.indice_telefones:
+                    self.indice_telefones.registrar('Contact', contact)
+                account_id = contact.get('AccountId')
+                account_name = account.get('Name')
+                apelido = account.get('Apelido__c')
                 
-        except Exception as e:
-            print(f"⚠️ Erro ao procurar Account/Contact: {e}")
-            return None
+                print(f"✅ Contact encontrado: {contact.get('FirstName')} {contact.get('LastName')}")
+                print(f"   Account: {account_name} (ID: {account_id})")
+                print(f"   Apelido__c: {apelido}")
+                
+                return {
+                    'Id': account_id,
+                    'Name': account_name,
+                    'Apelido__c': apelido,
+                    'Contact': {
+                        'Id': contact.get('Id'),
+                        'FirstName': contact.get('FirstName'),
+                        'LastName': contact.get('LastName')
+                    }
+                }
+        
+        # Se não encontrou Contact, procurar Account direto
+        print(f"⚠️ Nenhum Contact encontrado com telefone: {phone} - tentando Account direto")
+        
+        query_account = f"""
+            SELECT Id, Name, Phone, Apelido__c 
+            FROM Account 
+            WHERE Phone LIKE '%{phone_clean}%' 
+            LIMIT 1
+        """
+        
+        result_account = self.sf.query(query_account)
+        if result_account['totalSize'] > 0:
+            account = result_account['records'][0]
+            if self.indice_telefones:
+                self.indice_telefones.registrar('Account', account)
+            print(f"✅ Account encontrado: {account.get('Name')}")
+            print(f"   Apelido__c: {account.get('Apelido__c')}")
+            return account
+        
+        print(f"⚠️ Nenhuma Account ou Contact encontrada com telefone: {phone}")
+        return None
     
     def create_lead(self, data: Dict[str, Any], source_phone: Optional[str] = None) -> Optional[str]:
         """Criar Lead no Salesforce.
@@ -188,24 +330,7 @@ class SalesforceIntegrator:
         
         # Remover campos que o usuário não tem permissão de escrever
         # Estes campos serão preenchidos pelos triggers do Salesforce
-        readonly_fields = [
-            'Company',  # Será preenchido por trigger
-            'EmFila__c',  # Será preenchido por trigger
-            'Qualificado_para_negociacao__c',
-            'VendedorF__c',
-            'Supervisor_F__c',
-            'GestaoF__c',
-            'ReatribuirFila__c',
-            'MostrarChatBeetalk__c',
-            'CelularDivergente__c',
-            'EmailDivergente__c',
-            'VisitaConfirmada__c',
-            'ReagendamentoConfirmado__c',
-            'SDR_F__c',
-            'Celular_Pendente__c'
-        ]
-        
-        data_clean = {k: v for k, v in data.items() if k not in readonly_fields}
+        data_clean = {k: v for k, v in data.items() if k not in LEAD_READONLY_FIELDS}
         
         try:
             result = self.sf.Lead.create(data_clean)
@@ -218,7 +343,6 @@ class SalesforceIntegrator:
             # Verificar se o erro foi no trigger AfterUpdate (Lead foi criado, mas trigger falhou)
             if "AfterUpdate" in error_str and "00Q89" in error_str:
                 # Extrair o ID do Lead do erro
-                import re
                 match = re.search(r"id (00Q\w+)", error_str)
                 if match:
                     lead_id = match.group(1)
@@ -316,24 +440,7 @@ class SalesforceIntegrator:
         
         try:
             # Remover campos que não podem ser atualizados
-            readonly_fields = [
-                'Company',
-                'EmFila__c',
-                'Qualificado_para_negociacao__c',
-                'VendedorF__c',
-                'Supervisor_F__c',
-                'GestaoF__c',
-                'ReatribuirFila__c',
-                'MostrarChatBeetalk__c',
-                'CelularDivergente__c',
-                'EmailDivergente__c',
-                'VisitaConfirmada__c',
-                'ReagendamentoConfirmado__c',
-                'SDR_F__c',
-                'Celular_Pendente__c'
-            ]
-            
-            data_clean = {k: v for k, v in data.items() if k not in readonly_fields}
+            data_clean = {k: v for k, v in data.items() if k not in LEAD_READONLY_FIELDS}
             
             if not data_clean:
                 print("⚠️ Nenhum campo válido para atualizar!")
@@ -367,11 +474,29 @@ class SalesforceIntegrator:
             result = self.sf.Contact.create(data)
             contact_id = result['id']
             print(f"✅ Contact criado: {contact_id}")
+            # O número pode estar no cache como "sem cadastro"
+            self.invalidar_telefones(data.get('Phone'), data.get('MobilePhone'))
             return contact_id
         except Exception as e:
             print(f"❌ Erro ao criar Contact: {str(e)}")
             return None
     
+    def create_account(self, data: Dict[str, Any]) -> Optional[str]:
+        """Criar Account no Salesforce."""
+        if not self.connected:
+            print("❌ Não conectado ao Salesforce!")
+            return None
+            
+        try:
+            result = self.sf.Account.create(data)
+            account_id = result['id']
+            print(f"✅ Account criada: {account_id}")
+            self.invalidar_telefones(data.get('Phone'))
+            return account_id
+        except Exception as e:
+            print(f"❌ Erro ao criar Account: {str(e)}")
+            return None
+    
     def create_opportunity(self, data: Dict[str, Any]) -> Optional[str]:
         """Criar Opportunity no Salesforce."""
         if not self.connected:
@@ -511,12 +636,106 @@ class SalesforceIntegrator:
                 print(f"❌ Erro ao criar Note clássica: {str(e2)}")
                 return None
     
-    def process_salesforce_data(self, data: Dict[str, Any]) -> Dict[str, Optional[str]]:
-        """Processar dados completos do Salesforce."""
+    def create_em_lote(self, obj_type: str, data: Dict[str, Any]) -> Future:
+        """Enfileirar um registro para gravação em lote (até 200 por chamada).
+        
+        O lote sai quando enche (SALESFORCE_LOTE_TAMANHO) ou quando o registro mais
+        antigo espera SALESFORCE_LOTE_INTERVALO_SEGUNDOS.
+        
+        Args:
+            obj_type: sObject (ex: 'Lead', 'Task', 'Contact')
+            data: Campos do registro (no Lead, os campos de trigger são removidos)
+        
+        Returns:
+            Future com {'id', 'success', 'errors'} do registro
+        """
+        if obj_type == 'Lead':
+            data = {k: v for k, v in data.items() if k not in LEAD_READONLY_FIELDS}
+        with self._lock_escritor:
+            if self.escritor_lotes is None:
+                self.escritor_lotes = EscritorEmLote(
+                    self._enviar_colecao,
+                    tamanho_lote=int(os.getenv('SALESFORCE_LOTE_TAMANHO', '200')),
+                    intervalo=float(os.getenv('SALESFORCE_LOTE_INTERVALO_SEGUNDOS', '2'))
+                )
+        return self.escritor_lotes.enfileirar(obj_type, data)
+    
+    def descarregar_lotes(self):
+        """Enviar já os registros enfileirados por create_em_lote e esperar as respostas."""
+        if self.escritor_lotes:
+            self.escritor_lotes.descarregar()
+    
+    def encerrar_lotes(self):
+        """Enviar o que falta e parar a thread de gravação em lote."""
+        with self._lock_escritor:
+            escritor, self.escritor_lotes = self.escritor_lotes, None
+        if escritor:
+            escritor.encerrar()
+    
+    def estatisticas_lotes(self) -> Dict[str, Any]:
+        return self.escritor_lotes.estatisticas() if self.escritor_lotes else {}
+    
+    def _enviar_colecao(self, obj_type: str, registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Criar até 200 registros de um sObject numa chamada (sObject Collections).
+        
+        Returns:
+            {'id', 'success', 'errors'} por registro, na ordem enviada
+        """
+        if not self.connected and not self.connect():
+            raise ConnectionError("Não conectado ao Salesforce")
+        
+        resultados = self.sf.restful(
+            'composite/sobjects',
+            method='POST',
+            data=json.dumps({
+                'allOrNone': False,
+                'records': [{'attributes': {'type': obj_type}, **registro} for registro in registros]
+            })
+        )
+        
+        for registro, resultado in zip(registros, resultados):
+            if resultado.get('success'):
+                if obj_type in ('Contact', 'Account'):
+                    self.invalidar_telefones(registro.get('Phone'), registro.get('MobilePhone'))
+                continue
+            mensagem = '; '.join(str(erro.get('message')) for erro in resultado.get('errors') or [])
+            # Mesmo caso de create_lead: Lead salvo, trigger AfterUpdate falhou
+            if obj_type == 'Lead' and "AfterUpdate" in mensagem:
+                match = re.search(r"id (00Q\w+)", mensagem)
+                if match:
+                    resultado.update(id=match.group(1), success=True)
+        
+        criados = sum(1 for resultado in resultados if resultado.get('success'))
+        print(f"✅ {obj_type}: {criados}/{len(registros)} criados em lote")
+        return resultados
+    
+    def process_salesforce_data(
+        self,
+        data: Dict[str, Any],
+        composite: Optional[bool] = None,
+        all_or_none: Optional[bool] = None
+    ) -> Dict[str, Optional[str]]:
+        """Processar dados completos do Salesforce.
+        
+        composite: Criar tudo numa única chamada à Composite API, com Task/Event/Note
+                   apontando para o Lead ou Contact criado (padrão: SALESFORCE_COMPOSITE)
+        all_or_none: Na Composite API, desfazer tudo se um objeto falhar
+                     (padrão: SALESFORCE_COMPOSITE_ALL_OR_NONE)
+        """
         if not self.connected:
             if not self.connect():
                 return {}
         
+        if composite is None:
+            composite = os.getenv('SALESFORCE_COMPOSITE', 'false').lower() == 'true'
+        if composite:
+            if all_or_none is None:
+                all_or_none = os.getenv('SALESFORCE_COMPOSITE_ALL_OR_NONE', 'false').lower() == 'true'
+            results = self._process_salesforce_data_composite(data, all_or_none)
+            if results is not None:
+                return results
+            print("⚠️ Composite API recusou a requisição - criando um objeto por vez")
+        
         results = {}
         
         # Processar cada tipo de objeto
@@ -540,6 +759,147 @@ class SalesforceIntegrator:
         
         return results
     
+    def _montar_composite(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Subrequisições da Composite API, ligando os objetos por referenceId.
+        
+        Task/Event: WhoId = Lead criado (ou Contact); com Contact, WhatId = Opportunity criada.
+        Note: ParentId = Lead, Contact ou Opportunity criado (sem pai, vira ContentNote).
+        Campos já preenchidos nos dados não são sobrescritos.
+        """
+        base = f"/services/data/v{self.sf.sf_version}/sobjects"
+        criados = {obj for obj in OBJETOS_PROCESSAMENTO if data.get(obj)}
+        quem = next((f"@{{{obj}.id}}" for obj in ('Lead', 'Contact') if obj in criados), None)
+        oportunidade = '@{Opportunity.id}' if 'Opportunity' in criados else None
+        
+        subrequisicoes = []
+        for obj_type in OBJETOS_PROCESSAMENTO:
+            obj_data = data.get(obj_type)
+            if not obj_data:
+                continue
+            corpo = dict(obj_data)
+            objeto = obj_type
+            
+            if obj_type == 'Lead':
+                corpo = {k: v for k, v in corpo.items() if k not in LEAD_READONLY_FIELDS}
+            elif obj_type in ('Task', 'Event'):
+                if quem and not corpo.get('WhoId'):
+                    corpo['WhoId'] = quem
+                # Atividade de Lead não aceita WhatId
+                if oportunidade and 'Lead' not in criados and not corpo.get('WhatId'):
+                    corpo['WhatId'] = oportunidade
+            elif obj_type == 'Note':
+                pai = corpo.get('ParentId') or quem or oportunidade
+                if pai:
+                    corpo = {
+                        'Title': corpo.get('Title', 'Nota de Transcrição'),
+                        'Body': corpo.get('Body', ''),
+                        'IsPrivate': corpo.get('IsPrivate', False),
+                        'ParentId': pai
+                    }
+                else:
+                    objeto = 'ContentNote'
+                    corpo = {
+                        'Title': corpo.get('Title', 'Nota de Transcrição'),
+                        'Content': base64.b64encode(corpo.get('Body', '').encode('utf-8')).decode('ascii')
+                    }
+            
+            subrequisicoes.append({
+                'method': 'POST',
+                'url': f"{base}/{objeto}",
+                'referenceId': obj_type,
+                'body': corpo
+            })
+        return subrequisicoes
+    
+    def _process_salesforce_data_composite(self, data: Dict[str, Any], all_or_none: bool) -> Optional[Dict[str, Optional[str]]]:
+        """Criar todos os objetos numa chamada só (Composite API).
+        
+        Com o erro de trigger AfterUpdate do Lead (Lead salvo), Task/Event/Note que apontavam
+        para ele são criados em seguida, um por vez, com o ID real.
+        
+        Returns:
+            IDs no mesmo formato de process_salesforce_data, ou None se a requisição
+            foi recusada inteira (nada foi criado; quem chamou pode criar um por vez)
+        """
+        subrequisicoes = self._montar_composite(data)
+        if not subrequisicoes:
+            return {}
+        
+        print(f"\n📤 Criando {', '.join(s['referenceId'] for s in subrequisicoes)} (Composite API, 1 chamada)...")
+        try:
+            resposta = self.sf.restful(
+                'composite',
+                method='POST',
+                data=json.dumps({'allOrNone': all_or_none, 'compositeRequest': subrequisicoes})
+            )
+        except SalesforceError as e:
+            print(f"❌ Erro na Composite API: {e}")
+            return None
+        except Exception as e:
+            # Sem resposta (timeout, conexão): não dá para saber o que foi criado, não repetir
+            print(f"❌ Erro ao chamar a Composite API: {e}")
+            return {}
+        
+        results = {}
+        lead_do_trigger = None
+        for item in resposta.get('compositeResponse', []):
+            obj_type = item.get('referenceId')
+            chave = OBJETOS_PROCESSAMENTO.get(obj_type)
+            if not chave:
+                continue
+            corpo = item.get('body')
+            if 200 <= item.get('httpStatusCode', 0) < 300 and isinstance(corpo, dict):
+                results[chave] = corpo.get('id')
+                print(f"✅ {obj_type} criado: {results[chave]}")
+                continue
+            
+            erros = corpo if isinstance(corpo, list) else [corpo]
+            mensagem = '; '.join(f"{e.get('errorCode')}: {e.get('message')}" for e in erros if isinstance(e, dict))
+            results[chave] = None
+            # Mesmo caso de create_lead: Lead salvo, trigger AfterUpdate falhou
+            if obj_type == 'Lead' and not all_or_none and "AfterUpdate" in mensagem:
+                match = re.search(r"id (00Q\w+)", mensagem)
+                if match:
+                    results[chave] = lead_do_trigger = match.group(1)
+                    print(f"⚠️  Lead criado apesar do erro de trigger: {results[chave]}")
+                    continue
+            print(f"❌ Erro ao criar {obj_type}: {mensagem}")
+        
+        if lead_do_trigger:
+            self._refazer_dependentes(subrequisicoes, results)
+        if all_or_none and not all(results.values()):
+            # Tudo foi desfeito: nenhum ID vale
+            results = {chave: None for chave in results}
+        if results.get('contact_id'):
+            contato = data.get('Contact') or {}
+            self.invalidar_telefones(contato.get('Phone'), contato.get('MobilePhone'))
+        return results
+    
+    def _refazer_dependentes(self, subrequisicoes: List[Dict[str, Any]], results: Dict[str, Optional[str]]):
+        """Criar um por vez os objetos que falharam por apontar para @{Lead.id} (Lead salvo, trigger falhou).
+        
+        As referências @{Objeto.id} são trocadas pelos IDs já criados; objeto que depende
+        de outro que não foi criado continua None.
+        """
+        criados = {obj: results.get(chave) for obj, chave in OBJETOS_PROCESSAMENTO.items() if results.get(chave)}
+        for subrequisicao in subrequisicoes:
+            obj_type = subrequisicao['referenceId']
+            chave = OBJETOS_PROCESSAMENTO[obj_type]
+            texto = json.dumps(subrequisicao['body'])
+            if results.get(chave) or '@{Lead.id}' not in texto:
+                continue
+            for referencia, registro_id in criados.items():
+                texto = texto.replace(f"@{{{referencia}.id}}", registro_id)
+            if '@{' in texto:
+                print(f"❌ {obj_type} não recriado: depende de objeto que não foi criado")
+                continue
+            objeto = subrequisicao['url'].rsplit('/', 1)[-1]
+            try:
+                results[chave] = getattr(self.sf, objeto).create(json.loads(texto))['id']
+                print(f"✅ {obj_type} criado com o Lead {criados['Lead']}: {results[chave]}")
+            except Exception as e:
+                print(f"❌ Erro ao criar {obj_type}: {e}")
+    
     def test_connection(self) -> bool:
         """Testar conexão Salesforce."""
         if self.connect():
@@ -3,47 +3,229 @@ Cliente para usar GitHub Copilot API para transcrição e processamento
 """
 
 import os
+import sys
 import requests
 import json
-from typing import Dict, Optional
+import hashlib
+import itertools
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
 import base64
 
+# Executado direto (python src/transcription/copilot_client.py): src/ no sys.path para ai/
+_PASTA_SRC = str(Path(__file__).resolve().parent.parent)
+if _PASTA_SRC not in sys.path:
+    sys.path.append(_PASTA_SRC)
+
+try:
+    from ai.cliente_http import ErroHTTPModelo, obter_cliente_modelos
+    from ai.cache_respostas import cache_habilitado, obter_cache_respostas
+    from ai.resiliencia import CircuitoAberto, LimiteSimultaneas, obter_controle
+    from ai.intencoes import MotorIntencoes, carregar_motor
+    from ai.uso_tokens import obter_contabilidade_tokens
+    from ai.contexto import estimar_tokens, tokens_mensagens
+    from ai.extracao_json import interpretar_crm, ler_json_em_streaming, validar_crm
+    from ai.streaming import ler_deltas_sse
+except ImportError:
+    obter_cliente_modelos = None
+    cache_habilitado = obter_cache_respostas = None
+    obter_controle = None
+    carregar_motor = None
+    obter_contabilidade_tokens = None
+    interpretar_crm = validar_crm = None
+
+# Regras de sentimento e próxima ação da simulação local
+ARQUIVO_INTENCOES_CRM = Path(__file__).resolve().parent / 'intencoes_crm.json'
+
 
 class GitHubCopilotClient:
     """Cliente para usar GitHub Copilot API."""
     
-    def __init__(self, token: Optional[str] = None):
+    def __init__(self, token: Optional[str] = None, usar_api: Optional[bool] = None):
         """
         Inicializa cliente do GitHub Copilot.
         
         Args:
             token: Token do GitHub (Personal Access Token)
+            usar_api: Chamar o GitHub Models de verdade em vez da simulação local
+                      (padrão: variável COPILOT_USAR_API)
         """
         self.token = token or os.getenv('GITHUB_TOKEN')
         if not self.token:
             raise ValueError("Token do GitHub é obrigatório")
         
+        if usar_api is None:
+            usar_api = os.getenv('COPILOT_USAR_API', 'false').lower() == 'true'
+        self.usar_api = usar_api
+        self.modelo = os.getenv('COPILOT_MODELO', 'gpt-4o')
+        # Extração de CRM em streaming: para de ler quando o objeto JSON fecha
+        self.streaming_json = os.getenv('COPILOT_STREAMING_JSON', 'true').lower() == 'true'
+        
         self.headers = {
             'Authorization': f'Bearer {self.token}',
             'Accept': 'application/vnd.github+json',
             'X-GitHub-Api-Version': '2022-11-28'
         }
+    
+    def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        modelo: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 800,
+        timeout: float = 15,
+        rota: str = 'copilot',
+        numero: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Chama o endpoint de chat do GitHub Models pelo cliente HTTP compartilhado,
+        com retentativas e disjuntor (circuito aberto retorna None na hora -> fallback local).
+        
+        Args:
+            messages: Mensagens no formato da API (role/content)
+            modelo: Modelo a usar (padrão: COPILOT_MODELO)
+            temperature: Temperatura da resposta
+            max_tokens: Limite de tokens da resposta
+            timeout: Timeout de cada tentativa em segundos
+            rota: Origem da chamada para a contabilidade de tokens (crm, vendedor, ...)
+            numero: Número do contato, quando houver
+            
+        Returns:
+            Conteúdo da resposta ou None se erro
+        """
+        if obter_cliente_modelos is None:
+            print("⚠️ Cliente HTTP de IA indisponível (src/ai fora do path)")
+            return None
+        
+        modelo = modelo or self.modelo
+        if obter_contabilidade_tokens and not obter_contabilidade_tokens().dentro_do_orcamento(rota, numero):
+            print(f"Orçamento diário de tokens esgotado ({rota}) - usando fallback local")
+            return None
+        
+        payload = {
+            "model": modelo,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        try:
+            response = obter_controle().executar(
+                lambda: obter_cliente_modelos().post_chat(payload, token=self.token, timeout=timeout)
+            )
+            if response.status_code == 200:
+                dados = response.json()
+                if obter_contabilidade_tokens:
+                    obter_contabilidade_tokens().registrar(dados.get('usage'), modelo, rota, numero)
+                return dados['choices'][0]['message']['content']
+            print(f"Erro na API do GitHub Models: {response.status_code} - {response.text[:200]}")
+            return None
+        except (CircuitoAberto, LimiteSimultaneas) as e:
+            print(f"GitHub Models indisponível ({e}) - usando fallback local")
+            return None
+        except Exception as e:
+            print(f"Erro ao chamar GitHub Models: {str(e)}")
+            return None
+    
+    def chat_completion_json(
+        self,
+        messages: List[Dict[str, str]],
+        modelo: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 800,
+        timeout: float = 15,
+        rota: str = 'copilot',
+        numero: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Como chat_completion, mas em streaming e parando a leitura assim que o objeto JSON
+        da resposta fecha (o texto que o modelo escreveria depois não é esperado nem gerado).
+        Se o endpoint recusar o streaming, usa o chat_completion normal.
+        
+        Returns:
+            Texto da resposta até o fim do objeto JSON (inteiro se não houver objeto) ou None se erro
+        """
+        if obter_cliente_modelos is None:
+            print("⚠️ Cliente HTTP de IA indisponível (src/ai fora do path)")
+            return None
+        
+        modelo = modelo or self.modelo
+        if obter_contabilidade_tokens and not obter_contabilidade_tokens().dentro_do_orcamento(rota, numero):
+            print(f"Orçamento diário de tokens esgotado ({rota}) - usando fallback local")
+            return None
+        
+        payload = {
+            "model": modelo,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream_options": {"include_usage": True}
+        }
+        meta = {}
+        abertos = []
+        
+        def abrir_stream():
+            # Lê a primeira linha aqui para que erro de status/conexão caia nas retentativas
+            linhas = obter_cliente_modelos().stream_chat(payload, token=self.token, timeout=timeout)
+            abertos.append(linhas)
+            return itertools.chain([next(linhas, '')], linhas)
+        
+        controle = obter_controle()
+        try:
+            with controle.vaga():
+                fluxo = controle.executar(abrir_stream, ocupar_vaga=False)
+                try:
+                    texto, objeto = ler_json_em_streaming(ler_deltas_sse(fluxo, meta))
+                except Exception:
+                    controle.registrar_falha()
+                    raise
+                finally:
+                    # Fechar o stream encerra a conexão: o modelo para de gerar o resto
+                    for linhas in abertos:
+                        linhas.close()
+        except (CircuitoAberto, LimiteSimultaneas) as e:
+            print(f"GitHub Models indisponível ({e}) - usando fallback local")
+            return None
+        except ErroHTTPModelo as e:
+            if e.status_code < 500 and e.status_code != 429:
+                print(f"Streaming recusado ({e.status_code}) - chamada normal")
+                return self.chat_completion(messages, modelo, temperature, max_tokens, timeout, rota, numero)
+            print(f"Erro na API do GitHub Models: {e.status_code} - {e.texto[:200]}")
+            return None
+        except Exception as e:
+            print(f"Erro ao chamar GitHub Models: {str(e)}")
+            return None
         
-    def processar_texto_com_copilot(self, texto: str, prompt: str) -> Optional[str]:
+        if obter_contabilidade_tokens:
+            # Cortando o stream no fim do objeto o usage final não chega: estimativa local
+            uso = meta.get('usage') or {
+                'prompt_tokens': tokens_mensagens(messages),
+                'completion_tokens': estimar_tokens(texto)
+            }
+            obter_contabilidade_tokens().registrar(uso, modelo, rota, numero)
+        if objeto is None:
+            print("Resposta em streaming terminou sem objeto JSON completo")
+        return texto or None
+    
+    def processar_texto_com_copilot(self, texto: str, prompt: str, simular_se_falhar: bool = True) -> Optional[str]:
         """
         Processa texto usando GitHub Copilot Chat.
         
         Args:
             texto: Texto a ser processado
             prompt: Prompt com instruções
+            simular_se_falhar: Com a API ligada e sem resposta dela, cair na simulação local
+                               (False: devolve None, para quem chamou poder retentar)
             
         Returns:
             Resposta do Copilot ou None se erro
         """
         try:
-            # Usar a API do GitHub Copilot Chat
-            # Nota: Esta é uma implementação conceitual
-            # A API real pode ter endpoints diferentes
+            # GitHub Models (endpoint compatível com OpenAI) quando usar_api=True
             
             messages = [
                 {
@@ -56,8 +238,17 @@ class GitHubCopilotClient:
                 }
             ]
             
-            # Por enquanto, vamos simular uma resposta estruturada
-            # até que a API oficial esteja disponível
+            if self.usar_api:
+                if self.streaming_json:
+                    resposta = self.chat_completion_json(messages, rota='crm')
+                else:
+                    resposta = self.chat_completion(messages, rota='crm')
+                if resposta:
+                    return resposta
+                if not simular_se_falhar:
+                    return None
+            
+            # Simulação local (padrão, e fallback quando a API falha)
             return self._simular_resposta_copilot(texto)
             
         except Exception as e:
@@ -81,6 +272,14 @@ class GitHubCopilotClient:
         
         texto_lower = texto.lower()
         
+        # Sentimento e próxima ação: uma passada do motor de intenções (primeira regra de cada grupo vence)
+        if carregar_motor:
+            grupos = MotorIntencoes.primeira_por_grupo(carregar_motor(str(ARQUIVO_INTENCOES_CRM)).analisar(texto))
+            if 'sentimento' in grupos:
+                informacoes["sentimento"] = grupos['sentimento']['intencao']
+            if 'proxima_acao' in grupos:
+                informacoes["proxima_acao"]["acao"] = grupos['proxima_acao']['dados']['acao']
+        
         # Detectar nomes (palavras capitalizadas)
         import re
         nomes = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*', texto)
@@ -102,20 +301,6 @@ class GitHubCopilotClient:
         if leads:
             informacoes["lead"]["identificador"] = leads[0]
         
-        # Detectar sentimento por palavras-chave
-        if any(palavra in texto_lower for palavra in ['ótimo', 'excelente', 'animado', 'positivo', 'bom']):
-            informacoes["sentimento"] = "positivo"
-        elif any(palavra in texto_lower for palavra in ['ruim', 'problema', 'negativo', 'cancelou', 'chateado']):
-            informacoes["sentimento"] = "negativo"
-        
-        # Detectar próximas ações
-        if any(palavra in texto_lower for palavra in ['reunião', 'encontro', 'marcar', 'agendar']):
-            informacoes["proxima_acao"]["acao"] = "Agendar reunião"
-        elif any(palavra in texto_lower for palavra in ['ligar', 'telefonar', 'contatar']):
-            informacoes["proxima_acao"]["acao"] = "Fazer contato telefônico"
-        elif any(palavra in texto_lower for palavra in ['proposta', 'orçamento', 'enviar']):
-            informacoes["proxima_acao"]["acao"] = "Enviar proposta"
-        
         # Detectar datas simples
         datas = re.findall(r'\b(?:segunda|terça|quarta|quinta|sexta)-?feira\b|\b\d{1,2}/\d{1,2}\b|\b\d{1,2}\s+de\s+\w+', texto_lower)
         if datas:
@@ -131,16 +316,28 @@ class CopilotTranscriptionProcessor:
         """Inicializa processador com Copilot."""
         self.copilot = GitHubCopilotClient(github_token)
     
-    def extrair_informacoes_crm(self, texto_transcrito: str) -> Dict:
+    def extrair_informacoes_crm(self, texto_transcrito: str, rota: str = 'crm') -> Dict:
         """
         Extrai informações de CRM usando Copilot.
         
         Args:
             texto_transcrito: Texto da transcrição
+            rota: Rota para o cache de respostas (AI_CACHE_ROTAS_SEM_CACHE desliga por rota)
             
         Returns:
             Dict com informações estruturadas
         """
+        try:
+            return self._extrair(texto_transcrito, rota)
+        except Exception as e:
+            print(f"Erro no processamento: {str(e)}")
+            return self._resultado_vazio()
+    
+    def _extrair(self, texto_transcrito: str, rota: str = 'crm', simular_se_falhar: bool = True) -> Dict:
+        """Extração de uma transcrição (levanta exceção em caso de erro, para o lote poder retentar).
+        
+        simular_se_falhar=False: API sem resposta levanta exceção em vez de cair na simulação
+        """
         prompt = """
         Analise este texto de uma conversa de vendas/CRM e extraia informações no formato JSON:
         
@@ -153,17 +350,147 @@ class CopilotTranscriptionProcessor:
         Responda apenas com JSON válido.
         """
         
-        try:
-            resposta = self.copilot.processar_texto_com_copilot(texto_transcrito, prompt)
-            
+        # Simulação e API real não compartilham entradas de cache
+        modelo = self.copilot.modelo if self.copilot.usar_api else 'simulacao'
+        usar_cache = bool(cache_habilitado and cache_habilitado(rota))
+        
+        if usar_cache:
+            resposta = obter_cache_respostas().obter(texto_transcrito, prompt, modelo)
             if resposta:
-                return json.loads(resposta)
-            else:
-                return self._resultado_vazio()
+                informacoes = json.loads(resposta)
+                return validar_crm(informacoes)[0] if validar_crm else informacoes
+        
+        # Simulação de fallback fica fora do cache: guardada com a chave do modelo, valeria pelo TTL inteiro
+        resposta = self.copilot.processar_texto_com_copilot(texto_transcrito, prompt, simular_se_falhar=False)
+        do_modelo = bool(resposta)
+        if not resposta and simular_se_falhar and self.copilot.usar_api:
+            resposta = self.copilot._simular_resposta_copilot(texto_transcrito)
+        if not resposta:
+            raise ValueError("resposta vazia do Copilot")
+        
+        # JSON no meio de texto/cerca de markdown é aproveitado; sem JSON levanta
+        # ErroExtracaoJSON (ValueError) e o lote retenta
+        informacoes = interpretar_crm(resposta) if interpretar_crm else json.loads(resposta)
+        if usar_cache and do_modelo:
+            # Guarda o JSON já normalizado (só resposta aproveitável entra no cache)
+            obter_cache_respostas().guardar(
+                texto_transcrito, prompt, modelo, json.dumps(informacoes, ensure_ascii=False)
+            )
+        return informacoes
+    
+    def _extrair_com_tentativas(self, texto: str, tentativas: int, rota: str) -> Dict:
+        """Extrair com novas tentativas (backoff exponencial com jitter) e devolver o registro do lote."""
+        erro = None
+        for tentativa in range(1, tentativas + 1):
+            try:
+                # Falha da API conta como falha (retenta); simular aqui marcaria o item como concluído
+                informacoes = self._extrair(texto, rota, simular_se_falhar=False)
+                return {'ok': True, 'tentativas': tentativa, 'informacoes': informacoes}
+            except Exception as e:
+                erro = str(e)
+                if tentativa < tentativas:
+                    time.sleep(random.uniform(0, min(8.0, 0.5 * 2 ** (tentativa - 1))))
+        return {'ok': False, 'tentativas': tentativas, 'erro': erro, 'informacoes': self._resultado_vazio()}
+    
+    @staticmethod
+    def _hash_texto(texto: str) -> str:
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _ler_checkpoint(arquivo: Path) -> Dict[int, Dict]:
+        """Registros já concluídos com sucesso (linha final truncada por queda é ignorada)."""
+        feitos = {}
+        if not arquivo.exists():
+            return feitos
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                if registro.get('ok'):
+                    feitos[registro['indice']] = registro
+        return feitos
+    
+    def extrair_lote(
+        self,
+        textos: Iterable[str],
+        max_paralelo: int = 4,
+        ordenado: bool = True,
+        tentativas: int = 3,
+        checkpoint: Optional[Path] = None,
+        rota: str = 'crm'
+    ) -> Iterator[Dict]:
+        """
+        Extrai informações de CRM de várias transcrições em paralelo.
+        
+        Os resultados saem conforme ficam prontos (ordenado=False) ou na ordem de entrada,
+        sem esperar o lote inteiro. A entrada é lida aos poucos: no máximo 2 x max_paralelo
+        itens ficam em andamento/aguardando ao mesmo tempo.
+        
+        Args:
+            textos: Transcrições (qualquer iterável, inclusive gerador)
+            max_paralelo: Extrações simultâneas
+            ordenado: Manter a ordem de entrada nos resultados
+            tentativas: Tentativas por transcrição antes de desistir
+            checkpoint: Arquivo JSONL de progresso; numa nova execução os itens já
+                        concluídos (mesmo índice e mesmo texto) não são refeitos
+            rota: Rota para o cache de respostas
+            
+        Returns:
+            Iterador de dicts com indice, hash, ok, tentativas, informacoes
+            (e erro / do_checkpoint quando for o caso)
+        """
+        checkpoint = Path(checkpoint) if checkpoint else None
+        feitos = self._ler_checkpoint(checkpoint) if checkpoint else {}
+        if feitos:
+            print(f"♻️ Retomando lote: {len(feitos)} itens já concluídos no checkpoint")
+        
+        janela = max(1, max_paralelo) * 2
+        fonte = enumerate(textos)
+        esgotado = False
+        pendentes = {}  # future -> (indice, hash)
+        prontos = {}    # indice -> registro aguardando a vez de sair
+        proximo = 0
+        
+        with ThreadPoolExecutor(max_workers=max_paralelo) as executor, \
+                (open(checkpoint, 'a', encoding='utf-8') if checkpoint else nullcontext()) as arquivo:
+            while True:
+                while not esgotado and len(pendentes) + len(prontos) < janela:
+                    try:
+                        indice, texto = next(fonte)
+                    except StopIteration:
+                        esgotado = True
+                        break
+                    hash_texto = self._hash_texto(texto)
+                    anterior = feitos.pop(indice, None)
+                    if anterior and anterior.get('hash') == hash_texto:
+                        prontos[indice] = dict(anterior, do_checkpoint=True)
+                    else:
+                        futuro = executor.submit(self._extrair_com_tentativas, texto, tentativas, rota)
+                        pendentes[futuro] = (indice, hash_texto)
                 
-        except Exception as e:
-            print(f"Erro no processamento: {str(e)}")
-            return self._resultado_vazio()
+                if ordenado:
+                    while proximo in prontos:
+                        yield prontos.pop(proximo)
+                        proximo += 1
+                else:
+                    for indice in list(prontos):
+                        yield prontos.pop(indice)
+                
+                if not pendentes:
+                    if esgotado and not prontos:
+                        break
+                    continue
+                
+                concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    indice, hash_texto = pendentes.pop(futuro)
+                    registro = dict(futuro.result(), indice=indice, hash=hash_texto)
+                    if arquivo:
+                        arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                        arquivo.flush()
+                    prontos[indice] = registro
     
     def _resultado_vazio(self) -> Dict:
         """Resultado vazio em caso de erro."""
@@ -0,0 +1,7 @@
+"""
+Módulos de suporte ao webhook de captura de mensagens
+"""
+
+from .feed import FeedMensagens
+
+__all__ = ['FeedMensagens']
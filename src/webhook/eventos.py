@@ -0,0 +1,70 @@
+"""
+Interpretação dos eventos da Evolution API e montagem das entradas gravadas
+Sem estado nem efeitos ao importar: usado pelo webhook e pelos processos de
+tools/reprocessar_mensagens.py
+"""
+
+from datetime import datetime
+from typing import Optional
+
+
+def extrair_numero_telefone(remote_jid: str) -> str:
+    """Extrai o número do remoteJid"""
+    return remote_jid.split('@')[0] if '@' in remote_jid else remote_jid
+
+
+def extrair_texto_mensagem(message_content: dict) -> str:
+    """Extrai o texto de uma mensagem da Evolution API"""
+    return (
+        message_content.get('conversation') or 
+        message_content.get('extendedTextMessage', {}).get('text') or
+        '[Mensagem sem texto ou mídia]'
+    )
+
+
+def interpretar_evento(data: dict) -> Optional[dict]:
+    """
+    Interpreta o payload do webhook da Evolution API
+    Retorna None se não for um evento de mensagem (messages.upsert)
+    """
+    if data.get('event', '') != 'messages.upsert':
+        return None
+    
+    message_data = data.get('data', {}) or {}
+    key = message_data.get('key', {})
+    from_me = key.get('fromMe', False)
+    
+    return {
+        'numero': extrair_numero_telefone(key.get('remoteJid', '')),
+        'from_me': from_me,
+        'tipo': "ENVIADA" if from_me else "RECEBIDA",
+        'texto': extrair_texto_mensagem(message_data.get('message', {}) or {}),
+        'message_id': key.get('id', 'N/A'),
+        'message_data': message_data
+    }
+
+
+def montar_entrada(
+    numero: str,
+    mensagem: str,
+    message_data: dict,
+    timestamp: Optional[datetime] = None,
+    trace_id: Optional[str] = None
+) -> dict:
+    """Monta a entrada salva nos arquivos de mensagens/conversas"""
+    timestamp = timestamp or datetime.now()
+    from_me = message_data.get('key', {}).get('fromMe', False)
+    
+    entrada = {
+        "timestamp": timestamp.isoformat(),
+        "hora": timestamp.strftime('%H:%M:%S'),
+        "numero": numero,
+        "tipo": "ENVIADA" if from_me else "RECEBIDA",
+        "from_me": from_me,
+        "mensagem": mensagem,
+        "message_id": message_data.get('key', {}).get('id', 'N/A'),
+        "dados_completos": message_data
+    }
+    if trace_id:
+        entrada["trace_id"] = trace_id
+    return entrada
@@ -0,0 +1,180 @@
+"""
+Feed ao vivo de mensagens - pub/sub em memória para SSE e WebSocket
+Cada assinante tem uma fila limitada; consumidores lentos perdem os eventos mais antigos
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+
+class Assinante:
+    """Assinante do feed com filtros e fila limitada."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        numeros: Optional[Set[str]] = None,
+        tipos: Optional[Set[str]] = None,
+        tamanho_fila: int = 100
+    ):
+        """
+        Args:
+            loop: Event loop onde a fila é consumida
+            numeros: Números aceitos (None = todos)
+            tipos: Tipos aceitos, ex: RECEBIDA, ENVIADA, RESPOSTA (None = todos)
+            tamanho_fila: Máximo de eventos pendentes para este assinante
+        """
+        self.loop = loop
+        self.numeros = numeros
+        self.tipos = tipos
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=tamanho_fila)
+        self.descartados = 0
+
+    def aceita(self, evento: Dict[str, Any]) -> bool:
+        """Verificar se o evento passa pelos filtros do assinante."""
+        dados = evento.get('dados', {})
+        if self.numeros and dados.get('numero') not in self.numeros:
+            return False
+        if self.tipos and dados.get('tipo') not in self.tipos:
+            return False
+        return True
+
+    def entregar(self, evento: Dict[str, Any]):
+        """Colocar evento na fila; se cheia, descarta o mais antigo (roda no loop do assinante)."""
+        if self.fila.full():
+            try:
+                self.fila.get_nowait()
+                self.descartados += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.fila.put_nowait(evento)
+
+
+class FeedMensagens:
+    """Distribui mensagens salvas e status de respostas para os assinantes conectados."""
+
+    def __init__(self, tamanho_fila: int = 100, tamanho_historico: int = 200):
+        """
+        Args:
+            tamanho_fila: Máximo de eventos pendentes por assinante
+            tamanho_historico: Eventos recentes mantidos para reenvio (Last-Event-ID)
+        """
+        self.tamanho_fila = tamanho_fila
+        self.historico: deque = deque(maxlen=tamanho_historico)
+        self.assinantes: List[Assinante] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.total_publicados = 0
+
+    @staticmethod
+    def _parse_filtro(valor: Optional[str], maiusculo: bool = False) -> Optional[Set[str]]:
+        """Converter filtro 'a,b,c' em conjunto (None se vazio)."""
+        if not valor:
+            return None
+        itens = {v.strip() for v in valor.split(',') if v.strip()}
+        if maiusculo:
+            itens = {v.upper() for v in itens}
+        return itens or None
+
+    def assinar(
+        self,
+        numero: Optional[str] = None,
+        tipo: Optional[str] = None,
+        desde: Optional[str] = None,
+        ultimos: int = 0
+    ) -> Assinante:
+        """
+        Registrar novo assinante (deve ser chamado dentro do event loop).
+
+        Args:
+            numero: Filtro de número(s), separados por vírgula
+            tipo: Filtro de tipo(s), separados por vírgula
+            desde: Reenviar eventos do histórico com id maior que este
+            ultimos: Reenviar os N últimos eventos do histórico que passam no filtro
+
+        Returns:
+            Assinante com a fila já preenchida pelo reenvio
+        """
+        assinante = Assinante(
+            asyncio.get_running_loop(),
+            numeros=self._parse_filtro(numero),
+            tipos=self._parse_filtro(tipo, maiusculo=True),
+            tamanho_fila=self.tamanho_fila
+        )
+
+        with self._lock:
+            reenvio = [e for e in self.historico if assinante.aceita(e)]
+            if desde and str(desde).isdigit():
+                reenvio = [e for e in reenvio if e['id'] > int(desde)]
+            elif ultimos > 0:
+                reenvio = reenvio[-ultimos:]
+            else:
+                reenvio = []
+            self.assinantes.append(assinante)
+
+        for evento in reenvio:
+            assinante.entregar(evento)
+
+        return assinante
+
+    def cancelar(self, assinante: Assinante):
+        """Remover assinante do feed."""
+        with self._lock:
+            if assinante in self.assinantes:
+                self.assinantes.remove(assinante)
+
+    def publicar(self, nome_evento: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Publicar evento para todos os assinantes (seguro para chamar de qualquer thread).
+
+        Args:
+            nome_evento: Nome do evento SSE (ex: 'mensagem', 'resposta')
+            dados: Conteúdo do evento
+
+        Returns:
+            Evento publicado (com id e timestamp)
+        """
+        with self._lock:
+            evento = {
+                'id': next(self._ids),
+                'evento': nome_evento,
+                'timestamp': datetime.now().isoformat(),
+                'dados': dados
+            }
+            self.historico.append(evento)
+            self.total_publicados += 1
+            destinos = [a for a in self.assinantes if a.aceita(evento)]
+
+        try:
+            loop_atual = asyncio.get_running_loop()
+        except RuntimeError:
+            loop_atual = None
+
+        for assinante in destinos:
+            if assinante.loop is loop_atual:
+                assinante.entregar(evento)
+            elif not assinante.loop.is_closed():
+                assinante.loop.call_soon_threadsafe(assinante.entregar, evento)
+
+        return evento
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Estatísticas do feed para o /status."""
+        with self._lock:
+            return {
+                'assinantes': len(self.assinantes),
+                'eventos_publicados': self.total_publicados,
+                'eventos_descartados': sum(a.descartados for a in self.assinantes),
+                'historico': len(self.historico)
+            }
+
+
+def formatar_sse(evento: Dict[str, Any]) -> str:
+    """Formatar evento no padrão Server-Sent Events."""
+    dados = json.dumps(evento['dados'], ensure_ascii=False)
+    return f"id: {evento['id']}\nevent: {evento['evento']}\ndata: {dados}\n\n"
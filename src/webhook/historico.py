@@ -0,0 +1,149 @@
+"""
+Histórico recente por número para o contexto da IA
+Lê só o final de conversas_<numero>.json (sem carregar o arquivo inteiro) na primeira consulta
+e depois é atualizado em memória a cada mensagem salva
+"""
+
+import json
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Início de cada item da lista no JSON gravado com indent=2 (anexar_entradas)
+_INICIO_ITEM = b'\n  {\n'
+
+
+def ler_ultimas_entradas(arquivo: Path, quantidade: int, bloco: int = 64 * 1024) -> List[Dict[str, Any]]:
+    """
+    Últimas entradas de um arquivo JSON (lista) lendo de trás para frente em blocos.
+    Se o formato não for o esperado, carrega o arquivo inteiro.
+
+    Args:
+        arquivo: Arquivo conversas_<numero>.json
+        quantidade: Quantas entradas do final são necessárias
+        bloco: Tamanho do primeiro bloco lido (dobra até achar entradas suficientes)
+    """
+    if not arquivo.exists():
+        return []
+
+    tamanho = arquivo.stat().st_size
+    with open(arquivo, 'rb') as f:
+        while True:
+            inicio = max(0, tamanho - bloco)
+            f.seek(inicio)
+            dados = f.read()
+            if inicio == 0:
+                break
+            # Pular o item cortado no começo do bloco
+            corte = dados.find(_INICIO_ITEM)
+            if corte >= 0 and dados.count(_INICIO_ITEM) >= quantidade:
+                try:
+                    entradas = json.loads(b'[' + dados[corte + 1:])
+                    return entradas[-quantidade:]
+                except ValueError:
+                    pass
+            bloco *= 2
+
+    try:
+        return json.loads(dados)[-quantidade:]
+    except ValueError:
+        return []
+
+
+class HistoricoConversas:
+    """Últimos turnos de cada número em memória (LRU de números)."""
+
+    def __init__(
+        self,
+        diretorio: Path,
+        max_numeros: int = 500,
+        max_turnos: int = 30,
+        janela_horas: float = 24,
+        particoes: Optional[Any] = None
+    ):
+        """
+        Args:
+            diretorio: Pasta com os arquivos conversas_<numero>.json
+            max_numeros: Números mantidos em memória (os menos usados saem primeiro)
+            max_turnos: Turnos guardados por número
+            janela_horas: Só turnos mais novos que isso entram no contexto
+            particoes: DiretorioParticionado dos arquivos (None = direto na pasta)
+        """
+        self.diretorio = Path(diretorio)
+        self.particoes = particoes
+        self.max_numeros = max_numeros
+        self.max_turnos = max_turnos
+        self.janela_horas = janela_horas
+        self.conversas: 'OrderedDict[str, deque]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.leituras_disco = 0
+
+    @staticmethod
+    def _turno(entrada: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        texto = entrada.get('mensagem') or ''
+        if not texto or texto.startswith('[Mensagem sem texto'):
+            return None
+        return {
+            'role': 'assistant' if entrada.get('from_me') else 'user',
+            'content': texto,
+            'timestamp': entrada.get('timestamp', ''),
+            'message_id': entrada.get('message_id')
+        }
+
+    def _carregar(self, numero: str) -> deque:
+        """Turnos do número (lê o final do arquivo só na primeira vez, fora do lock)."""
+        with self._lock:
+            turnos = self.conversas.get(numero)
+            if turnos is not None:
+                self.conversas.move_to_end(numero)
+                return turnos
+
+        if self.particoes is not None:
+            arquivo = self.particoes.arquivo(numero)
+        else:
+            arquivo = self.diretorio / f"conversas_{numero}.json"
+        entradas = ler_ultimas_entradas(arquivo, self.max_turnos)
+        carregados = deque(filter(None, map(self._turno, entradas)), maxlen=self.max_turnos)
+        with self._lock:
+            self.leituras_disco += 1
+            turnos = self.conversas.setdefault(numero, carregados)
+            self.conversas.move_to_end(numero)
+            while len(self.conversas) > self.max_numeros:
+                self.conversas.popitem(last=False)
+            return turnos
+
+    def registrar(self, entrada: Dict[str, Any]):
+        """Acrescentar entrada recém-salva (só se o número já estiver em memória)."""
+        turno = self._turno(entrada)
+        with self._lock:
+            turnos = self.conversas.get(entrada.get('numero'))
+            if turno and turnos is not None:
+                turnos.append(turno)
+
+    def obter(self, numero: str, excluir_message_id: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Turnos recentes do número em ordem cronológica ({'role', 'content'}).
+
+        Args:
+            numero: Número do contato
+            excluir_message_id: Mensagem atual (já salva) que não deve aparecer no histórico
+        """
+        limite = (datetime.now() - timedelta(hours=self.janela_horas)).isoformat()
+        turnos = self._carregar(numero)
+        with self._lock:
+            turnos = list(turnos)
+        return [
+            {'role': t['role'], 'content': t['content']}
+            for t in turnos
+            if t['timestamp'] >= limite and (not excluir_message_id or t['message_id'] != excluir_message_id)
+        ]
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'numeros_em_memoria': len(self.conversas),
+                'leituras_disco': self.leituras_disco,
+                'janela_horas': self.janela_horas
+            }
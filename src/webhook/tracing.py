@@ -0,0 +1,220 @@
+"""
+Rastreamento de latência por mensagem - marca o horário de cada etapa do webhook
+(recebimento, parsing, disco, IA, envio e confirmação de entrega)
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Etapas na ordem em que acontecem
+ETAPAS = [
+    'recebido',
+    'interpretado',
+    'persistido',
+    'ia_inicio',
+    'primeira_mensagem',
+    'ia_fim',
+    'envio_inicio',
+    'envio_fim',
+    'entregue',
+]
+
+# Intervalos medidos (nome, etapa inicial, etapa final)
+INTERVALOS = [
+    ('parsing', 'recebido', 'interpretado'),
+    ('disco', 'interpretado', 'persistido'),
+    ('fila_ia', 'persistido', 'ia_inicio'),
+    ('ia', 'ia_inicio', 'ia_fim'),
+    ('envio', 'envio_inicio', 'envio_fim'),
+    ('primeira_mensagem', 'recebido', 'primeira_mensagem'),
+    ('entrega', 'envio_fim', 'entregue'),
+    ('total', 'recebido', None),
+]
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    """Percentil simples (nearest-rank) de uma lista já ordenada."""
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, max(0, int(round(p / 100 * len(valores))) - 1))
+    return valores[indice]
+
+
+def _copiar(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia independente do trace (chamar com o lock: marcar() altera os marcos de outras threads)."""
+    return json.loads(json.dumps(trace))
+
+
+class RastreadorLatencia:
+    """Guarda os traces recentes em memória e persiste em traces_YYYYMMDD.jsonl."""
+
+    def __init__(self, diretorio: Path, max_em_memoria: int = 5000):
+        """
+        Args:
+            diretorio: Pasta onde os arquivos traces_*.jsonl são gravados
+            max_em_memoria: Quantidade de traces mantidos em memória para consultas/agregados
+        """
+        self.diretorio = Path(diretorio)
+        self.max_em_memoria = max_em_memoria
+        self.traces: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.envios: 'OrderedDict[str, str]' = OrderedDict()  # id da resposta enviada -> message_id original
+        self._lock = threading.Lock()
+
+    def iniciar(self, message_id: str, numero: str, inicio: Optional[float] = None) -> Dict[str, Any]:
+        """Criar trace para uma mensagem recebida (marca 'recebido')."""
+        trace = {
+            'trace_id': uuid.uuid4().hex[:16],
+            'message_id': message_id,
+            'numero': numero,
+            'marcos': {'recebido': inicio or time.time()}
+        }
+        with self._lock:
+            self.traces[message_id] = trace
+            self.traces.move_to_end(message_id)
+            while len(self.traces) > self.max_em_memoria:
+                self.traces.popitem(last=False)
+        return trace
+
+    def marcar(self, message_id: str, etapa: str, momento: Optional[float] = None):
+        """Registrar o horário de uma etapa."""
+        with self._lock:
+            trace = self.traces.get(message_id)
+            if trace is not None:
+                trace['marcos'][etapa] = momento or time.time()
+
+    def associar_envio(self, message_id: str, id_enviado: str):
+        """Ligar o id da resposta enviada à mensagem original (para o ack de entrega)."""
+        if not id_enviado:
+            return
+        with self._lock:
+            self.envios[id_enviado] = message_id
+            while len(self.envios) > self.max_em_memoria:
+                self.envios.popitem(last=False)
+
+    def confirmar_entrega(self, id_enviado: str, status: str) -> Optional[Dict[str, Any]]:
+        """
+        Processar status de entrega da Evolution (messages.update)
+        Marca 'entregue' no primeiro DELIVERY_ACK/READ e persiste o trace atualizado
+        """
+        if status not in ('DELIVERY_ACK', 'READ', 'READ_ACK', 'PLAYED'):
+            return None
+        with self._lock:
+            message_id = self.envios.get(id_enviado)
+            trace = self.traces.get(message_id) if message_id else None
+            if trace is None or 'entregue' in trace['marcos']:
+                return None
+            trace['marcos']['entregue'] = time.time()
+            trace = _copiar(trace)
+        self.persistir(trace)
+        return trace
+
+    def persistir(self, trace: Dict[str, Any]):
+        """
+        Anexar o estado atual do trace ao arquivo do dia (a última linha de um message_id vale).
+        Recebe uma cópia (_copiar), não o trace em memória, que pode mudar durante a gravação.
+        """
+        try:
+            dia = datetime.fromtimestamp(trace['marcos']['recebido']).strftime('%Y%m%d')
+            with open(self.diretorio / f"traces_{dia}.jsonl", 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace, ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar trace: {e}")
+
+    def finalizar(self, message_id: str):
+        """Persistir o trace ao fim do processamento da mensagem."""
+        with self._lock:
+            trace = self.traces.get(message_id)
+            trace = _copiar(trace) if trace is not None else None
+        if trace is not None:
+            self.persistir(trace)
+
+    def obter(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Buscar trace em memória; se não houver, nos arquivos (mais recentes primeiro)."""
+        with self._lock:
+            trace = self.traces.get(message_id)
+            if trace is not None:
+                return _copiar(trace)
+
+        for arquivo in sorted(self.diretorio.glob('traces_*.jsonl'), reverse=True):
+            encontrado = None
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    if message_id in linha:
+                        registro = json.loads(linha)
+                        if registro.get('message_id') == message_id:
+                            encontrado = registro
+            if encontrado:
+                return encontrado
+        return None
+
+    @staticmethod
+    def duracoes(trace: Dict[str, Any]) -> Dict[str, float]:
+        """Duração (ms) de cada intervalo presente no trace."""
+        marcos = trace.get('marcos', {})
+        resultado = {}
+        for nome, inicio, fim in INTERVALOS:
+            if fim is None:
+                fim = max(marcos, key=marcos.get) if marcos else None
+            if inicio in marcos and fim in marcos:
+                resultado[nome] = round((marcos[fim] - marcos[inicio]) * 1000, 1)
+        return resultado
+
+    @staticmethod
+    def linha_do_tempo(trace: Dict[str, Any], largura: int = 40) -> List[Dict[str, Any]]:
+        """Etapas com deslocamento desde o recebimento e uma barra proporcional."""
+        marcos = trace.get('marcos', {})
+        if 'recebido' not in marcos:
+            return []
+        inicio = marcos['recebido']
+        total = max(marcos.values()) - inicio or 1e-9
+
+        linhas = []
+        # Ordem cronológica (no streaming o envio começa antes de ia_fim)
+        for etapa in sorted((e for e in ETAPAS if e in marcos), key=marcos.get):
+            deslocamento = marcos[etapa] - inicio
+            linhas.append({
+                'etapa': etapa,
+                'horario': datetime.fromtimestamp(marcos[etapa]).isoformat(timespec='milliseconds'),
+                'deslocamento_ms': round(deslocamento * 1000, 1),
+                'barra': '█' * int(round(deslocamento / total * largura))
+            })
+        return linhas
+
+    def renderizar(self, trace: Dict[str, Any]) -> str:
+        """Linha do tempo em texto para leitura humana."""
+        linhas = [f"Trace {trace['trace_id']} | mensagem {trace['message_id']} | {trace['numero']}"]
+        for item in self.linha_do_tempo(trace):
+            linhas.append(f"{item['etapa']:<13} +{item['deslocamento_ms']:>9.1f} ms |{item['barra']}")
+        duracoes = self.duracoes(trace)
+        if duracoes:
+            linhas.append('')
+            linhas.extend(f"{nome:<13} {ms:>10.1f} ms" for nome, ms in duracoes.items())
+        return '\n'.join(linhas)
+
+    def agregados(self, numero: Optional[str] = None) -> Dict[str, Any]:
+        """Contagem, média, p50, p95 e p99 (ms) por intervalo sobre os traces em memória."""
+        with self._lock:
+            traces = [_copiar(t) for t in self.traces.values() if not numero or t['numero'] == numero]
+
+        por_intervalo: Dict[str, List[float]] = {}
+        for trace in traces:
+            for nome, ms in self.duracoes(trace).items():
+                por_intervalo.setdefault(nome, []).append(ms)
+
+        resultado = {}
+        for nome, valores in por_intervalo.items():
+            valores.sort()
+            resultado[nome] = {
+                'contagem': len(valores),
+                'media_ms': round(sum(valores) / len(valores), 1),
+                'p50_ms': _percentil(valores, 50),
+                'p95_ms': _percentil(valores, 95),
+                'p99_ms': _percentil(valores, 99),
+            }
+        return {'traces': len(traces), 'intervalos': resultado}
@@ -0,0 +1,377 @@
+"""
+Backfill das mensagens capturadas pelo webhook como Tasks no Salesforce (Bulk API 2.0).
+
+Lê o arquivo de mensagens sem carregar tudo em memória (conversas_<numero>.json pelo
+manifesto das partições, ou os diários mensagens_YYYYMMDD.json), resolve cada número
+para Contact/Account pelo índice local de telefones (plano B: consulta ao Salesforce),
+grava as Tasks em CSV (um arquivo por job) e envia cada CSV como um job de ingestão.
+Uma chamada de API por job em vez de uma por mensagem.
+
+Uso:
+  python tools/backfill_tarefas_salesforce.py
+  python tools/backfill_tarefas_salesforce.py --fonte diarios --desde 2025-01-01 --linhas-por-job 20000
+  python tools/backfill_tarefas_salesforce.py --simular            # só gera os CSVs, não envia
+  python tools/backfill_tarefas_salesforce.py --reenviar-falhas    # manda de novo as linhas rejeitadas
+
+Tudo fica em --pasta (padrão backfill_tarefas/):
+  - lote_<execução>_NNNNNN.csv   CSV enviado em cada job
+  - checkpoint.jsonl      jobs criados/concluídos e as mensagens de cada um
+  - falhas.csv            linhas rejeitadas ou não processadas (sf__Error diz o motivo)
+  - sem_cadastro.txt      números sem Contact/Account no Salesforce
+Se a execução cair, rodar o mesmo comando de novo pula as mensagens de jobs já
+concluídos, acompanha os jobs que ficaram processando e reenvia os que não chegaram
+a receber os dados.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from armazenamento.particoes import DiretorioParticionado
+from integration.bulk_api2 import TAMANHO_MAXIMO_CSV, BulkApi2
+from integration.salesforce_integrator import SalesforceIntegrator
+
+CAMPOS_TASK = ['WhoId', 'WhatId', 'Subject', 'Description', 'ActivityDate', 'Status', 'Priority']
+CAMPOS_FALHA = CAMPOS_TASK + ['sf__Error', 'job']
+
+# Description de Task aceita até 32000 caracteres
+TAMANHO_MAXIMO_DESCRICAO = 32000
+
+
+# ---------- leitura das mensagens ----------
+
+def _ler_lista(arquivo: Path) -> List[Dict[str, Any]]:
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            conteudo = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Não foi possível ler {arquivo}: {e}")
+        return []
+    return conteudo if isinstance(conteudo, list) else [conteudo]
+
+
+def ler_mensagens(pasta: Path, fonte: str, niveis: int) -> Iterator[Dict[str, Any]]:
+    """Entradas gravadas pelo webhook, um arquivo por vez."""
+    if fonte == 'conversas':
+        # Um arquivo por número: o número é resolvido uma vez e as mensagens vêm em sequência
+        particoes = DiretorioParticionado(pasta, 'conversas_', niveis=niveis)
+        for _, arquivo in particoes.arquivos():
+            yield from _ler_lista(arquivo)
+    else:
+        for arquivo in sorted(pasta.glob('mensagens_*.json')):
+            yield from _ler_lista(arquivo)
+
+
+def chave_mensagem(entrada: Dict[str, Any]) -> str:
+    """Mesma identidade usada no reprocessamento: número + message_id + horário."""
+    return f"{entrada.get('numero')}|{entrada.get('message_id')}|{entrada.get('timestamp')}"
+
+
+def montar_task(entrada: Dict[str, Any], account: Dict[str, Any], status: str) -> Dict[str, str]:
+    """Linha do CSV: Task ligada ao Contact (WhoId) e à Account (WhatId)."""
+    contato = account.get('Contact') or {}
+    return {
+        'WhoId': contato.get('Id') or '',
+        'WhatId': account.get('Id') or '',
+        'Subject': f"WhatsApp {'enviada' if entrada.get('from_me') else 'recebida'}",
+        'Description': str(entrada.get('mensagem') or '')[:TAMANHO_MAXIMO_DESCRICAO],
+        'ActivityDate': str(entrada.get('timestamp', ''))[:10],
+        'Status': status,
+        'Priority': 'Normal'
+    }
+
+
+# ---------- backfill ----------
+
+class Backfill:
+    """Lotes CSV -> jobs de ingestão, com checkpoint para retomar."""
+
+    def __init__(self, args, integrador: SalesforceIntegrator, bulk: Optional[BulkApi2]):
+        self.args = args
+        self.integrador = integrador
+        self.bulk = bulk
+        self.pasta = Path(args.pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.arquivo_checkpoint = self.pasta / 'checkpoint.jsonl'
+        self.arquivo_falhas = self.pasta / 'falhas.csv'
+        self.execucao = f"{datetime.now():%Y%m%d%H%M%S}"
+
+        self.feitas: Set[str] = set()
+        self.em_andamento: List[Dict[str, Any]] = []  # jobs fechados esperando o Salesforce
+        self.resolvidos: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.linhas: List[Dict[str, str]] = []
+        self.chaves: List[str] = []
+        self.bytes_lote = 0
+        self.totais = {'lidas': 0, 'ja_enviadas': 0, 'filtradas': 0, 'sem_cadastro': 0, 'linhas': 0,
+                       'jobs': 0, 'gravadas': 0, 'falhas': 0}
+
+    # ---------- checkpoint ----------
+
+    def _anotar(self, registro: Dict[str, Any]):
+        with open(self.arquivo_checkpoint, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def retomar(self):
+        """Ler o checkpoint: mensagens de jobs concluídos e jobs que ficaram pela metade."""
+        if not self.arquivo_checkpoint.exists():
+            return
+        jobs: Dict[str, Dict[str, Any]] = {}
+        with open(self.arquivo_checkpoint, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    jobs.setdefault(registro['job'], {}).update(registro)
+
+        pendentes = 0
+        for job in jobs.values():
+            if job.get('concluido'):
+                if job.get('enviado'):
+                    self.feitas.update(job.get('chaves', []))
+                continue
+            pendentes += 1
+            if self.bulk is None:
+                continue
+            info = self.bulk.estado(job['job'])
+            if info.get('state') == 'Open':
+                # Caiu antes de fechar o job: os dados podem estar incompletos, reenviar
+                self.bulk.abortar_job(job['job'])
+                self._anotar({'job': job['job'], 'concluido': True, 'enviado': False, 'estado': 'Aborted'})
+                continue
+            self.feitas.update(job.get('chaves', []))
+            self.em_andamento.append(job)
+        if jobs:
+            print(f"♻️  Checkpoint: {len(jobs)} jobs, {len(self.feitas)} mensagens já enviadas, "
+                  f"{pendentes} jobs pela metade")
+
+    # ---------- lotes ----------
+
+    def resolver(self, numero: str) -> Optional[Dict[str, Any]]:
+        """Account (+ Contact) do número; memoriza também os números sem cadastro."""
+        if numero not in self.resolvidos:
+            if self.integrador.connected:
+                account = self.integrador.lookup_account_by_phone(numero)
+            elif self.integrador.indice_telefones and self.integrador.indice_telefones.carregado:
+                account = self.integrador.indice_telefones.buscar(numero)  # --simular sem conexão
+            else:
+                account = None
+            self.resolvidos[numero] = account
+        return self.resolvidos[numero]
+
+    def adicionar(self, entrada: Dict[str, Any]):
+        args = self.args
+        self.totais['lidas'] += 1
+        chave = chave_mensagem(entrada)
+        if chave in self.feitas:
+            self.totais['ja_enviadas'] += 1
+            return
+        data = str(entrada.get('timestamp', ''))[:10]
+        if (args.somente_recebidas and entrada.get('from_me')) or not data \
+                or (args.desde and data < args.desde) or (args.ate and data > args.ate):
+            self.totais['filtradas'] += 1
+            return
+        account = self.resolver(str(entrada.get('numero', '')))
+        if not account:
+            self.totais['sem_cadastro'] += 1
+            return
+
+        linha = montar_task(entrada, account, args.status)
+        self.feitas.add(chave)  # mesma mensagem no diário e na conversa entra uma vez
+        self.linhas.append(linha)
+        self.chaves.append(chave)
+        # Estimativa do CSV (aspas/escapes a mais ficam na folga do limite)
+        self.bytes_lote += sum(len(valor.encode('utf-8')) + 3 for valor in linha.values())
+        if len(self.linhas) >= args.linhas_por_job or self.bytes_lote >= TAMANHO_MAXIMO_CSV * 0.9:
+            self.enviar_lote()
+
+    @staticmethod
+    def _csv(linhas: List[Dict[str, str]], campos: List[str]) -> bytes:
+        saida = io.StringIO()
+        escritor = csv.DictWriter(saida, fieldnames=campos, lineterminator='\n', extrasaction='ignore')
+        escritor.writeheader()
+        escritor.writerows(linhas)
+        return saida.getvalue().encode('utf-8')
+
+    def enviar_lote(self):
+        if not self.linhas:
+            return
+        numero = self.totais['jobs'] + 1
+        conteudo = self._csv(self.linhas, CAMPOS_TASK)
+        arquivo_lote = self.pasta / f"lote_{self.execucao}_{numero:06d}.csv"
+        arquivo_lote.write_bytes(conteudo)
+        self.totais['jobs'] += 1
+        self.totais['linhas'] += len(self.linhas)
+        linhas, chaves = len(self.linhas), self.chaves
+        self.linhas, self.chaves, self.bytes_lote = [], [], 0
+
+        if self.bulk is None:
+            print(f"📝 {arquivo_lote.name}: {linhas} Tasks (simulação, não enviado)")
+            return
+
+        # Espaço na fila de jobs (o Salesforce processa vários em paralelo, mas não infinitos)
+        while len(self.em_andamento) >= self.args.jobs_simultaneos:
+            self.concluir(self.em_andamento.pop(0))
+
+        job_id = self.bulk.criar_job('Task')
+        # Anotado antes dos dados: se cair no meio, a retomada aborta o job e reenvia
+        self._anotar({'job': job_id, 'lote': arquivo_lote.name, 'chaves': chaves})
+        try:
+            self.bulk.enviar_csv(job_id, conteudo)
+            self.bulk.fechar_job(job_id)
+        except Exception:
+            self.bulk.abortar_job(job_id)
+            self._anotar({'job': job_id, 'concluido': True, 'enviado': False, 'estado': 'Aborted'})
+            raise
+        print(f"📤 {arquivo_lote.name}: {linhas} Tasks no job {job_id}")
+        self.em_andamento.append({'job': job_id, 'lote': arquivo_lote.name})
+
+    def concluir(self, job: Dict[str, Any]):
+        """Esperar o job terminar e guardar as linhas rejeitadas em falhas.csv."""
+        info = self.bulk.aguardar(job['job'])
+        estado = info.get('state')
+        processadas = int(info.get('numberRecordsProcessed') or 0)
+        rejeitadas = int(info.get('numberRecordsFailed') or 0)
+        enviado = not (estado == 'Aborted' and processadas == 0)
+
+        falhas = 0
+        if enviado:
+            if rejeitadas:
+                falhas += self._guardar_falhas(job['job'], self.bulk.resultados_com_falha(job['job']))
+            if estado != 'JobComplete':
+                falhas += self._guardar_falhas(job['job'], self.bulk.resultados_sem_processar(job['job']),
+                                               motivo=f"não processada (job {estado}: {info.get('errorMessage', '')})")
+        self.totais['gravadas'] += processadas - rejeitadas
+        self.totais['falhas'] += falhas
+        self._anotar({'job': job['job'], 'concluido': True, 'enviado': enviado, 'estado': estado,
+                      'processadas': processadas, 'falhas': falhas})
+        icone = '✅' if estado == 'JobComplete' and not falhas else '⚠️'
+        print(f"{icone} Job {job['job']} ({job.get('lote')}): {estado}, "
+              f"{processadas - rejeitadas} gravadas, {falhas} em falhas.csv")
+
+    def _guardar_falhas(self, job_id: str, conteudo: bytes, motivo: str = '') -> int:
+        linhas = list(csv.DictReader(io.StringIO(conteudo.decode('utf-8'))))
+        if not linhas:
+            return 0
+        novo = not self.arquivo_falhas.exists()
+        with open(self.arquivo_falhas, 'a', encoding='utf-8', newline='') as f:
+            escritor = csv.DictWriter(f, fieldnames=CAMPOS_FALHA, lineterminator='\n', extrasaction='ignore')
+            if novo:
+                escritor.writeheader()
+            for linha in linhas:
+                linha['sf__Error'] = linha.get('sf__Error') or motivo
+                linha['job'] = job_id
+                escritor.writerow(linha)
+        return len(linhas)
+
+    def finalizar(self):
+        self.enviar_lote()
+        while self.em_andamento:
+            self.concluir(self.em_andamento.pop(0))
+        sem_cadastro = sorted(numero for numero, account in self.resolvidos.items() if not account)
+        if sem_cadastro:
+            (self.pasta / 'sem_cadastro.txt').write_text('\n'.join(sem_cadastro) + '\n', encoding='utf-8')
+
+    def reenviar_falhas(self):
+        """Mandar de novo as linhas de falhas.csv (o arquivo é renomeado antes; falhas novas vão para um novo)."""
+        if not self.arquivo_falhas.exists():
+            print("✅ Nenhuma falha para reenviar")
+            return
+        reenviado = self.pasta / f"falhas_reenviadas_{datetime.now():%Y%m%d%H%M%S}.csv"
+        os.replace(self.arquivo_falhas, reenviado)
+        with open(reenviado, 'r', encoding='utf-8') as f:
+            for linha in csv.DictReader(f):
+                self.linhas.append({campo: linha.get(campo) or '' for campo in CAMPOS_TASK})
+                if len(self.linhas) >= self.args.linhas_por_job:
+                    self.enviar_lote()
+        print(f"🔁 Falhas reenviadas a partir de {reenviado.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill das mensagens capturadas como Tasks (Bulk API 2.0)")
+    parser.add_argument('--mensagens', default='mensagens_recebidas', help="Pasta do webhook")
+    parser.add_argument('--fonte', choices=['conversas', 'diarios'], default='conversas',
+                        help="conversas_<numero>.json (pelo manifesto) ou mensagens_YYYYMMDD.json")
+    parser.add_argument('--niveis', type=int, default=int(os.getenv('ARMAZENAMENTO_NIVEIS_PARTICAO', '2')),
+                        help="Níveis de subpastas das conversas (ARMAZENAMENTO_NIVEIS_PARTICAO)")
+    parser.add_argument('--pasta', default='backfill_tarefas', help="CSVs, checkpoint e falhas")
+    parser.add_argument('--linhas-por-job', type=int, default=10000)
+    parser.add_argument('--jobs-simultaneos', type=int, default=3, help="Jobs processando no Salesforce ao mesmo tempo")
+    parser.add_argument('--intervalo-consulta', type=float, default=10, help="Segundos entre consultas de estado do job")
+    parser.add_argument('--desde', help="Data inicial (AAAA-MM-DD)")
+    parser.add_argument('--ate', help="Data final (AAAA-MM-DD)")
+    parser.add_argument('--somente-recebidas', action='store_true', help="Ignorar mensagens enviadas (fromMe)")
+    parser.add_argument('--status', default='Completed', help="Status das Tasks criadas")
+    parser.add_argument('--simular', action='store_true', help="Só gerar os CSVs (sem enviar nem anotar checkpoint)")
+    parser.add_argument('--reenviar-falhas', action='store_true', help="Reenviar as linhas de falhas.csv e sair")
+    args = parser.parse_args()
+
+    integrador = SalesforceIntegrator()
+    if not integrador.connected and not args.simular:
+        print("❌ Sem conexão com o Salesforce (use --simular para só gerar os CSVs)")
+        sys.exit(1)
+    bulk = None if args.simular else BulkApi2(integrador.sf, intervalo_consulta=args.intervalo_consulta)
+
+    backfill = Backfill(args, integrador, bulk)
+    inicio = time.perf_counter()
+    if args.reenviar_falhas:
+        if bulk is None:
+            print("❌ --reenviar-falhas não combina com --simular")
+            sys.exit(1)
+        backfill.retomar()
+        backfill.reenviar_falhas()
+        backfill.finalizar()
+        return
+
+    print("=" * 70)
+    print("  📥 BACKFILL DE MENSAGENS -> TASKS (BULK API 2.0)")
+    print("=" * 70)
+    print(f"  📂 Origem: {args.mensagens}/ ({args.fonte})")
+    print(f"  📁 Pasta: {backfill.pasta}/")
+    print(f"  ⚙️  Linhas por job: {args.linhas_por_job} | Jobs simultâneos: {args.jobs_simultaneos}")
+    print("=" * 70 + "\n")
+
+    if not args.simular:
+        backfill.retomar()
+        # Índice em dia antes de começar: as buscas ficam locais em vez de virar SOQL
+        integrador.sincronizar_indice_telefones()
+
+    ultimo_progresso = time.perf_counter()
+    for entrada in ler_mensagens(Path(args.mensagens), args.fonte, args.niveis):
+        backfill.adicionar(entrada)
+        agora = time.perf_counter()
+        if agora - ultimo_progresso >= 5:
+            print(f"📊 {backfill.totais['lidas']:,} mensagens lidas | {backfill.totais['linhas']:,} em jobs "
+                  f"| {len(backfill.resolvidos):,} números")
+            ultimo_progresso = agora
+    backfill.finalizar()
+
+    totais = backfill.totais
+    print("\n" + "=" * 70)
+    print("  ✅ RESUMO")
+    print("=" * 70)
+    print(f"  Mensagens lidas:        {totais['lidas']:,}")
+    print(f"  Já enviadas antes:      {totais['ja_enviadas']:,}")
+    print(f"  Fora do filtro:         {totais['filtradas']:,}")
+    print(f"  Sem Contact/Account:    {totais['sem_cadastro']:,} "
+          f"({sum(1 for a in backfill.resolvidos.values() if not a)} números)")
+    print(f"  Tasks em CSV:           {totais['linhas']:,} ({totais['jobs']} jobs)")
+    if not args.simular:
+        print(f"  Tasks gravadas:         {totais['gravadas']:,}")
+        print(f"  Falhas (falhas.csv):    {totais['falhas']:,}")
+        busca = integrador.estatisticas_busca_telefone()
+        if busca:
+            print(f"  Buscas de telefone:     {busca}")
+    print(f"  Tempo total:            {time.perf_counter() - inicio:.1f}s")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
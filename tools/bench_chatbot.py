@@ -0,0 +1,243 @@
+"""
+Benchmark do chatbot do vendedor (ChatbotManager / VendedorChatbot.chat).
+
+Simula N vendedores ao mesmo tempo, cada um com uma conversa de M turnos (manda a
+próxima mensagem só depois da resposta), contra um backend de IA falso local (HTTP,
+latência configurável). Cada cenário roda em um processo separado, numa pasta
+temporária, para a memória e os singletons não vazarem de um cenário para outro.
+
+Mede por cenário: turnos/s, latência p50/p99 por turno, bytes escritos em arquivos
+por turno (wchar de /proc/self/io, com a saída do chatbot desviada para a memória),
+bytes que ficaram no disco e memória residente (pico).
+
+Uso:
+  python tools/bench_chatbot.py
+  python tools/bench_chatbot.py --vendedores 50 --turnos 30 --armazenamentos json log cache --modos fallback ia
+  python tools/bench_chatbot.py --latencia-ms 300 --paralelo 16 --modos ia
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / 'src'))
+
+# Armazenamento -> variáveis do chatbot
+ARMAZENAMENTOS = {
+    'json': {'CHATBOT_ARMAZENAMENTO': 'json', 'CHATBOT_CACHE_ATIVO': 'false'},
+    'log': {'CHATBOT_ARMAZENAMENTO': 'log', 'CHATBOT_CACHE_ATIVO': 'false'},
+    'cache': {'CHATBOT_ARMAZENAMENTO': 'log', 'CHATBOT_CACHE_ATIVO': 'true'},
+    'cache-json': {'CHATBOT_ARMAZENAMENTO': 'json', 'CHATBOT_CACHE_ATIVO': 'true'},
+}
+MODOS = {
+    'fallback': {'CHATBOT_USAR_IA': 'false'},
+    'ia': {'CHATBOT_USAR_IA': 'true'},
+}
+
+MENSAGENS = [
+    "O cliente {nome} da {empresa} achou o preço alto, como contorno?",
+    "Qual a melhor condição de pagamento para um pedido de R$ {valor}?",
+    "Preciso agendar uma reunião com {nome} na próxima semana",
+    "Como qualificar a {empresa}? Eles têm {valor} funcionários",
+    "Monta uma proposta para a {empresa}, interesse em {valor} licenças",
+    "{nome} disse que vai pensar, o que eu respondo?",
+    "Bom dia! Tenho 3 visitas hoje, alguma dica rápida?",
+]
+NOMES = ['João', 'Maria', 'Carlos', 'Ana', 'Pedro', 'Fernanda', 'Lucas', 'Juliana']
+EMPRESAS = ['Acme', 'Tech Solutions', 'Indústrias Souza', 'Mercado Bom Preço', 'Logística Norte']
+
+
+# ---------- backend de IA falso ----------
+
+class StubIAHandler(BaseHTTPRequestHandler):
+    """Chat completion fixa depois de uma latência aleatória (0.5x a 1.5x da configurada)."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latencia = 0.05
+    chamadas = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with StubIAHandler._lock:
+            StubIAHandler.chamadas += 1
+        time.sleep(self.latencia * random.uniform(0.5, 1.5))
+        resposta = json.dumps({
+            'choices': [{'message': {'role': 'assistant', 'content': (
+                "Boa! Reforce o retorno do investimento, ofereça duas opções de pagamento "
+                "e já sugira um horário para a próxima conversa. Quer que eu monte a mensagem?"
+            )}}],
+            'usage': {'prompt_tokens': 40 * len(corpo.get('messages', [])), 'completion_tokens': 45,
+                      'total_tokens': 40 * len(corpo.get('messages', [])) + 45}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_stub(latencia_ms: float) -> ThreadingHTTPServer:
+    StubIAHandler.latencia = latencia_ms / 1000
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), StubIAHandler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+# ---------- um cenário (processo filho) ----------
+
+def bytes_escritos() -> int:
+    """Bytes passados a write() pelo processo (Linux); -1 se indisponível."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for linha in f:
+                if linha.startswith('wchar:'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def tamanho_pasta(pasta: Path) -> int:
+    return sum(p.stat().st_size for p in pasta.rglob('*') if p.is_file())
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0.0
+
+
+def rodar_cenario(args) -> dict:
+    """Roda dentro do processo filho, já na pasta temporária e com o ambiente do cenário."""
+    from chatbot.vendedor_chatbot import ChatbotManager
+
+    rng = random.Random(args.semente)
+    conversas = {
+        f"+55 11 9{v:04d}-{rng.randint(1000, 9999)}": [
+            rng.choice(MENSAGENS).format(nome=rng.choice(NOMES), empresa=rng.choice(EMPRESAS),
+                                         valor=rng.randint(2, 500))
+            for _ in range(args.turnos)
+        ]
+        for v in range(args.vendedores)
+    }
+
+    # Saída do chatbot na memória: wchar passa a contar só arquivos
+    sys.stdout = io.StringIO()
+    manager = ChatbotManager(max_paralelo=args.paralelo)
+    manager.processar_mensagem_whatsapp('+55 00 00000-0000', 'aquecimento')  # carrega regras/cliente HTTP
+
+    latencias = []
+
+    async def vendedor(telefone: str, mensagens: list):
+        for mensagem in mensagens:
+            inicio = time.perf_counter()
+            await manager.processar_mensagem_whatsapp_async(telefone, mensagem)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    async def todos():
+        await asyncio.gather(*(vendedor(telefone, mensagens) for telefone, mensagens in conversas.items()))
+
+    escritos_antes = bytes_escritos()
+    inicio = time.perf_counter()
+    asyncio.run(todos())
+    duracao = time.perf_counter() - inicio
+    # Write-behind e resumos pendentes entram na conta dos bytes (não no tempo)
+    manager.encerrar()
+    escritos = bytes_escritos() - escritos_antes if escritos_antes >= 0 else -1
+    sys.stdout = sys.__stdout__
+
+    turnos = len(latencias)
+    return {
+        'turnos': turnos,
+        'turnos_s': turnos / duracao,
+        'p50_ms': percentil(latencias, 0.50),
+        'p99_ms': percentil(latencias, 0.99),
+        'bytes_turno': escritos / turnos if escritos >= 0 else None,
+        'disco_turno': tamanho_pasta(Path('.')) / turnos,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def executar_filho(args, armazenamento: str, modo: str, url: str) -> dict:
+    """Rodar um cenário em processo separado e ler o resultado (última linha, JSON)."""
+    ambiente = dict(os.environ)
+    ambiente.update(ARMAZENAMENTOS[armazenamento])
+    ambiente.update(MODOS[modo])
+    ambiente.update({
+        'GITHUB_TOKEN': ambiente.get('GITHUB_TOKEN') or 'bench',
+        'GITHUB_MODELS_URL': url,
+        'AI_MAX_SIMULTANEAS': str(args.paralelo),
+        'AI_CACHE_ATIVO': 'false',
+    })
+    with tempfile.TemporaryDirectory() as pasta:
+        ambiente['AI_USO_DIR'] = str(Path(pasta) / 'uso_tokens')
+        comando = [sys.executable, __file__, '--filho', '--vendedores', str(args.vendedores),
+                   '--turnos', str(args.turnos), '--paralelo', str(args.paralelo), '--semente', str(args.semente)]
+        processo = subprocess.run(comando, cwd=pasta, env=ambiente, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"Cenário {armazenamento}/{modo} falhou:\n{processo.stderr[-2000:]}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de vazão/latência do chatbot do vendedor")
+    parser.add_argument('--vendedores', type=int, default=20, help="Vendedores conversando ao mesmo tempo")
+    parser.add_argument('--turnos', type=int, default=20, help="Mensagens por vendedor")
+    parser.add_argument('--paralelo', type=int, default=8, help="Workers do ChatbotManager (CHATBOT_MAX_PARALELO)")
+    parser.add_argument('--latencia-ms', type=float, default=50, help="Latência média do backend de IA falso")
+    parser.add_argument('--armazenamentos', nargs='+', default=['json', 'log', 'cache'], choices=list(ARMAZENAMENTOS))
+    parser.add_argument('--modos', nargs='+', default=list(MODOS), choices=list(MODOS))
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--filho', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(rodar_cenario(args)))
+        return
+
+    servidor = iniciar_stub(args.latencia_ms)
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/chat/completions"
+
+    resultados = []
+    for modo in args.modos:
+        for armazenamento in args.armazenamentos:
+            StubIAHandler.chamadas = 0
+            resultado = executar_filho(args, armazenamento, modo, url)
+            resultado.update(nome=f"{armazenamento} / {modo}", chamadas_ia=StubIAHandler.chamadas)
+            resultados.append(resultado)
+            print(f"  ⏱️  {resultado['nome']}: {resultado['turnos_s']:.0f} turnos/s")
+    servidor.shutdown()
+
+    print("=" * 104)
+    print(f"  🏁 CHATBOT - {args.vendedores} vendedores x {args.turnos} turnos, {args.paralelo} workers, "
+          f"IA falsa ~{args.latencia_ms:.0f} ms")
+    print("=" * 104)
+    print(f"  {'Cenário':<22}{'turnos/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'escritos/turno':>16}"
+          f"{'disco/turno':>13}{'RSS MB':>9}{'chamadas IA':>13}")
+    for r in resultados:
+        escritos = f"{r['bytes_turno']:,.0f} B" if r['bytes_turno'] is not None else 'n/d'
+        print(f"  {r['nome']:<22}{r['turnos_s']:>10.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{escritos:>16}"
+              f"{r['disco_turno']:>11,.0f} B{r['rss_mb']:>9.1f}{r['chamadas_ia']:>13}")
+    print("=" * 104)
+    print("  escritos/turno: bytes passados a write() em arquivos (inclui compactações e contabilidade de tokens)")
+
+
+if __name__ == '__main__':
+    main()
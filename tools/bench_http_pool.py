@@ -0,0 +1,156 @@
+"""
+Benchmark: requests.post sem sessão x cliente HTTP compartilhado (pool keep-alive).
+
+Sobe um servidor HTTPS local que imita o endpoint de chat do GitHub Models
+(certificado autoassinado gerado com openssl) e mede latência por chamada
+e quantas conexões TLS (handshakes) cada modo abriu.
+
+Uso:
+  python tools/bench_http_pool.py
+  python tools/bench_http_pool.py --chamadas 500 --threads 8
+"""
+
+import argparse
+import json
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from ai.cliente_http import ClienteModelosGitHub, httpx
+
+RESPOSTA_FAKE = json.dumps({
+    'choices': [{'message': {'role': 'assistant', 'content': 'Olá! Como posso ajudar?'}}],
+    'usage': {'prompt_tokens': 20, 'completion_tokens': 8, 'total_tokens': 28}
+}).encode()
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    """Responde qualquer POST com uma chat completion fixa, mantendo a conexão aberta."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    conexoes = 0
+    _lock = threading.Lock()
+
+    def setup(self):
+        with StubChatHandler._lock:
+            StubChatHandler.conexoes += 1
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPOSTA_FAKE)))
+        self.end_headers()
+        self.wfile.write(RESPOSTA_FAKE)
+
+    def log_message(self, *args):
+        pass
+
+
+def gerar_certificado(pasta: Path) -> tuple:
+    """Certificado autoassinado para localhost."""
+    cert, chave = pasta / 'cert.pem', pasta / 'key.pem'
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-keyout', str(chave), '-out', str(cert), '-subj', '/CN=localhost',
+         '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1'],
+        check=True, capture_output=True
+    )
+    return cert, chave
+
+
+def iniciar_servidor(cert: Path, chave: Path) -> ThreadingHTTPServer:
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), StubChatHandler)
+    servidor.daemon_threads = True
+    contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    contexto.load_cert_chain(cert, chave)
+    servidor.socket = contexto.wrap_socket(servidor.socket, server_side=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def medir(nome: str, chamar, chamadas: int, threads: int) -> dict:
+    """Executa as chamadas e devolve latências + conexões abertas no servidor."""
+    StubChatHandler.conexoes = 0
+    latencias = []
+
+    def uma_chamada(_):
+        inicio = time.perf_counter()
+        resposta = chamar()
+        assert resposta.status_code == 200
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(uma_chamada, range(chamadas)))
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'nome': nome,
+        'media_ms': statistics.mean(latencias),
+        'p50_ms': latencias[len(latencias) // 2],
+        'p95_ms': latencias[int(len(latencias) * 0.95) - 1],
+        'chamadas_s': chamadas / duracao,
+        'conexoes': StubChatHandler.conexoes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pool HTTP do GitHub Models contra um stub TLS local")
+    parser.add_argument('--chamadas', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        cert, chave = gerar_certificado(Path(pasta))
+        servidor = iniciar_servidor(cert, chave)
+        url = f"https://localhost:{servidor.server_address[1]}/chat/completions"
+        payload = {'model': 'gpt-4o', 'messages': [{'role': 'user', 'content': 'bom dia'}]}
+
+        cenarios = [(
+            'requests.post (sem sessão)',
+            lambda: requests.post(url, json=payload, headers={'Authorization': 'Bearer x'},
+                                  verify=str(cert), timeout=10)
+        )]
+
+        pool_requests = ClienteModelosGitHub(url=url, backend='requests', verificar_tls=str(cert))
+        cenarios.append(('pool requests.Session', lambda: pool_requests.post_chat(payload, token='x', timeout=10)))
+
+        if httpx:
+            pool_httpx = ClienteModelosGitHub(url=url, backend='httpx', verificar_tls=str(cert))
+            cenarios.append((f"pool httpx (http2={pool_httpx.http2})",
+                             lambda: pool_httpx.post_chat(payload, token='x', timeout=10)))
+
+        resultados = [medir(nome, chamar, args.chamadas, args.threads) for nome, chamar in cenarios]
+        servidor.shutdown()
+
+    print("=" * 86)
+    print(f"  🏁 POOL HTTP x SEM SESSÃO - {args.chamadas} chamadas, {args.threads} threads (stub TLS local)")
+    print("=" * 86)
+    print(f"  {'Modo':<32}{'média ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'chamadas/s':>12}{'conexões TLS':>14}")
+    for r in resultados:
+        print(f"  {r['nome']:<32}{r['media_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['chamadas_s']:>12.0f}{r['conexoes']:>14}")
+    base = resultados[0]
+    for r in resultados[1:]:
+        print(f"\n  {r['nome']}: {base['media_ms'] / r['media_ms']:.1f}x mais rápido, "
+              f"{base['conexoes'] - r['conexoes']} handshakes evitados")
+    print("=" * 86)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark do motor de intenções x cadeia de `any(palavra in texto ...)` (como era nas respostas locais).
+
+Gera regras sintéticas (palavras de sílabas aleatórias), confere que as duas abordagens
+escolhem a mesma intenção e mede o tempo por mensagem conforme o número de regras.
+
+Uso:
+  python tools/bench_intencoes.py
+  python tools/bench_intencoes.py --regras 100 1000 5000 --mensagens 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from ai.intencoes import MotorIntencoes, dobrar_texto
+
+SILABAS = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'xo', 'za', 'tra', 'pre', 'cla']
+COMUNS = ['oi', 'bom', 'dia', 'queria', 'saber', 'sobre', 'o', 'a', 'de', 'para', 'com', 'voce', 'pode', 'me', 'ajudar']
+
+
+def palavra_aleatoria(rng: random.Random) -> str:
+    return ''.join(rng.choice(SILABAS) for _ in range(rng.randint(3, 4)))
+
+
+def gerar_regras(rng: random.Random, quantidade: int, palavras_por_regra: int) -> list:
+    return [
+        {'nome': f'intencao_{i}', 'palavras': [palavra_aleatoria(rng) for _ in range(palavras_por_regra)]}
+        for i in range(quantidade)
+    ]
+
+
+def gerar_mensagens(rng: random.Random, regras: list, quantidade: int) -> list:
+    """Mensagens de 15-40 palavras; metade contém uma palavra-chave de alguma regra."""
+    mensagens = []
+    for _ in range(quantidade):
+        palavras = [rng.choice(COMUNS) for _ in range(rng.randint(15, 40))]
+        if rng.random() < 0.5:
+            palavras.insert(rng.randrange(len(palavras)), rng.choice(rng.choice(regras)['palavras']))
+        mensagens.append(' '.join(palavras))
+    return mensagens
+
+
+def cadeia_primeira(regras: list, mensagem: str):
+    """Abordagem antiga: if/elif com any() por regra, na ordem."""
+    msg_lower = mensagem.lower()
+    for regra in regras:
+        if any(palavra in msg_lower for palavra in regra['palavras']):
+            return regra['nome']
+    return None
+
+
+def cadeia_todas(regras: list, mensagem: str) -> list:
+    """Abordagem antiga para obter todas as intenções (percorre todas as regras)."""
+    msg_lower = mensagem.lower()
+    return [r['nome'] for r in regras if any(palavra in msg_lower for palavra in r['palavras'])]
+
+
+def medir_us(funcao, mensagens: list) -> float:
+    inicio = time.perf_counter()
+    for mensagem in mensagens:
+        funcao(mensagem)
+    return (time.perf_counter() - inicio) / len(mensagens) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Motor de intenções x cadeia de any()")
+    parser.add_argument('--regras', type=int, nargs='+', default=[10, 100, 1000, 3000])
+    parser.add_argument('--palavras', type=int, default=5, help="Palavras-chave por regra")
+    parser.add_argument('--mensagens', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+
+    print("=" * 92)
+    print(f"  🧭 MOTOR DE INTENÇÕES x CADEIA any() - {args.mensagens} mensagens, {args.palavras} palavras/regra")
+    print("=" * 92)
+    print(f"  {'regras':>7}{'compilar ms':>13}{'cadeia 1ª µs':>15}{'cadeia todas µs':>17}"
+          f"{'motor µs':>11}{'ganho (todas)':>15}{'iguais':>9}")
+
+    for quantidade in args.regras:
+        regras = gerar_regras(rng, quantidade, args.palavras)
+        mensagens = gerar_mensagens(rng, regras, args.mensagens)
+
+        inicio = time.perf_counter()
+        motor = MotorIntencoes(regras)
+        compilar_ms = (time.perf_counter() - inicio) * 1000
+
+        # Mesma escolha que a cadeia (primeira regra, na ordem) e mesmo conjunto de intenções
+        iguais = all(
+            (motor.primeira(m) or {}).get('intencao') == cadeia_primeira(regras, m)
+            and sorted(r['intencao'] for r in motor.analisar(m)) == sorted(cadeia_todas(regras, m))
+            for m in mensagens[:200]
+        )
+
+        t_primeira = medir_us(lambda m: cadeia_primeira(regras, m), mensagens)
+        t_todas = medir_us(lambda m: cadeia_todas(regras, m), mensagens)
+        t_motor = medir_us(motor.analisar, mensagens)
+
+        print(f"  {quantidade:>7}{compilar_ms:>13.1f}{t_primeira:>15.1f}{t_todas:>17.1f}"
+              f"{t_motor:>11.1f}{t_todas / t_motor:>14.1f}x{'sim' if iguais else 'NÃO':>9}")
+
+    exemplo = MotorIntencoes([
+        {'nome': 'preco', 'palavras': ['preço', 'valor', 'custa']},
+        {'nome': 'pagamento', 'palavras': ['parcelado', 'parcelament', 'pagar']},
+    ])
+    texto = "Qual o VALOR à vista e dá pra fazer PARCELAMENTO?"
+    print(f"\n  Exemplo: {texto!r} -> {dobrar_texto(texto)!r}")
+    for item in exemplo.analisar(texto):
+        print(f"    {item['intencao']:<12} pontuação {item['pontuacao']}  palavras {item['palavras']}")
+    print("=" * 92)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark do cache por similaridade: latência de busca por tamanho do índice.
+
+Preenche o índice com perguntas sintéticas e mede vetorização + busca
+(produto matriz-vetor) com perguntas parafraseadas.
+
+Uso:
+  python tools/bench_similaridade.py
+  python tools/bench_similaridade.py --capacidades 1000 5000 20000 --buscas 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from ai.cache_similaridade import IndiceSimilaridade
+
+TEMAS = ['preço', 'frete', 'parcelamento', 'horário', 'garantia', 'estoque', 'desconto', 'troca']
+PRODUTOS = ['cadeira', 'mesa', 'sofá', 'armário', 'colchão', 'estante', 'cama', 'rack', 'painel', 'poltrona']
+MODELOS = ['de pergunta {t} {p} {n}', 'qual o {t} da {p} modelo {n}?', 'vocês têm {t} pra {p} {n}']
+PARAFRASES = [('quanto custa?', 'qual o valor?'), ('tem frete grátis?', 'o envio é grátis?'),
+              ('posso parcelar?', 'dá pra pagar parcelado?'), ('qual o horário?', 'qual o horário de funcionamento?')]
+# Parecidas no texto, mas com outra resposta: não podem ser reaproveitadas nem no limiar do fallback
+OPOSTAS = [('tem desconto?', 'não tem desconto?'), ('quanto custa?', 'quanto custam 10?'),
+           ('que horas abre?', 'que horas fecha?'), ('com frete?', 'sem frete?')]
+
+
+def pergunta_sintetica(rng: random.Random, n: int) -> str:
+    return rng.choice(MODELOS).format(t=rng.choice(TEMAS), p=rng.choice(PRODUTOS), n=n)
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência de busca do cache por similaridade")
+    parser.add_argument('--capacidades', type=int, nargs='+', default=[500, 1000, 5000, 10000])
+    parser.add_argument('--buscas', type=int, default=1000)
+    parser.add_argument('--dimensao', type=int, default=1024)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+
+    print("=" * 78)
+    print(f"  🔎 CACHE POR SIMILARIDADE - {args.buscas} buscas, dimensão {args.dimensao}")
+    print("=" * 78)
+    print(f"  {'itens':>8}{'vetorizar p50 µs':>18}{'busca p50 µs':>15}{'busca p99 µs':>15}{'memória MB':>13}")
+
+    for capacidade in args.capacidades:
+        indice = IndiceSimilaridade(capacidade=capacidade, dimensao=args.dimensao)
+        for n in range(capacidade):
+            indice.adicionar(pergunta_sintetica(rng, n), 's', 'm', f'resposta {n}')
+
+        consultas = [pergunta_sintetica(rng, rng.randrange(capacidade)) for _ in range(args.buscas)]
+
+        vetorizacao = []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            indice.vetorizar(consulta)
+            vetorizacao.append((time.perf_counter() - inicio) * 1e6)
+
+        busca = []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            indice.buscar(consulta, 's', 'm')
+            busca.append((time.perf_counter() - inicio) * 1e6)
+
+        memoria = indice.matriz.nbytes / 1024 / 1024
+        print(f"  {indice.ocupados:>8}{percentil(vetorizacao, 50):>18.1f}{percentil(busca, 50):>15.1f}"
+              f"{percentil(busca, 99):>15.1f}{memoria:>13.1f}")
+
+    print("\n  Paráfrases (similaridade de cosseno, limiar padrão 0.85):")
+    indice = IndiceSimilaridade(capacidade=16, dimensao=args.dimensao)
+    for original, parafrase in PARAFRASES:
+        a, b = indice.vetorizar(original), indice.vetorizar(parafrase)
+        print(f"    {original!r:<22} x {parafrase!r:<36} {float(a @ b):.2f}")
+
+    print("\n  Opostas (reaproveitada no limiar do fallback, 0.7?):")
+    for original, oposta in OPOSTAS:
+        indice = IndiceSimilaridade(capacidade=16, dimensao=args.dimensao)
+        indice.adicionar(original, 's', 'm', 'resposta')
+        a, b = indice.vetorizar(original), indice.vetorizar(oposta)
+        reaproveitada = indice.buscar(oposta, 's', 'm', limiar=0.7) is not None
+        print(f"    {original!r:<22} x {oposta!r:<36} {float(a @ b):.2f} {'❌ sim' if reaproveitada else '✅ não'}")
+    print("=" * 78)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Extração de CRM em lote: transforma muitas transcrições em JSON de CRM em paralelo.
+
+Entradas aceitas (arquivos ou pastas, misturados):
+  - *.txt   (uma transcrição por arquivo)
+  - *.jsonl (uma transcrição por linha: {"texto": ...} ou {"text": ...}, demais campos são repassados)
+
+Uso:
+  python tools/extrair_crm_lote.py transcricoes/ --saida crm_extraido.jsonl
+  python tools/extrair_crm_lote.py noite.jsonl --paralelo 8 --desordenado
+
+O progresso fica em <saida>.checkpoint.jsonl: se a execução cair, rodar o mesmo
+comando de novo pula as transcrições já concluídas.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from ai.extracao_json import obter_metricas_extracao
+from transcription.copilot_client import CopilotTranscriptionProcessor
+
+
+def listar_arquivos(origens: List[str]) -> List[Path]:
+    """Arquivos .txt/.jsonl das origens, em ordem estável (o índice do checkpoint depende dela)."""
+    arquivos = []
+    for origem in map(Path, origens):
+        if origem.is_dir():
+            arquivos.extend(sorted(p for p in origem.rglob('*') if p.suffix in ('.txt', '.jsonl')))
+        elif origem.exists():
+            arquivos.append(origem)
+        else:
+            print(f"⚠️ Não encontrado: {origem}")
+    return arquivos
+
+
+def ler_transcricoes(arquivos: List[Path]) -> Iterator[Dict]:
+    """Gerar {'origem': ..., 'texto': ..., ...} sem carregar tudo em memória."""
+    for arquivo in arquivos:
+        if arquivo.suffix == '.txt':
+            yield {'origem': str(arquivo), 'texto': arquivo.read_text(encoding='utf-8')}
+            continue
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            for numero_linha, linha in enumerate(f, 1):
+                if not linha.strip():
+                    continue
+                registro = json.loads(linha)
+                registro['texto'] = registro.pop('texto', None) or registro.pop('text', '')
+                registro.setdefault('origem', f"{arquivo}:{numero_linha}")
+                yield registro
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extração de CRM em lote a partir de transcrições")
+    parser.add_argument('origens', nargs='+', help="Arquivos .txt/.jsonl ou pastas")
+    parser.add_argument('--saida', default='crm_extraido.jsonl')
+    parser.add_argument('--checkpoint', default=None, help="Padrão: <saida>.checkpoint.jsonl")
+    parser.add_argument('--paralelo', type=int, default=4)
+    parser.add_argument('--tentativas', type=int, default=3)
+    parser.add_argument('--desordenado', action='store_true', help="Gravar na ordem em que ficam prontos")
+    args = parser.parse_args()
+
+    saida = Path(args.saida)
+    checkpoint = Path(args.checkpoint) if args.checkpoint else saida.with_name(saida.name + '.checkpoint.jsonl')
+
+    registros = []
+
+    def textos():
+        for registro in ler_transcricoes(listar_arquivos(args.origens)):
+            registros.append({k: v for k, v in registro.items() if k != 'texto'})
+            yield registro['texto']
+
+    processador = CopilotTranscriptionProcessor()
+    inicio = time.time()
+    total = falhas = retomados = 0
+    ultimo_progresso = inicio
+
+    with open(saida, 'w', encoding='utf-8') as f:
+        for resultado in processador.extrair_lote(
+            textos(),
+            max_paralelo=args.paralelo,
+            ordenado=not args.desordenado,
+            tentativas=args.tentativas,
+            checkpoint=checkpoint
+        ):
+            linha = dict(registros[resultado['indice']], **resultado)
+            f.write(json.dumps(linha, ensure_ascii=False) + '\n')
+            total += 1
+            falhas += not resultado['ok']
+            retomados += bool(resultado.get('do_checkpoint'))
+
+            if time.time() - ultimo_progresso >= 2:
+                ultimo_progresso = time.time()
+                print(f"   ⏳ {total} processadas ({total / (ultimo_progresso - inicio):.1f}/s)")
+
+    duracao = time.time() - inicio
+    print("=" * 70)
+    print(f"  ✅ {total} transcrições em {duracao:.1f}s -> {saida}")
+    print(f"  ♻️ {retomados} do checkpoint | ❌ {falhas} falharam após {args.tentativas} tentativas")
+    extracao = obter_metricas_extracao().estatisticas()
+    print(f"  🧩 JSON: {extracao['diretas']} diretos, {extracao['recuperadas']} recuperados do texto, "
+          f"{sum(extracao['falhas'].values())} sem JSON aproveitável (taxa de falha {extracao['taxa_falha']:.1%})")
+    print(f"  📝 Checkpoint: {checkpoint}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Migra as pastas de conversas do layout plano (um arquivo por telefone na raiz) para
+subpastas por hash + manifesto (armazenamento/particoes.py).
+
+Pastas migradas por padrão:
+  - mensagens_recebidas/  conversas_<numero>.json             (webhook)
+  - conversations/        conv_<telefone>.json / .jsonl       (chatbot do vendedor)
+
+Uso:
+  python tools/migrar_particoes.py
+  python tools/migrar_particoes.py --niveis 2 --mensagens /dados/mensagens_recebidas --conversas /dados/conversations
+  python tools/migrar_particoes.py --reconstruir     # refaz os manifestos a partir das subpastas
+
+Pode ser rodado mais de uma vez (só move o que ainda está na raiz). Pare o webhook e o
+chatbot antes: os processos guardam o manifesto em memória.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from armazenamento.particoes import DiretorioParticionado
+
+
+def migrar_pasta(pasta: Path, prefixo: str, extensoes: tuple, niveis: int, reconstruir: bool):
+    if not pasta.exists():
+        print(f"⏭️  {pasta}/ não existe")
+        return
+    inicio = time.perf_counter()
+    # Sem manifesto, a própria construção já reconstrói e migra
+    particoes = DiretorioParticionado(pasta, prefixo, extensoes=extensoes, niveis=niveis)
+    if reconstruir:
+        particoes.reconstruir_manifesto()
+    particoes.migrar()
+    estatisticas = particoes.estatisticas()
+    print(f"✅ {pasta}/: {estatisticas['chaves']} telefones no manifesto, "
+          f"{estatisticas['migradas']} migrados ({time.perf_counter() - inicio:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra as conversas para subpastas por hash + manifesto")
+    parser.add_argument('--mensagens', default='mensagens_recebidas', help="Pasta do webhook (conversas_<numero>.json)")
+    parser.add_argument('--conversas', default='conversations', help="Pasta do chatbot (conv_<telefone>.json/.jsonl)")
+    parser.add_argument('--niveis', type=int, default=2, help="Níveis de subpastas (mesmo valor de ARMAZENAMENTO_NIVEIS_PARTICAO)")
+    parser.add_argument('--reconstruir', action='store_true', help="Refazer o manifesto percorrendo as subpastas")
+    args = parser.parse_args()
+
+    migrar_pasta(Path(args.mensagens), 'conversas_', ('.json',), args.niveis, args.reconstruir)
+    migrar_pasta(Path(args.conversas), 'conv_', ('.json', '.jsonl'), args.niveis, args.reconstruir)
+
+
+if __name__ == '__main__':
+    main()
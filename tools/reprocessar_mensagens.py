@@ -0,0 +1,225 @@
+"""
+Reprocessa mensagens arquivadas passando pelo mesmo parsing/armazenamento do webhook.
+
+Entradas aceitas (arquivos ou pastas, misturados):
+  - mensagens_*.json / conversas_*.json  (arquivos gerados pelo webhook)
+  - *.json / *.jsonl com payloads brutos do webhook ({"event": ..., "data": ...})
+
+Uso:
+  python tools/reprocessar_mensagens.py mensagens_recebidas/ --destino mensagens_reprocessadas
+  python tools/reprocessar_mensagens.py payloads/ --workers 8 --lote 2000
+  python tools/reprocessar_mensagens.py mensagens_recebidas/ --com-ia --enviar   # refaz respostas (cuidado!)
+
+Mensagens repetidas (mesmo message_id + timestamp) são gravadas uma única vez,
+então passar mensagens_*.json e conversas_*.json juntos não duplica nada.
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from webhook.eventos import interpretar_evento, montar_entrada
+
+
+def _webhook():
+    """
+    Módulo do webhook, importado só no processo principal (gravação e --com-ia):
+    ao importar ele cria pastas, abre o manifesto e inicia threads, o que os workers não precisam.
+    """
+    import webhook_captura_mensagens
+    return webhook_captura_mensagens
+
+
+def _timestamp_payload(payload: dict) -> Optional[datetime]:
+    """Extrair o horário original de um payload bruto do webhook."""
+    dados = payload.get('data', {}) or {}
+    ts = dados.get('messageTimestamp')
+    if isinstance(ts, dict):
+        ts = ts.get('low')
+    try:
+        if ts:
+            return datetime.fromtimestamp(int(ts))
+        if payload.get('date_time'):
+            return datetime.fromisoformat(str(payload['date_time']).replace('Z', '+00:00')).replace(tzinfo=None)
+    except (ValueError, OSError, OverflowError):
+        pass
+    return None
+
+
+def _para_payload(registro: dict) -> tuple:
+    """Converter registro arquivado ou payload bruto em (payload do webhook, timestamp original)."""
+    if 'dados_completos' in registro:
+        # Entrada salva pelo webhook: reinterpretar a partir dos dados originais
+        payload = {'event': 'messages.upsert', 'data': registro['dados_completos']}
+        try:
+            return payload, datetime.fromisoformat(registro['timestamp'])
+        except (KeyError, ValueError):
+            return payload, None
+    return registro, _timestamp_payload(registro)
+
+
+def _ler_registros(caminho: Path) -> Iterator[dict]:
+    """Ler registros de um arquivo .json (objeto ou lista) ou .jsonl."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        if caminho.suffix == '.jsonl':
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+            return
+        conteudo = json.load(f)
+    if isinstance(conteudo, list):
+        yield from conteudo
+    elif isinstance(conteudo, dict):
+        yield conteudo
+
+
+def processar_arquivo(caminho: str) -> Dict:
+    """
+    Worker: lê um arquivo e devolve as entradas prontas para gravar.
+    Roda em processo separado (parsing JSON é o gargalo de CPU).
+    """
+    resultado = {'arquivo': caminho, 'entradas': [], 'ignorados': 0, 'erros': 0}
+    try:
+        for registro in _ler_registros(Path(caminho)):
+            try:
+                payload, timestamp = _para_payload(registro)
+                evento = interpretar_evento(payload)
+                if not evento:
+                    resultado['ignorados'] += 1
+                    continue
+                resultado['entradas'].append(montar_entrada(
+                    evento['numero'], evento['texto'], evento['message_data'], timestamp
+                ))
+            except Exception:
+                resultado['erros'] += 1
+    except Exception as e:
+        print(f"❌ Erro ao ler {caminho}: {e}")
+        resultado['erros'] += 1
+    return resultado
+
+
+def listar_arquivos(origens: List[str]) -> List[Path]:
+    """
+    Expandir pastas em arquivos .json/.jsonl (ordenados para manter a ordem cronológica).
+    Inclui as subpastas: conversas_*.json ficam em <pasta>/ab/cd/ (armazenamento/particoes.py).
+    """
+    arquivos = []
+    for origem in origens:
+        caminho = Path(origem)
+        if caminho.is_dir():
+            arquivos.extend(sorted(p for p in caminho.rglob('*') if p.suffix in ('.json', '.jsonl') and p.is_file()))
+        elif caminho.exists():
+            arquivos.append(caminho)
+        else:
+            print(f"⚠️ Não encontrado: {origem}")
+    # Arquivos diários primeiro: têm todas as mensagens em ordem de chegada
+    return sorted(arquivos, key=lambda p: (not p.name.startswith('mensagens_'), str(p)))
+
+
+def executar_efeitos(entrada: dict, enviar: bool) -> bool:
+    """Refazer IA (e opcionalmente o envio) como o webhook faria."""
+    webhook = _webhook()
+    if entrada['numero'] != webhook.NUMERO_MONITORADO or entrada['from_me']:
+        return False
+    resposta = webhook.perguntar_ia_github(entrada['mensagem'])
+    if enviar:
+        webhook.enviar_resposta(entrada['numero'], resposta)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocessa mensagens arquivadas pelo pipeline do webhook")
+    parser.add_argument('origens', nargs='+', help="Arquivos ou pastas com mensagens/payloads")
+    parser.add_argument('--destino', default='mensagens_reprocessadas', help="Pasta de saída")
+    parser.add_argument('--workers', type=int, default=4, help="Processos de parsing em paralelo")
+    parser.add_argument('--lote', type=int, default=1000, help="Entradas por gravação em disco")
+    parser.add_argument('--com-ia', action='store_true', help="Chamar a IA para mensagens do número monitorado")
+    parser.add_argument('--enviar', action='store_true', help="Enviar as respostas pela Evolution (requer --com-ia)")
+    args = parser.parse_args()
+
+    destino = Path(args.destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    arquivos = listar_arquivos(args.origens)
+
+    if any(destino.resolve() in a.resolve().parents for a in arquivos):
+        print("❌ A pasta de destino não pode ser uma das origens (as mensagens seriam duplicadas)")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("  🔁 REPROCESSAMENTO DE MENSAGENS")
+    print("=" * 70)
+    print(f"  📂 Arquivos: {len(arquivos)}")
+    print(f"  📁 Destino: {destino}/")
+    print(f"  ⚙️  Workers: {args.workers} | Lote: {args.lote}")
+    print(f"  🤖 IA: {'sim' if args.com_ia else 'não'} | Envio: {'sim' if args.enviar and args.com_ia else 'não'}")
+    print("=" * 70 + "\n")
+
+    totais = {'lidas': 0, 'salvas': 0, 'duplicadas': 0, 'ignorados': 0, 'erros': 0, 'efeitos': 0}
+    vistos = set()
+    lote = []
+    inicio = time.perf_counter()
+    ultimo_progresso = inicio
+
+    def gravar_lote():
+        if lote:
+            totais['salvas'] += _webhook().salvar_mensagens_lote(lote, destino)
+            lote.clear()
+
+    # Muitos payloads pequenos: agrupar arquivos por tarefa para reduzir o overhead entre processos
+    chunksize = max(1, len(arquivos) // (args.workers * 16))
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        resultados = executor.map(processar_arquivo, map(str, arquivos), chunksize=chunksize)
+        for n, resultado in enumerate(resultados, 1):
+            totais['ignorados'] += resultado['ignorados']
+            totais['erros'] += resultado['erros']
+
+            for entrada in resultado['entradas']:
+                totais['lidas'] += 1
+                chave = (entrada['message_id'], entrada['timestamp'], entrada['numero'])
+                if chave in vistos:
+                    totais['duplicadas'] += 1
+                    continue
+                vistos.add(chave)
+                lote.append(entrada)
+
+                if args.com_ia and executar_efeitos(entrada, args.enviar):
+                    totais['efeitos'] += 1
+
+                if len(lote) >= args.lote:
+                    gravar_lote()
+
+            agora = time.perf_counter()
+            if agora - ultimo_progresso >= 2 or n == len(arquivos):
+                taxa = totais['lidas'] / max(agora - inicio, 1e-9)
+                print(f"📊 {n}/{len(arquivos)} arquivos | {totais['lidas']} mensagens | {taxa:,.0f} msg/s")
+                ultimo_progresso = agora
+
+    gravar_lote()
+    duracao = time.perf_counter() - inicio
+
+    print("\n" + "=" * 70)
+    print("  ✅ RESUMO")
+    print("=" * 70)
+    print(f"  Mensagens lidas:      {totais['lidas']}")
+    print(f"  Mensagens salvas:     {totais['salvas']}")
+    print(f"  Duplicadas ignoradas: {totais['duplicadas']}")
+    print(f"  Eventos não-mensagem: {totais['ignorados']}")
+    print(f"  Erros de parsing:     {totais['erros']}")
+    if args.com_ia:
+        print(f"  Respostas de IA:      {totais['efeitos']}")
+    print(f"  Tempo total:          {duracao:.2f}s")
+    print(f"  Throughput:           {totais['lidas'] / max(duracao, 1e-9):,.0f} msg/s")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Verificação de concorrência do chatbot do vendedor (ChatbotManager assíncrono).
+
+Dispara muitas mensagens ao mesmo tempo para vários telefones (várias por telefone)
+numa pasta temporária e confere, para cada armazenamento, que nenhum turno se perdeu:
+todas as mensagens do vendedor gravadas, cada uma seguida da resposta, na ordem de
+envio, a tabela de travas vazia no fim e os arquivos nas subpastas por hash, com
+cada telefone no manifesto. Sai com código 1 se algo não bater.
+
+Uso:
+  python tools/verificar_concorrencia_chatbot.py
+  python tools/verificar_concorrencia_chatbot.py --telefones 20 --mensagens 30 --paralelo 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+# Sem IA e sem resumo: o teste conta turnos, e o resumo dobraria os antigos
+os.environ['CHATBOT_USAR_IA'] = 'false'
+os.environ['CHATBOT_RESUMO_ATIVO'] = 'false'
+
+MODOS = {
+    'json': {'CHATBOT_ARMAZENAMENTO': 'json', 'CHATBOT_CACHE_ATIVO': 'false'},
+    'log': {'CHATBOT_ARMAZENAMENTO': 'log', 'CHATBOT_CACHE_ATIVO': 'false'},
+    'cache+log': {'CHATBOT_ARMAZENAMENTO': 'log', 'CHATBOT_CACHE_ATIVO': 'true'},
+}
+
+
+def verificar_modo(nome: str, ambiente: dict, telefones: int, mensagens: int, paralelo: int) -> list:
+    """Rodar um modo numa pasta temporária e devolver a lista de problemas encontrados."""
+    os.environ.update(ambiente)
+    # Snapshot pequeno para a compactação do log acontecer no meio da concorrência
+    os.environ['CHATBOT_TURNOS_POR_SNAPSHOT'] = '16'
+    os.environ['CHATBOT_GRAVACAO_INTERVALO_SEGUNDOS'] = '0.05'
+
+    from chatbot.vendedor_chatbot import ChatbotManager, VendedorChatbot
+
+    problemas = []
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        try:
+            manager = ChatbotManager(max_paralelo=paralelo)
+            numeros = [f"+55 11 9{i:04d}-0000" for i in range(telefones)]
+            # Intercalado: as mensagens de um telefone chegam misturadas às dos outros
+            lote = [(numero, f"mensagem {j} do cliente {numero}") for j in range(mensagens) for numero in numeros]
+
+            inicio = time.perf_counter()
+            respostas = asyncio.run(manager.processar_lote_async(lote))
+            duracao = time.perf_counter() - inicio
+
+            if len(respostas) != len(lote) or not all(respostas):
+                problemas.append(f"{len(lote) - sum(1 for r in respostas if r)} mensagens sem resposta")
+            estatisticas = manager.estatisticas()
+            manager.encerrar()
+            if estatisticas['usuarios_em_andamento'] or len(manager.chatbot.travas):
+                problemas.append("travas ainda na tabela depois do lote")
+
+            # Releitura do disco por outra instância: o que foi gravado, não o que está em memória
+            os.environ['CHATBOT_CACHE_ATIVO'] = 'false'
+            leitor = VendedorChatbot()
+            for numero in numeros:
+                historico = leitor.load_conversation_history(numero)
+                enviadas = [msg['content'] for msg in historico if msg.get('role') == 'user']
+                esperadas = [f"mensagem {j} do cliente {numero}" for j in range(mensagens)]
+                if enviadas != esperadas:
+                    problemas.append(f"{numero}: {len(enviadas)}/{mensagens} turnos gravados (ou fora de ordem)")
+                papeis = [msg.get('role') for msg in historico]
+                if papeis != ['user', 'assistant'] * mensagens:
+                    problemas.append(f"{numero}: turnos intercalados ({''.join(p[0] for p in papeis[:12])}...)")
+
+            # Arquivos nas subpastas por hash (nada plano na raiz) e todos os telefones no manifesto
+            raiz = leitor.conversations_dir
+            planos = sorted(arquivo.name for arquivo in raiz.glob('conv_*'))
+            if planos:
+                problemas.append(f"{len(planos)} arquivos fora das subpastas ({', '.join(planos[:3])}...)")
+            manifesto = raiz / 'manifesto_conv.txt'
+            registrados = set(manifesto.read_text(encoding='utf-8').split()) if manifesto.exists() else set()
+            for numero in numeros:
+                chave = numero.replace('+', '').replace(' ', '').replace('-', '')
+                if f"+{chave}" not in registrados:
+                    problemas.append(f"{numero}: fora do manifesto")
+                elif not any(leitor.particoes.pasta(chave).glob(f"conv_{chave}.*")):
+                    problemas.append(f"{numero}: sem arquivo em {leitor.particoes.pasta(chave).relative_to(raiz)}")
+        finally:
+            os.chdir(diretorio_original)
+
+    print(f"{'✅' if not problemas else '❌'} {nome:<10} {len(lote)} mensagens em {duracao:.2f}s "
+          f"({len(lote) / duracao:.0f}/s), esperas do mesmo usuário: {estatisticas['esperas_mesmo_usuario']}")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verificar que o chatbot não perde turnos sob concorrência')
+    parser.add_argument('--telefones', type=int, default=12)
+    parser.add_argument('--mensagens', type=int, default=25, help='Mensagens por telefone')
+    parser.add_argument('--paralelo', type=int, default=8, help='Workers do ChatbotManager')
+    parser.add_argument('--modos', nargs='+', default=list(MODOS), choices=list(MODOS))
+    args = parser.parse_args()
+
+    falhas = 0
+    for nome in args.modos:
+        problemas = verificar_modo(nome, MODOS[nome], args.telefones, args.mensagens, args.paralelo)
+        for problema in problemas[:10]:
+            print(f"   - {problema}")
+        falhas += len(problemas)
+
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
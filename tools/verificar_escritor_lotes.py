@@ -0,0 +1,74 @@
+"""
+Verificação do escritor em lote do Salesforce (integration/escritor_lotes.py).
+
+Usa uma função de envio falsa (sem Salesforce) e confere:
+  - um registro sozinho, com o escritor parado, sai pelo prazo (intervalo), não fica esperando o lote encher
+  - um sObject novo enfileirado depois de um período ocioso também sai no prazo
+  - lotes cheios saem com no máximo tamanho_lote registros por chamada
+Sai com código 1 se algo não bater.
+
+Uso:
+  python tools/verificar_escritor_lotes.py
+  python tools/verificar_escritor_lotes.py --intervalo 0.5 --registros 450
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from integration.escritor_lotes import EscritorEmLote
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verificar prazos e tamanhos do escritor em lote')
+    parser.add_argument('--intervalo', type=float, default=1.0)
+    parser.add_argument('--registros', type=int, default=450, help='Registros no teste de lotes cheios')
+    args = parser.parse_args()
+
+    chamadas = []
+
+    def enviar(objeto, registros):
+        chamadas.append((objeto, len(registros)))
+        return [{'id': f"{objeto[:3]}{i}", 'success': True, 'errors': []} for i in range(len(registros))]
+
+    problemas = []
+    folga = args.intervalo + 1.0
+    escritor = EscritorEmLote(enviar, intervalo=args.intervalo)
+
+    for rodada, objeto in enumerate(['Contact', 'Task'], 1):
+        # Escritor ocioso (sem fila nenhuma) antes de cada registro
+        time.sleep(0.2)
+        inicio = time.perf_counter()
+        future = escritor.enfileirar(objeto, {'LastName': 'teste'})
+        try:
+            resultado = future.result(timeout=folga)
+            duracao = time.perf_counter() - inicio
+            print(f"✅ registro único de {objeto} saiu em {duracao:.2f}s (intervalo {args.intervalo}s)")
+            if not resultado.get('success'):
+                problemas.append(f"{objeto}: resultado sem sucesso {resultado}")
+        except Exception:
+            problemas.append(f"{objeto}: registro único ainda pendente depois de {folga:.1f}s "
+                             f"({escritor.estatisticas()['pendentes']})")
+
+    chamadas.clear()
+    futures = [escritor.enfileirar('Lead', {'LastName': str(n)}) for n in range(args.registros)]
+    for future in futures:
+        future.result(timeout=folga)
+    maior = max((tamanho for _, tamanho in chamadas), default=0)
+    esperadas = -(-args.registros // escritor.tamanho_lote)
+    print(f"{'✅' if maior <= escritor.tamanho_lote else '❌'} {args.registros} Leads em {len(chamadas)} chamadas "
+          f"(maior lote: {maior}, mínimo possível: {esperadas})")
+    if maior > escritor.tamanho_lote:
+        problemas.append(f"lote de {maior} registros passa de {escritor.tamanho_lote}")
+
+    escritor.encerrar()
+    for problema in problemas:
+        print(f"   - {problema}")
+    sys.exit(1 if problemas else 0)
+
+
+if __name__ == '__main__':
+    main()
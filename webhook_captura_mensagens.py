@@ -4,17 +4,40 @@ Salva TODAS as mensagens recebidas de QUALQUER número
 Responde mensagens do numero monitorado usando IA do GitHub
 """
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from datetime import datetime
+from typing import Optional, Tuple
+import asyncio
+import itertools
 import json
 import requests
 import os
+import sys
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Módulos em src/ (mesmo esquema de import do chatbot: `from transcription...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'src'))
+
+from ai.cache_respostas import cache_habilitado, obter_cache_respostas
+from ai.cache_similaridade import obter_indice_similaridade
+from ai.cliente_http import ErroHTTPModelo, obter_cliente_modelos
+from ai.contexto import MetricasContexto, estimar_tokens, montar_contexto, tokens_mensagens
+from ai.resiliencia import CircuitoAberto, LimiteSimultaneas, obter_controle
+from ai.roteamento import obter_roteador
+from ai.streaming import DivisorMensagens, MetricasStreaming, ler_deltas_sse
+from ai.uso_tokens import obter_contabilidade_tokens
+from armazenamento.particoes import DiretorioParticionado
+from webhook.eventos import extrair_numero_telefone, extrair_texto_mensagem, interpretar_evento, montar_entrada
+from webhook.feed import FeedMensagens, formatar_sse
+from webhook.historico import HistoricoConversas
+from webhook.tracing import RastreadorLatencia
+
 app = FastAPI()
 
 # ========== CONFIGURAÇÕES ==========
@@ -25,6 +48,24 @@ INSTANCE_NAME = "salesforce-bot"
 # GitHub API Configuration
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_API_URL = "https://models.inference.ai.azure.com/chat/completions"
+# Chave dos caches de resposta; o modelo de cada chamada vem do roteador (AI_MODELO_RAPIDO / AI_MODELO_GRANDE)
+MODELO_IA = "gpt-4o"
+SYSTEM_PROMPT_WHATSAPP = "Você é um assistente útil e amigável que responde mensagens de WhatsApp de forma clara e objetiva."
+
+# Timeout de cada tentativa (retentativas, limite de simultâneas e disjuntor: AI_* em ai/resiliencia.py)
+AI_TIMEOUT_SEGUNDOS = float(os.getenv('AI_TIMEOUT_SEGUNDOS', '15'))
+
+# Resposta local quando a IA está indisponível (circuito aberto, 429/5xx após as retentativas)
+AI_FALLBACK_LIMIAR = float(os.getenv('AI_FALLBACK_LIMIAR', '0.7'))
+RESPOSTA_INDISPONIVEL = (
+    "Recebemos sua mensagem! Nosso atendimento automático está instável no momento, "
+    "mas retornamos em instantes."
+)
+
+# Streaming: envia cada frase/parágrafo assim que a IA termina de gerá-lo
+AI_STREAMING = os.getenv('AI_STREAMING', 'false').lower() == 'true'
+STREAMING_MIN_CARACTERES = int(os.getenv('AI_STREAMING_MIN_CARACTERES', '60'))
+metricas_streaming = MetricasStreaming()
 
 # Número para monitorar e responder
 NUMERO_MONITORADO = "556596977000"
@@ -33,67 +74,191 @@ NUMERO_MONITORADO = "556596977000"
 MENSAGENS_DIR = Path('mensagens_recebidas')
 MENSAGENS_DIR.mkdir(exist_ok=True)
 
+# conversas_<numero>.json em subpastas por hash (mensagens_recebidas/ab/cd/) + manifesto dos números
+ARMAZENAMENTO_NIVEIS_PARTICAO = int(os.getenv('ARMAZENAMENTO_NIVEIS_PARTICAO', '2'))
+particoes_conversas = DiretorioParticionado(MENSAGENS_DIR, 'conversas_', niveis=ARMAZENAMENTO_NIVEIS_PARTICAO)
+_particoes_por_pasta = {MENSAGENS_DIR.resolve(): particoes_conversas}
+
+# Feed ao vivo (SSE / WebSocket)
+FEED_TAMANHO_FILA = int(os.getenv('FEED_TAMANHO_FILA', '100'))
+FEED_HISTORICO = int(os.getenv('FEED_HISTORICO', '200'))
+FEED_KEEPALIVE_SEGUNDOS = 15
+
+feed = FeedMensagens(tamanho_fila=FEED_TAMANHO_FILA, tamanho_historico=FEED_HISTORICO)
+
+# Contexto da conversa enviado à IA (turnos recentes do número dentro de um orçamento de tokens)
+AI_CONTEXTO_ATIVO = os.getenv('AI_CONTEXTO_ATIVO', 'true').lower() == 'true'
+AI_CONTEXTO_ORCAMENTO_TOKENS = int(os.getenv('AI_CONTEXTO_ORCAMENTO_TOKENS', '1500'))
+historico = HistoricoConversas(
+    MENSAGENS_DIR,
+    particoes=particoes_conversas,
+    max_turnos=int(os.getenv('AI_CONTEXTO_MAX_TURNOS', '30')),
+    janela_horas=float(os.getenv('AI_CONTEXTO_JANELA_HORAS', '24'))
+)
+metricas_contexto = MetricasContexto()
+
+# Traces de latência por mensagem (traces_YYYYMMDD.jsonl na pasta de mensagens)
+rastreador = RastreadorLatencia(MENSAGENS_DIR, max_em_memoria=int(os.getenv('TRACES_EM_MEMORIA', '5000')))
+
 # ========== FUNÇÕES AUXILIARES ==========
 
-def extrair_numero_telefone(remote_jid: str) -> str:
-    """Extrai o número do remoteJid"""
-    return remote_jid.split('@')[0] if '@' in remote_jid else remote_jid
+def buscar_resposta_em_cache(mensagem: str, rota: str = 'webhook') -> Optional[str]:
+    """Resposta do cache exato ou de pergunta parecida (None se a rota não usa cache ou não achou)"""
+    if not cache_habilitado(rota):
+        return None
+    
+    resposta_cache = obter_cache_respostas().obter(mensagem, SYSTEM_PROMPT_WHATSAPP, MODELO_IA)
+    if resposta_cache:
+        print(f"   ⚡ Resposta do cache: {resposta_cache[:50]}...")
+        return resposta_cache
+    
+    indice_similar = obter_indice_similaridade()
+    if indice_similar:
+        similar = indice_similar.buscar(mensagem, SYSTEM_PROMPT_WHATSAPP, MODELO_IA)
+        if similar:
+            resposta_cache, similaridade = similar
+            print(f"   ⚡ Resposta de pergunta parecida ({similaridade:.2f}): {resposta_cache[:50]}...")
+            return resposta_cache
+    return None
+
+
+def responder_localmente(mensagem: str, rota: str = 'webhook', turnos: Optional[list] = None) -> str:
+    """
+    Resposta sem IA (endpoint indisponível): resposta em cache da mesma pergunta,
+    pergunta parecida com limiar mais baixo que o normal ou aviso padrão
+    Mesmas regras do caminho normal: sem cache nas rotas de AI_CACHE_ROTAS_SEM_CACHE
+    nem quando a conversa tem histórico (a resposta guardada não leva o contexto)
+    """
+    if turnos or not cache_habilitado(rota):
+        return RESPOSTA_INDISPONIVEL
+    
+    resposta_cache = obter_cache_respostas().obter(mensagem, SYSTEM_PROMPT_WHATSAPP, MODELO_IA)
+    if resposta_cache:
+        return resposta_cache
+    
+    indice_similar = obter_indice_similaridade()
+    if indice_similar:
+        similar = indice_similar.buscar(mensagem, SYSTEM_PROMPT_WHATSAPP, MODELO_IA, limiar=AI_FALLBACK_LIMIAR)
+        if similar:
+            print(f"   ♻️ Resposta local de pergunta parecida ({similar[1]:.2f})")
+            return similar[0]
+    return RESPOSTA_INDISPONIVEL
 
 
-def perguntar_ia_github(mensagem: str) -> str:
-    """Envia mensagem para IA do GitHub e retorna resposta"""
+def guardar_resposta_em_cache(mensagem: str, resposta: str, rota: str = 'webhook'):
+    """Guardar resposta da IA nos caches exato e por similaridade"""
+    if not cache_habilitado(rota):
+        return
+    obter_cache_respostas().guardar(mensagem, SYSTEM_PROMPT_WHATSAPP, MODELO_IA, resposta)
+    indice_similar = obter_indice_similaridade()
+    if indice_similar:
+        indice_similar.adicionar(mensagem, SYSTEM_PROMPT_WHATSAPP, MODELO_IA, resposta)
+
+
+def obter_historico(numero: Optional[str], message_id: Optional[str] = None) -> list:
+    """Turnos recentes do número para o contexto (vazio se desligado ou sem número)"""
+    if not AI_CONTEXTO_ATIVO or not numero:
+        return []
+    return historico.obter(numero, excluir_message_id=message_id)
+
+
+def montar_payload_ia(mensagem: str, turnos: Optional[list] = None, modelo: str = MODELO_IA) -> dict:
+    """Corpo da chat completion para uma mensagem de WhatsApp (com o histórico dentro do orçamento)"""
+    inicio = time.perf_counter()
+    mensagens, info = montar_contexto(
+        SYSTEM_PROMPT_WHATSAPP,
+        turnos or [],
+        mensagem,
+        orcamento_tokens=AI_CONTEXTO_ORCAMENTO_TOKENS
+    )
+    metricas_contexto.registrar((time.perf_counter() - inicio) * 1000, info)
+    if turnos:
+        print(f"   🧵 Contexto: {info['turnos_incluidos']} turnos, ~{info['tokens_prompt']} tokens")
+    
+    return {
+        "model": modelo,
+        "messages": mensagens,
+        "temperature": 0.7,
+        "max_tokens": 500
+    }
+
+
+def perguntar_ia_github(
+    mensagem: str,
+    rota: str = 'webhook',
+    numero: Optional[str] = None,
+    message_id: Optional[str] = None
+) -> str:
+    """
+    Envia mensagem para IA do GitHub e retorna resposta
+    Com numero, os turnos recentes da conversa vão junto como contexto
+    Perguntas repetidas (após normalização) ou parecidas (similaridade) são respondidas
+    pelos caches, exceto nas rotas listadas em AI_CACHE_ROTAS_SEM_CACHE
+    e quando há histórico (a resposta depende da conversa)
+    """
+    turnos = []
     try:
+        turnos = obter_historico(numero, message_id)
+        if not turnos:
+            resposta_cache = buscar_resposta_em_cache(mensagem, rota)
+            if resposta_cache:
+                return resposta_cache
+        
         if not GITHUB_TOKEN:
             print("   ⚠️ GITHUB_TOKEN não configurado!")
             return "Desculpe, não consigo processar sua mensagem no momento."
         
-        headers = {
-            "Authorization": f"Bearer {GITHUB_TOKEN}",
-            "Content-Type": "application/json"
-        }
+        if not obter_contabilidade_tokens().dentro_do_orcamento(rota, numero):
+            print("   💸 Orçamento diário de tokens esgotado - resposta local")
+            return responder_localmente(mensagem, rota, turnos)
         
-        payload = {
-            "model": "gpt-4o",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Você é um assistente útil e amigável que responde mensagens de WhatsApp de forma clara e objetiva."
-                },
-                {
-                    "role": "user",
-                    "content": mensagem
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 500
-        }
+        payload = montar_payload_ia(mensagem, turnos)
+        roteador = obter_roteador()
+        escolha = roteador.escolher(mensagem)
         
-        print(f"   🤖 Enviando para IA do GitHub...")
-        response = requests.post(
-            GITHUB_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        def chamar(modelo: str) -> str:
+            # Cliente compartilhado (keep-alive) dentro do controle de resiliência (semáforo, retentativas, disjuntor)
+            response = obter_controle().executar(lambda: obter_cliente_modelos().post_chat(
+                dict(payload, model=modelo),
+                token=GITHUB_TOKEN,
+                url=GITHUB_API_URL,
+                timeout=AI_TIMEOUT_SEGUNDOS
+            ))
+            if response.status_code != 200:
+                raise ErroHTTPModelo(response.status_code, response.text, dict(response.headers))
+            dados = response.json()
+            # Contabilizado mesmo quando perde o hedge (a chamada foi paga)
+            obter_contabilidade_tokens().registrar(dados.get('usage'), modelo, rota, numero)
+            return dados['choices'][0]['message']['content']
         
-        if response.status_code == 200:
-            resposta_ia = response.json()['choices'][0]['message']['content']
-            print(f"   ✅ Resposta da IA recebida: {resposta_ia[:50]}...")
-            return resposta_ia
-        else:
-            print(f"   ❌ Erro na IA: {response.status_code}")
-            print(f"   Resposta: {response.text}")
-            return "Desculpe, tive um problema ao processar sua mensagem."
-            
+        print(f"   🤖 Enviando para IA do GitHub ({escolha['modelo']}, {escolha['motivo']})...")
+        resposta_ia, info = roteador.executar(chamar, escolha)
+        print(f"   ✅ Resposta da IA recebida ({info['modelo']}{', hedge' if info['hedge'] else ''}): {resposta_ia[:50]}...")
+        if not turnos:
+            guardar_resposta_em_cache(mensagem, resposta_ia, rota)
+        return resposta_ia
+    
+    except ErroHTTPModelo as e:
+        print(f"   ❌ Erro na IA: {e.status_code}")
+        print(f"   Resposta: {e.texto}")
+        return responder_localmente(mensagem, rota, turnos)
+    
+    except (CircuitoAberto, LimiteSimultaneas) as e:
+        print(f"   🔌 IA indisponível ({e}) - resposta local")
+        return responder_localmente(mensagem, rota, turnos)
+    
     except Exception as e:
         print(f"   ❌ Erro ao chamar IA: {e}")
         import traceback
         traceback.print_exc()
-        return "Desculpe, ocorreu um erro ao processar sua mensagem."
+        return responder_localmente(mensagem, rota, turnos)
 
 
-def enviar_resposta(numero: str, mensagem: str) -> bool:
-    """Envia resposta via Evolution API"""
+def enviar_resposta(numero: str, mensagem: str, message_id_origem: Optional[str] = None) -> bool:
+    """
+    Envia resposta via Evolution API
+    Se message_id_origem for informado, associa a resposta ao trace da mensagem original
+    """
     try:
         headers = {"apikey": EVOLUTION_API_KEY}
         body = {
@@ -110,6 +275,12 @@ def enviar_resposta(numero: str, mensagem: str) -> bool:
         
         if response.status_code == 201:
             print(f"   ✅ Resposta enviada para {numero}")
+            if message_id_origem:
+                try:
+                    id_enviado = response.json().get('key', {}).get('id')
+                    rastreador.associar_envio(message_id_origem, id_enviado)
+                except ValueError:
+                    pass
             return True
         else:
             print(f"   ❌ Erro ao enviar: {response.status_code}")
@@ -120,58 +291,226 @@ def enviar_resposta(numero: str, mensagem: str) -> bool:
         return False
 
 
-def salvar_mensagem(numero: str, mensagem: str, message_data: dict):
+def enviar_presenca(numero: str, presenca: str = 'composing', duracao_ms: int = 1500) -> bool:
+    """Mostra "digitando..." no WhatsApp do contato (Evolution /chat/sendPresence)"""
+    try:
+        response = requests.post(
+            f"{EVOLUTION_API_URL}/chat/sendPresence/{INSTANCE_NAME}",
+            headers={"apikey": EVOLUTION_API_KEY},
+            json={"number": numero, "presence": presenca, "delay": duracao_ms},
+            timeout=5
+        )
+        return response.status_code in (200, 201)
+    except Exception as e:
+        print(f"   ⚠️ Erro ao enviar presença: {e}")
+        return False
+
+
+def responder_em_streaming(
+    numero: str,
+    mensagem: str,
+    message_id_origem: Optional[str] = None,
+    rota: str = 'webhook',
+    inicio: Optional[float] = None
+) -> Tuple[str, bool]:
+    """
+    Responde via streaming: cada frase/parágrafo completo é enviado assim que chega,
+    com "digitando..." entre um envio e outro
+    Se o stream falhar antes do primeiro envio, cai na chamada normal (perguntar_ia_github);
+    depois dele, o texto já recebido é enviado e contabilizado, mas não vai para o cache
+    
+    Returns:
+        (resposta completa, se pelo menos uma mensagem foi enviada)
+    """
+    inicio = inicio or time.time()
+    turnos = obter_historico(numero, message_id_origem)
+    resposta_cache = None if turnos else buscar_resposta_em_cache(mensagem, rota)
+    resposta_local = None
+    if not resposta_cache:
+        if not GITHUB_TOKEN:
+            print("   ⚠️ GITHUB_TOKEN não configurado!")
+            resposta_local = "Desculpe, não consigo processar sua mensagem no momento."
+        elif not obter_contabilidade_tokens().dentro_do_orcamento(rota, numero):
+            print("   💸 Orçamento diário de tokens esgotado - resposta local")
+            resposta_local = responder_localmente(mensagem, rota, turnos)
+    
+    if resposta_cache or resposta_local:
+        resposta = resposta_cache or resposta_local
+        rastreador.marcar(message_id_origem, 'ia_fim')
+        rastreador.marcar(message_id_origem, 'envio_inicio')
+        enviada = enviar_resposta(numero, resposta, message_id_origem=message_id_origem)
+        rastreador.marcar(message_id_origem, 'primeira_mensagem')
+        tempo_ms = (time.time() - inicio) * 1000
+        metricas_streaming.registrar(tempo_ms if enviada else None, tempo_ms, 1)
+        return resposta, enviada
+    
+    divisor = DivisorMensagens(min_caracteres=STREAMING_MIN_CARACTERES)
+    partes = []
+    enviados = 0
+    primeira_ms = None
+    
+    def enviar_trecho(trecho: str):
+        nonlocal enviados, primeira_ms
+        if enviados == 0:
+            rastreador.marcar(message_id_origem, 'envio_inicio')
+        if enviar_resposta(numero, trecho, message_id_origem=message_id_origem):
+            enviados += 1
+            if primeira_ms is None:
+                primeira_ms = (time.time() - inicio) * 1000
+                rastreador.marcar(message_id_origem, 'primeira_mensagem')
+                print(f"   ⏱️ Primeira mensagem em {primeira_ms:.0f} ms")
+    
+    # Streaming não usa hedge: o ganho de latência vem da primeira frase enviada
+    escolha = obter_roteador().escolher(mensagem)
+    payload = montar_payload_ia(mensagem, turnos, modelo=escolha['modelo'])
+    payload['stream_options'] = {'include_usage': True}
+    meta = {}
+    
+    def abrir_stream():
+        # Lê a primeira linha aqui para que erro de status/conexão caia nas retentativas
+        linhas = obter_cliente_modelos().stream_chat(
+            payload,
+            token=GITHUB_TOKEN,
+            url=GITHUB_API_URL,
+            timeout=AI_TIMEOUT_SEGUNDOS
+        )
+        return itertools.chain([next(linhas, '')], linhas)
+    
+    def registrar_uso():
+        # Sem usage no stream: estimativa local (tokens gerados são cobrados mesmo com o stream interrompido)
+        uso = meta.get('usage') or {
+            'prompt_tokens': tokens_mensagens(payload['messages']),
+            'completion_tokens': estimar_tokens(''.join(partes))
+        }
+        obter_contabilidade_tokens().registrar(uso, escolha['modelo'], rota, numero)
+    
+    controle = obter_controle()
+    interrompido = False
+    try:
+        print(f"   🤖 Enviando para IA do GitHub ({escolha['modelo']}, streaming)...")
+        with controle.vaga():
+            enviar_presenca(numero)
+            linhas = controle.executar(abrir_stream, ocupar_vaga=False)
+            try:
+                for delta in ler_deltas_sse(linhas, meta):
+                    partes.append(delta)
+                    for trecho in divisor.alimentar(delta):
+                        enviar_trecho(trecho)
+                        enviar_presenca(numero)
+            except Exception:
+                controle.registrar_falha()
+                raise
+    except Exception as e:
+        metricas_streaming.registrar_falha()
+        detalhe = f"{e.status_code}" if isinstance(e, ErroHTTPModelo) else str(e)
+        print(f"   ❌ Erro no streaming da IA: {detalhe}")
+        if enviados == 0:
+            if partes:
+                registrar_uso()
+            # Erro do pedido (ex: stream não suportado) tenta a chamada normal;
+            # upstream instável (já retentado) ou circuito aberto vai direto para a resposta local
+            if isinstance(e, ErroHTTPModelo) and e.status_code < 500 and e.status_code != 429:
+                resposta = perguntar_ia_github(mensagem, rota, numero=numero, message_id=message_id_origem)
+            else:
+                resposta = responder_localmente(mensagem, rota, turnos)
+            rastreador.marcar(message_id_origem, 'ia_fim')
+            rastreador.marcar(message_id_origem, 'envio_inicio')
+            return resposta, enviar_resposta(numero, resposta, message_id_origem=message_id_origem)
+        # Parte já foi enviada: o texto recebido até a falha também vai (sem cache, resposta incompleta)
+        interrompido = True
+    
+    resto = divisor.finalizar()
+    rastreador.marcar(message_id_origem, 'ia_fim')
+    if resto:
+        enviar_trecho(resto)
+    
+    resposta = ''.join(partes).strip()
+    metricas_streaming.registrar(primeira_ms, (time.time() - inicio) * 1000, enviados)
+    registrar_uso()
+    if resposta and not turnos and not interrompido:
+        guardar_resposta_em_cache(mensagem, resposta, rota)
+    print(f"   ✅ Resposta enviada em {enviados} mensagem(ns){' (stream interrompido)' if interrompido else ''}")
+    return resposta, enviados > 0
+
+
+def responder_mensagem(numero: str, texto: str, message_id: str, recebido_em: float) -> Tuple[str, bool]:
+    """
+    Gerar a resposta da IA (streaming ou chamada normal) e enviar pela Evolution
+    Bloqueante: no webhook roda no threadpool
+    
+    Returns:
+        (resposta, se foi enviada)
+    """
+    if AI_STREAMING:
+        return responder_em_streaming(numero, texto, message_id_origem=message_id, inicio=recebido_em)
+    
+    resposta_ia = perguntar_ia_github(texto, numero=numero, message_id=message_id)
+    rastreador.marcar(message_id, 'ia_fim')
+    
+    rastreador.marcar(message_id, 'envio_inicio')
+    return resposta_ia, enviar_resposta(numero, resposta_ia, message_id_origem=message_id)
+
+
+def obter_particoes(diretorio: Path) -> DiretorioParticionado:
+    """Partições de conversas de uma pasta de mensagens (uma instância por pasta)"""
+    chave = Path(diretorio).resolve()
+    if chave not in _particoes_por_pasta:
+        _particoes_por_pasta[chave] = DiretorioParticionado(
+            diretorio, 'conversas_', niveis=ARMAZENAMENTO_NIVEIS_PARTICAO
+        )
+    return _particoes_por_pasta[chave]
+
+
+def anexar_entradas(arquivo: Path, entradas: list):
+    """Adiciona entradas ao final de um arquivo JSON (lista)"""
+    existentes = []
+    if arquivo.exists():
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            existentes = json.load(f)
+    
+    existentes.extend(entradas)
+    
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        json.dump(existentes, f, ensure_ascii=False, indent=2)
+
+
+def salvar_mensagens_lote(entradas: list, diretorio: Optional[Path] = None) -> int:
+    """
+    Salva várias entradas de uma vez, lendo/escrevendo cada arquivo uma única vez
+    (arquivo diário pelo timestamp da entrada + arquivo por número)
+    
+    Returns:
+        Quantidade de entradas salvas
+    """
+    diretorio = diretorio or MENSAGENS_DIR
+    particoes = obter_particoes(diretorio)
+    
+    por_arquivo = {}
+    for entrada in entradas:
+        data_str = entrada['timestamp'][:10].replace('-', '')
+        por_arquivo.setdefault(diretorio / f"mensagens_{data_str}.json", []).append(entrada)
+        por_arquivo.setdefault(particoes.arquivo(entrada['numero'], criar=True), []).append(entrada)
+    
+    for arquivo, lote in por_arquivo.items():
+        anexar_entradas(arquivo, lote)
+    
+    return len(entradas)
+
+
+def salvar_mensagem(numero: str, mensagem: str, message_data: dict, trace_id: Optional[str] = None):
     """Salva mensagem recebida em arquivo JSON"""
     try:
-        timestamp = datetime.now()
-        
-        # Verificar se é mensagem própria
-        from_me = message_data.get('key', {}).get('fromMe', False)
-        tipo = "ENVIADA" if from_me else "RECEBIDA"
+        entrada = montar_entrada(numero, mensagem, message_data, trace_id=trace_id)
         
         # Nome do arquivo por data
-        data_str = timestamp.strftime('%Y%m%d')
-        arquivo = MENSAGENS_DIR / f"mensagens_{data_str}.json"
-        
-        # Criar entrada
-        entrada = {
-            "timestamp": timestamp.isoformat(),
-            "hora": timestamp.strftime('%H:%M:%S'),
-            "numero": numero,
-            "tipo": tipo,
-            "from_me": from_me,
-            "mensagem": mensagem,
-            "message_id": message_data.get('key', {}).get('id', 'N/A'),
-            "dados_completos": message_data
-        }
-        
-        # Carregar mensagens existentes
-        mensagens = []
-        if arquivo.exists():
-            with open(arquivo, 'r', encoding='utf-8') as f:
-                mensagens = json.load(f)
-        
-        # Adicionar nova mensagem
-        mensagens.append(entrada)
-        
-        # Salvar
-        with open(arquivo, 'w', encoding='utf-8') as f:
-            json.dump(mensagens, f, ensure_ascii=False, indent=2)
-        
+        arquivo = MENSAGENS_DIR / f"mensagens_{entrada['timestamp'][:10].replace('-', '')}.json"
+        anexar_entradas(arquivo, [entrada])
         print(f"✅ Mensagem salva: {arquivo.name}")
         
         # Também salvar por número
-        arquivo_numero = MENSAGENS_DIR / f"conversas_{numero}.json"
-        conversas = []
-        if arquivo_numero.exists():
-            with open(arquivo_numero, 'r', encoding='utf-8') as f:
-                conversas = json.load(f)
-        
-        conversas.append(entrada)
-        
-        with open(arquivo_numero, 'w', encoding='utf-8') as f:
-            json.dump(conversas, f, ensure_ascii=False, indent=2)
-        
+        arquivo_numero = particoes_conversas.arquivo(numero, criar=True)
+        anexar_entradas(arquivo_numero, [entrada])
+        historico.registrar(entrada)
         print(f"✅ Conversa atualizada: {arquivo_numero.name}")
         
         return True
@@ -190,6 +529,7 @@ async def webhook_evolution(request: Request):
     """
     Webhook que captura TODAS as mensagens
     """
+    recebido_em = time.time()
     try:
         data = await request.json()
         event = data.get('event', '')
@@ -199,29 +539,21 @@ async def webhook_evolution(request: Request):
         print(f"   Timestamp: {datetime.now().strftime('%H:%M:%S')}")
         
         # Processar apenas mensagens recebidas
-        if event == 'messages.upsert':
-            message_data = data.get('data', {})
-            key = message_data.get('key', {})
+        evento = interpretar_evento(data)
+        if evento:
+            message_id = evento['message_id']
+            trace = rastreador.iniciar(message_id, evento['numero'], inicio=recebido_em)
+            rastreador.marcar(message_id, 'interpretado')
             
             # ✅ CAPTURAR TODAS - incluindo mensagens próprias
-            from_me = key.get('fromMe', False)
-            tipo_msg = "ENVIADA" if from_me else "RECEBIDA"
-            
-            # Extrair informações
-            remote_jid = key.get('remoteJid', '')
-            numero = extrair_numero_telefone(remote_jid)
+            message_data = evento['message_data']
+            from_me = evento['from_me']
+            tipo_msg = evento['tipo']
+            numero = evento['numero']
+            texto = evento['texto']
             
             print(f"   📱 De: {numero}")
             print(f"   📍 Tipo: {tipo_msg}")
-            
-            # Extrair texto da mensagem
-            message_content = message_data.get('message', {})
-            texto = (
-                message_content.get('conversation') or 
-                message_content.get('extendedTextMessage', {}).get('text') or
-                '[Mensagem sem texto ou mídia]'
-            )
-            
             print(f"   💬 Mensagem: {texto[:100]}")
             
             # Verificar se é do número monitorado
@@ -229,22 +561,47 @@ async def webhook_evolution(request: Request):
                 print(f"   🎯 NÚMERO MONITORADO DETECTADO!")
             
             # Salvar mensagem
-            sucesso = salvar_mensagem(numero, texto, message_data)
+            sucesso = salvar_mensagem(numero, texto, message_data, trace_id=trace['trace_id'])
+            rastreador.marcar(message_id, 'persistido')
             
             if sucesso:
                 print(f"   ✅ Mensagem salva com sucesso")
+                feed.publicar('mensagem', {
+                    'numero': numero,
+                    'tipo': tipo_msg,
+                    'from_me': from_me,
+                    'mensagem': texto,
+                    'message_id': message_id,
+                    'trace_id': trace['trace_id']
+                })
                 
                 # Se for do número monitorado E não for mensagem própria, enviar resposta
                 if numero == NUMERO_MONITORADO and not from_me:
                     print(f"   📤 Processando com IA...")
-                    resposta_ia = perguntar_ia_github(texto)
-                    enviar_resposta(numero, resposta_ia)
+                    rastreador.marcar(message_id, 'ia_inicio')
+                    # IA e envio bloqueiam (HTTP, esperas de retentativa): fora do event loop,
+                    # para o feed, o /status e os outros webhooks seguirem atendendo
+                    resposta_ia, enviada = await run_in_threadpool(
+                        responder_mensagem, numero, texto, message_id, recebido_em
+                    )
+                    rastreador.marcar(message_id, 'envio_fim')
+                    feed.publicar('resposta', {
+                        'numero': numero,
+                        'tipo': 'RESPOSTA',
+                        'em_resposta_a': message_id,
+                        'resposta': resposta_ia,
+                        'enviada': enviada,
+                        'trace_id': trace['trace_id']
+                    })
+                
+                rastreador.finalizar(message_id)
                 
                 return JSONResponse({
                     'status': 'success',
                     'message': 'saved',
                     'numero': numero,
-                    'resposta_enviada': (numero == NUMERO_MONITORADO and not from_me)
+                    'resposta_enviada': (numero == NUMERO_MONITORADO and not from_me),
+                    'trace_id': trace['trace_id']
                 })
             else:
                 print(f"   ❌ Falha ao salvar mensagem")
@@ -253,6 +610,19 @@ async def webhook_evolution(request: Request):
                     'message': 'failed_to_save'
                 }, status_code=500)
         
+        # Confirmações de entrega das respostas enviadas (fecham o trace)
+        if event == 'messages.update':
+            atualizacoes = data.get('data', [])
+            if isinstance(atualizacoes, dict):
+                atualizacoes = [atualizacoes]
+            for item in atualizacoes:
+                id_enviado = item.get('keyId') or item.get('key', {}).get('id')
+                status_entrega = item.get('status') or item.get('update', {}).get('status')
+                trace = rastreador.confirmar_entrega(id_enviado, str(status_entrega))
+                if trace:
+                    print(f"   📬 Entrega confirmada (trace {trace['trace_id']})")
+            return JSONResponse({'status': 'success', 'message': 'status_updated'})
+        
         # Ignorar outros eventos
         return JSONResponse({'status': 'ignored', 'reason': 'not_message_event'})
         
@@ -266,6 +636,9 @@ async def webhook_evolution(request: Request):
 @app.get('/status')
 async def status():
     """Status do webhook"""
+    indice_similar = obter_indice_similaridade()
+    uso_hoje = obter_contabilidade_tokens().resumo(top=0)
+    
     # Contar mensagens
     total = 0
     for arquivo in MENSAGENS_DIR.glob('mensagens_*.json'):
@@ -281,7 +654,22 @@ async def status():
         'timestamp': datetime.now().isoformat(),
         'mensagens_capturadas': total,
         'pasta': str(MENSAGENS_DIR),
-        'instance': INSTANCE_NAME
+        'conversas': particoes_conversas.estatisticas(),
+        'instance': INSTANCE_NAME,
+        'feed': feed.estatisticas(),
+        'ia_http': obter_cliente_modelos().info(),
+        'cache_ia': obter_cache_respostas().estatisticas(),
+        'cache_similaridade': indice_similar.estatisticas() if indice_similar else None,
+        'resiliencia_ia': obter_controle().estatisticas(),
+        'roteamento_ia': obter_roteador().estatisticas(),
+        'uso_tokens_hoje': dict(uso_hoje['total'], orcamentos=uso_hoje['orcamentos']),
+        'streaming': dict(metricas_streaming.estatisticas(), ativo=AI_STREAMING),
+        'contexto_ia': dict(
+            metricas_contexto.estatisticas(),
+            **historico.estatisticas(),
+            ativo=AI_CONTEXTO_ATIVO,
+            orcamento_tokens=AI_CONTEXTO_ORCAMENTO_TOKENS
+        )
     }
 
 
@@ -305,13 +693,17 @@ async def listar_mensagens():
 
 
 @app.get('/conversas')
-async def listar_conversas():
-    """Lista todas as conversas por número"""
+async def listar_conversas(inicio: int = 0, limite: Optional[int] = None):
+    """Lista as conversas por número (pelo manifesto; ?inicio=&limite= para paginar)"""
     try:
         conversas = {}
+        numeros = particoes_conversas.chaves()
+        fim = None if limite is None else inicio + limite
         
-        for arquivo in MENSAGENS_DIR.glob('conversas_*.json'):
-            numero = arquivo.stem.replace('conversas_', '')
+        for numero in numeros[inicio:fim]:
+            arquivo = particoes_conversas.arquivo(numero)
+            if not arquivo.exists():
+                continue
             with open(arquivo, 'r', encoding='utf-8') as f:
                 msgs = json.load(f)
                 conversas[numero] = {
@@ -324,6 +716,106 @@ async def listar_conversas():
         return {'error': str(e)}
 
 
+@app.get('/uso')
+async def uso_tokens(dia: Optional[str] = None, numero: Optional[str] = None, top: int = 20):
+    """Tokens e custo estimado por número, modelo e rota (?dia=YYYYMMDD, ?numero=...)"""
+    try:
+        return obter_contabilidade_tokens().resumo(dia=dia, numero=numero, top=top)
+    except (OSError, ValueError) as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+@app.get('/trace/{message_id}')
+async def obter_trace(message_id: str, formato: str = 'json'):
+    """Linha do tempo de uma mensagem (?formato=texto para visualização em texto)"""
+    trace = rastreador.obter(message_id)
+    if not trace:
+        return JSONResponse({'error': 'trace não encontrado', 'message_id': message_id}, status_code=404)
+    
+    if formato == 'texto':
+        return PlainTextResponse(rastreador.renderizar(trace))
+    
+    return {
+        'trace_id': trace['trace_id'],
+        'message_id': trace['message_id'],
+        'numero': trace['numero'],
+        'linha_do_tempo': rastreador.linha_do_tempo(trace),
+        'duracoes_ms': rastreador.duracoes(trace)
+    }
+
+
+@app.get('/traces')
+async def agregados_traces(numero: Optional[str] = None):
+    """Latência agregada por etapa (traces recentes em memória)"""
+    return rastreador.agregados(numero)
+
+
+@app.get('/eventos')
+async def eventos_sse(
+    request: Request,
+    numero: Optional[str] = None,
+    tipo: Optional[str] = None,
+    ultimos: int = 0
+):
+    """
+    Feed ao vivo via Server-Sent Events
+    Filtros: ?numero=5565...,5511... &tipo=RECEBIDA,ENVIADA,RESPOSTA &ultimos=N
+    Reconexões com Last-Event-ID recebem os eventos perdidos do histórico
+    """
+    assinante = feed.assinar(
+        numero=numero,
+        tipo=tipo,
+        desde=request.headers.get('last-event-id'),
+        ultimos=ultimos
+    )
+
+    async def gerar():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(assinante.fila.get(), timeout=FEED_KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield formatar_sse(evento)
+        finally:
+            feed.cancelar(assinante)
+
+    return StreamingResponse(
+        gerar(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.websocket('/ws/mensagens')
+async def eventos_websocket(
+    websocket: WebSocket,
+    numero: Optional[str] = None,
+    tipo: Optional[str] = None,
+    ultimos: int = 0
+):
+    """Feed ao vivo via WebSocket (mesmos filtros do /eventos)"""
+    await websocket.accept()
+    assinante = feed.assinar(numero=numero, tipo=tipo, ultimos=ultimos)
+
+    async def enviar():
+        while True:
+            evento = await assinante.fila.get()
+            await websocket.send_json(evento)
+
+    envio = asyncio.create_task(enviar())
+    try:
+        # Ler do socket só para detectar a desconexão mesmo sem eventos
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        envio.cancel()
+        feed.cancelar(assinante)
+
+
 @app.get('/')
 async def root():
     """Root endpoint"""
@@ -334,7 +826,12 @@ async def root():
             'webhook': '/webhook',
             'status': '/status',
             'mensagens': '/mensagens',
-            'conversas': '/conversas'
+            'conversas': '/conversas',
+            'eventos': '/eventos (SSE)',
+            'trace': '/trace/{message_id}',
+            'traces': '/traces',
+            'uso': '/uso (tokens por número/modelo/rota)',
+            'ws': '/ws/mensagens (WebSocket)'
         }
     }
 